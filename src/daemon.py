@@ -0,0 +1,307 @@
+"""Long-running daemon serving a warm Application over localhost HTTP.
+
+Starting the Application (imports, template registration, indexing) costs
+far more than a typical request. The daemon does it once and keeps the
+index, templates, provider clients and caches loaded between requests.
+Each request runs on its own thread, so independent /task requests run
+concurrently. Passthrough queries share one conversation and are
+serialized.
+
+Endpoints (JSON bodies):
+    GET  /health   -> {"status": "ok", "indexed_repositories": [...]}
+    GET  /metrics  -> Prometheus text (see system.metrics)
+    POST /task     {"identifier", "params", "flags"} -> task result
+    POST /query    {"query"} -> passthrough response
+    POST /index    {"repo_path"} -> {"status": "COMPLETE" | "FAILED"}
+    POST /reset    -> resets the passthrough conversation
+
+DaemonClient and run_client are the thin client side; they only use the
+standard library and never construct an Application.
+"""
+import http.server
+import json
+import logging
+import os
+import shlex
+import sys
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional, TextIO
+
+from system.errors import create_input_validation_error, create_task_failure, format_error_result, UNEXPECTED_ERROR
+from system.metrics import get_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAEMON_HOST = "127.0.0.1"
+DEFAULT_DAEMON_PORT = 8765
+
+# Environment variable overriding the daemon URL used by clients
+DAEMON_URL_ENV = "LLM_DAEMON_URL"
+
+
+def default_daemon_url() -> str:
+    """Get the daemon URL clients connect to by default."""
+    return os.environ.get(DAEMON_URL_ENV, f"http://{DEFAULT_DAEMON_HOST}:{DEFAULT_DAEMON_PORT}")
+
+
+class DaemonServer:
+    """Serves an Application's tasks and queries over localhost HTTP."""
+
+    def __init__(self, application, host: str = DEFAULT_DAEMON_HOST, port: int = DEFAULT_DAEMON_PORT):
+        """Initialize the server and bind its socket.
+
+        Args:
+            application: The warm Application instance to serve
+            host: Interface to bind (localhost by default)
+            port: Port to listen on (0 picks a free port)
+        """
+        self.application = application
+        self._query_lock = threading.Lock()
+        self._dispatcher_func = None
+        self.httpd = http.server.ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL of the bound socket."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _dispatcher(self):
+        if self._dispatcher_func is None:
+            from dispatcher import execute_programmatic_task
+            self._dispatcher_func = execute_programmatic_task
+        return self._dispatcher_func
+
+    def handle_task(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a programmatic task (the /task command).
+
+        Args:
+            body: Request with "identifier" and optional "params" and "flags"
+
+        Returns:
+            Task result
+        """
+        identifier = body.get("identifier")
+        params = body.get("params", {})
+        flags = body.get("flags", {})
+        if not isinstance(identifier, str) or not identifier:
+            return format_error_result(create_input_validation_error("Missing task identifier"))
+        if not isinstance(params, dict) or not isinstance(flags, dict):
+            return format_error_result(create_input_validation_error("params and flags must be objects"))
+        return self._dispatcher()(
+            identifier=identifier,
+            params=params,
+            flags=flags,
+            handler_instance=self.application.passthrough_handler,
+            task_system_instance=self.application.task_system,
+            optional_history_str=body.get("history"),
+        )
+
+    def handle_query(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a passthrough query.
+
+        Queries continue one shared conversation, so they run one at a time.
+
+        Args:
+            body: Request with "query"
+
+        Returns:
+            Response dictionary as returned by Application.handle_query
+        """
+        query = body.get("query")
+        if not isinstance(query, str) or not query.strip():
+            return format_error_result(create_input_validation_error("Missing query"))
+        with self._query_lock:
+            return self.application.handle_query(query)
+
+    def handle_index(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Index a repository into the daemon's memory system.
+
+        Args:
+            body: Request with "repo_path"
+
+        Returns:
+            Result with status COMPLETE or FAILED
+        """
+        repo_path = body.get("repo_path")
+        if not isinstance(repo_path, str) or not repo_path:
+            return format_error_result(create_input_validation_error("Missing repo_path"))
+        success = self.application.index_repository(repo_path)
+        return {
+            "status": "COMPLETE" if success else "FAILED",
+            "content": f"Indexed {repo_path}" if success else f"Failed to index {repo_path}",
+            "notes": {"indexed_repositories": list(self.application.indexed_repositories)},
+        }
+
+    def handle_reset(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Reset the passthrough conversation."""
+        with self._query_lock:
+            self.application.reset_conversation()
+        return {"status": "COMPLETE", "content": "Conversation reset", "notes": {}}
+
+    def _make_handler(self):
+        server = self
+        routes = {
+            "/task": server.handle_task,
+            "/query": server.handle_query,
+            "/index": server.handle_index,
+            "/reset": server.handle_reset,
+        }
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+                self._send(status, json.dumps(payload, default=str).encode("utf-8"))
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send_json(200, {
+                        "status": "ok",
+                        "indexed_repositories": list(getattr(server.application, "indexed_repositories", [])),
+                    })
+                elif self.path == "/metrics":
+                    self._send(200, get_registry().to_prometheus().encode("utf-8"),
+                               "text/plain; version=0.0.4; charset=utf-8")
+                else:
+                    self._send_json(404, format_error_result(
+                        create_input_validation_error(f"Unknown path: {self.path}")))
+
+            def do_POST(self):
+                route = routes.get(self.path)
+                if route is None:
+                    self._send_json(404, format_error_result(
+                        create_input_validation_error(f"Unknown path: {self.path}")))
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    if not isinstance(body, dict):
+                        raise ValueError("request body must be a JSON object")
+                except ValueError as e:
+                    self._send_json(400, format_error_result(
+                        create_input_validation_error(f"Invalid request body: {e}")))
+                    return
+                try:
+                    result = route(body)
+                except Exception as e:
+                    logger.exception("Daemon request %s failed", self.path)
+                    result = format_error_result(create_task_failure(
+                        f"Error handling {self.path}: {e}", UNEXPECTED_ERROR))
+                self._send_json(200, result)
+
+            def log_message(self, format, *args):
+                logger.debug("daemon: " + format, *args)
+
+        return RequestHandler
+
+    def start(self) -> "DaemonServer":
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="daemon-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until shut down."""
+        self.httpd.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop serving and close the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class DaemonClient:
+    """Client for a running daemon."""
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None):
+        """Initialize the client.
+
+        Args:
+            url: Daemon URL (defaults to default_daemon_url())
+            timeout: Socket timeout in seconds (None waits for long tasks)
+        """
+        self.url = (url or default_daemon_url()).rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return json.loads(e.read())
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"Daemon not reachable at {self.url}: {e.reason}") from e
+
+    def health(self) -> Dict[str, Any]:
+        """Check that the daemon is up."""
+        return self._request("/health")
+
+    def task(self, identifier: str, params: Optional[Dict[str, Any]] = None,
+             flags: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+        """Execute a programmatic task on the daemon."""
+        return self._request("/task", {"identifier": identifier, "params": params or {}, "flags": flags or {}})
+
+    def query(self, query: str) -> Dict[str, Any]:
+        """Send a passthrough query to the daemon."""
+        return self._request("/query", {"query": query})
+
+    def index(self, repo_path: str) -> Dict[str, Any]:
+        """Index a repository on the daemon."""
+        return self._request("/index", {"repo_path": os.path.abspath(repo_path)})
+
+
+def run_client(args: List[str], url: Optional[str] = None, output: Optional[TextIO] = None) -> int:
+    """Forward a /task command line to a running daemon and print the result.
+
+    Args:
+        args: /task arguments: <identifier> [param=value] [--flag]
+        url: Daemon URL (defaults to default_daemon_url())
+        output: Output stream (defaults to stdout)
+
+    Returns:
+        Process exit code: 0 if the task completed, 1 otherwise
+    """
+    from repl.repl import parse_task_args
+
+    output = output or sys.stdout
+    if len(args) == 1 and " " in args[0]:
+        args = shlex.split(args[0])  # A quoted command line, e.g. "/task name x=1"
+    if args and args[0] == "/task":
+        args = args[1:]
+    if not args:
+        print("Usage: --task <identifier> [param=value] [param2='<json_value>'] [--flag]", file=output)
+        return 1
+
+    params, flags, parse_error = parse_task_args(args[1:])
+    if parse_error:
+        print(parse_error, file=output)
+
+    try:
+        result = DaemonClient(url).task(args[0], params, flags)
+    except ConnectionError as e:
+        print(f"{e}. Start it with: python src/main.py --daemon", file=output)
+        return 1
+
+    print(f"Status: {result.get('status', 'UNKNOWN')}", file=output)
+    print("Content:", file=output)
+    print(result.get("content", ""), file=output)
+    if result.get("notes"):
+        print("\nNotes:", file=output)
+        print(json.dumps(result["notes"], indent=2, default=str), file=output)
+    return 0 if result.get("status") == "COMPLETE" else 1
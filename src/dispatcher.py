@@ -8,12 +8,17 @@ from task_system.task_system import TaskSystem
 from task_system.ast_nodes import SubtaskRequest
 from task_system.template_utils import Environment # Needed for execute_subtask_directly call
 from system.errors import TaskError, create_task_failure, format_error_result, INPUT_VALIDATION_FAILURE, UNEXPECTED_ERROR
+from system.metrics import get_registry, timed
+from system.tracing import current_span, traced
 
 # Define TaskResult type hint
 TaskResult = Dict[str, Any]
 
 logger = logging.getLogger(__name__)
 
+DISPATCHER_REQUEST_SECONDS = get_registry().histogram(
+    "dispatcher_request_seconds", "Latency of programmatic task requests (count: throughput)")
+
 
 def execute_programmatic_task(
     identifier: str,
@@ -196,6 +201,8 @@ from system.errors import TaskError, create_task_failure, format_error_result, I
 TaskResult = Dict[str, Any]
 
 logger = logging.getLogger(__name__)
+@timed(DISPATCHER_REQUEST_SECONDS)
+@traced("dispatcher.execute_programmatic_task")
 def execute_programmatic_task(
     identifier: str,
     params: Dict[str, Any],
@@ -210,6 +217,7 @@ def execute_programmatic_task(
     Populates result notes for direct tool execution path.
     """
     logger.debug(f"Dispatcher executing: identifier='{identifier}'")
+    current_span().set_attribute("identifier", identifier)
     logger.debug(f"Dispatcher Params: {params}, Flags: {flags}")
 
     try:
@@ -0,0 +1,179 @@
+"""Memo table for results of cacheable template function calls."""
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def canonicalize_arguments(bindings: Dict[str, Any]) -> Optional[str]:
+    """Serialize bound arguments canonically.
+
+    Args:
+        bindings: Parameter bindings of a call
+
+    Returns:
+        Canonical JSON text, or None if the values are not plain data
+    """
+    try:
+        return json.dumps(bindings, sort_keys=True, separators=(",", ":"), allow_nan=True)
+    except (TypeError, ValueError):
+        return None
+
+
+def template_fingerprint(template: Dict[str, Any]) -> str:
+    """Digest a template definition.
+
+    Re-registering a template under the same name with a different
+    definition changes the fingerprint, so results of the old definition
+    are not reused.
+
+    Args:
+        template: Template definition
+
+    Returns:
+        Hex digest of the canonical definition
+    """
+    text = json.dumps(template, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class TemplateFingerprints:
+    """Template fingerprints computed once per template definition object.
+
+    Entries are keyed by identity, so a template registered again (a new
+    definition object) is fingerprinted again, while repeated calls to the
+    same template do not re-serialize it. Definitions edited in place keep
+    their first fingerprint; register the edited definition instead.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of templates remembered
+        """
+        self.max_entries = max_entries
+        # id(template) -> (template, fingerprint); holding the template keeps its id from being reused
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template: Dict[str, Any]) -> str:
+        """Get the fingerprint of a template definition.
+
+        Args:
+            template: Template definition
+
+        Returns:
+            Hex digest as returned by template_fingerprint
+        """
+        key = id(template)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is template:
+                self._entries.move_to_end(key)
+                return entry[1]
+        fingerprint = template_fingerprint(template)
+        with self._lock:
+            self._entries[key] = (template, fingerprint)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fingerprint
+
+
+def file_context_digest(file_paths: Any) -> str:
+    """Digest the state of the files a call reads.
+
+    Files are identified by path, size and modification time, so a cached
+    result is not reused after one of them changes.
+
+    Args:
+        file_paths: File paths included in the call's context
+
+    Returns:
+        Hex digest (of the empty list when there are no files)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(str(path) for path in (file_paths or [])):
+        try:
+            stat = os.stat(path)
+            state = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            state = "missing"
+        digest.update(f"{path}\0{state}\0".encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class CallMemoTable:
+    """LRU table of call results with per-entry expiry.
+
+    Results are copied on the way in and out, so callers can modify what
+    they get back without affecting later hits.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        """Initialize the table.
+
+        Args:
+            max_entries: Maximum number of results kept
+            clock: Time source for expiry
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Look up a result.
+
+        Args:
+            key: Call key
+
+        Returns:
+            Tuple of (found, copy of the result)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and self.clock() >= entry[0]:
+                # Expired
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            value = entry[1]
+        return True, copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a result.
+
+        Args:
+            key: Call key
+            value: Result to store
+            ttl: Optional seconds until the result expires (None: never)
+        """
+        expires = self.clock() + ttl if ttl is not None else None
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Remove all results."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -6,7 +6,7 @@ evaluating AST nodes, particularly function calls.
 from typing import Any, Dict, List, Optional, Union, Tuple, TypeVar, cast
 
 from task_system.ast_nodes import ArgumentNode, FunctionCallNode
-from task_system.template_utils import Environment, resolve_parameters
+from task_system.template_utils import Environment, resolve_parameters, substitute_variables
 from system.errors import (
     TaskError, 
     create_input_validation_error,
@@ -15,6 +15,7 @@ from system.errors import (
     INPUT_VALIDATION_FAILURE
 )
 from evaluator.interfaces import EvaluatorInterface, TemplateLookupInterface
+from evaluator.call_cache import CallMemoTable, TemplateFingerprints, canonicalize_arguments, file_context_digest
 
 # Type variable for the template lookup interface
 T = TypeVar('T', bound=TemplateLookupInterface)
@@ -36,6 +37,10 @@ class Evaluator(EvaluatorInterface):
             template_provider: Component that provides template lookup and execution
         """
         self.template_provider = template_provider
+        
+        # Results of cacheable template calls
+        self.memo = CallMemoTable()
+        self.fingerprints = TemplateFingerprints()
     
     def evaluate(self, node: Any, env: Environment) -> Any:
         """
@@ -116,8 +121,18 @@ class Evaluator(EvaluatorInterface):
             # Create function environment with parameter bindings
             func_env = env.extend(param_bindings)
             
+            # Cacheable templates reuse the result of an identical earlier call
+            memo_key = self._memo_key(template, param_bindings, func_env)
+            if memo_key is not None:
+                found, result = self.memo.get(memo_key)
+                if found:
+                    return result
+            
             # Execute the template in the function environment
-            return self._execute_template(template, func_env)
+            result = self._execute_template(template, func_env)
+            if memo_key is not None and isinstance(result, dict) and result.get("status") == "COMPLETE":
+                self.memo.put(memo_key, result, template.get("cache_ttl"))
+            return result
         except TaskError:
             # Re-raise task errors
             raise
@@ -129,6 +144,44 @@ class Evaluator(EvaluatorInterface):
                 source_node=call_node
             )
     
+    def _memo_key(self, template: Dict[str, Any], param_bindings: Dict[str, Any],
+                  env: Environment) -> Optional[Tuple[str, str, str, str]]:
+        """
+        Get the memo table key for a call, if its result can be cached.
+        
+        Templates opt in with "cacheable": True, declaring that their result
+        depends only on the bound arguments and the files in their context.
+        
+        Args:
+            template: Template definition
+            param_bindings: Bound arguments of the call
+            env: Function environment of the call, resolving its file paths
+            
+        Returns:
+            (template name, template fingerprint, canonical arguments,
+            file context digest), or None if the call is not cacheable
+        """
+        if not template.get("cacheable"):
+            return None
+        arguments = canonicalize_arguments(param_bindings)
+        if arguments is None:
+            return None
+        return (template.get("name", ""), self.fingerprints.get(template), arguments,
+                file_context_digest(self._resolve_file_paths(template, env)))
+    
+    def _resolve_file_paths(self, template: Dict[str, Any], env: Environment) -> List[Any]:
+        """
+        Resolve {{variable}} references in a template's file paths.
+        
+        Args:
+            template: Template definition
+            env: Environment for variable resolution
+            
+        Returns:
+            File paths with variables substituted
+        """
+        return [substitute_variables(path, env) for path in template.get("file_paths") or []]
+    
     def _evaluate_arguments(self, arguments: List[ArgumentNode], env: Environment) -> Tuple[List[Any], Dict[str, Any]]:
         """
         Evaluate function call arguments in the given environment.
@@ -336,7 +389,7 @@ class Evaluator(EvaluatorInterface):
             context_mgmt = template.get("context_management", {})
             
             # Check for explicit file paths to include
-            file_paths = template.get("file_paths", [])
+            file_paths = self._resolve_file_paths(template, env)
             if file_paths:
                 inputs["file_paths"] = file_paths
             
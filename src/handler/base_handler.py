@@ -1,11 +1,25 @@
 """Base handler providing common functionality for all handlers."""
 from typing import Dict, List, Optional, Any, Callable, Tuple, Union
+import os
+import time
+import concurrent.futures
 
 from handler.model_provider import ProviderAdapter, ClaudeProvider
 from handler.file_access import FileAccessManager
+from handler.conversation_history import ConversationHistoryManager
+from handler.response_cache import wrap_with_response_cache
+from handler.model_router import ModelRouter
+from handler.file_excerpts import create_file_excerpt
 from handler.command_executor import execute_command_safely, parse_file_paths_from_output
 from memory.context_generation import ContextGenerationInput
+from memory.context_packing import PackedContext, pack_context
+from memory.token_counting import get_token_counter
 from system.prompt_registry import registry as prompt_registry
+from system.metrics import get_registry
+from system.tracing import bind_context
+
+FILE_CACHE_REQUESTS = get_registry().counter(
+    "file_cache_requests_total", "File reads by whether speculatively read contents were reused", ["result"])
 
 class BaseHandler:
     """Base class for all handlers with common functionality.
@@ -33,12 +47,18 @@ class BaseHandler:
         """
         self.task_system = task_system
         self.memory_system = memory_system
-        self.model_provider = model_provider or ClaudeProvider()
         self.file_manager = FileAccessManager()
         
         # Configuration
         self.config = config or {}
         
+        # Optional persistent response cache (config "response_cache" or environment)
+        self.model_provider = wrap_with_response_cache(
+            model_provider or ClaudeProvider(), self.config.get("response_cache"))
+        
+        # Per-task model selection with fallback (config "model_routes")
+        self.model_router = ModelRouter.from_config(self.config)
+        
         # Debug mode
         self.debug_mode = False
         
@@ -47,8 +67,12 @@ class BaseHandler:
         self.tool_executors = {}        # Tool executor functions (for LLM tool use)
         self.direct_tool_executors = {} # Direct executor functions (for programmatic calls)
 
+        # Token counting for prompts, packed context and history
+        self.token_counter = get_token_counter(self.config)
+        
         # Conversation state
         self.conversation_history = []
+        self.history_manager = ConversationHistoryManager.from_config(self.config)
         
         # Base system prompt - can be overridden by configuration
         self.base_system_prompt = self.config.get("base_system_prompt", """You are a helpful assistant that responds to user queries.""")
@@ -133,6 +157,48 @@ class BaseHandler:
             self.log_debug(f"Tool {tool_name} not found")
             return None
     
+    def _execute_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Execute independent tool calls concurrently.
+        
+        Calls run on a worker pool (config "max_parallel_tools", default 8).
+        A call that has not finished within config "tool_timeout" seconds
+        (default 60) of the calls starting is reported as an error; its
+        worker is left to finish in the background.
+        
+        Args:
+            tool_calls: Tool calls with 'name' and 'parameters'
+            
+        Returns:
+            Tool execution results (None for unknown tools) in call order
+        """
+        if not tool_calls:
+            return []
+        
+        timeout = self.config.get("tool_timeout", 60.0)
+        max_workers = min(len(tool_calls), self.config.get("max_parallel_tools", 8))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [
+                executor.submit(bind_context(self._execute_tool), call.get("name"), call.get("parameters"))
+                for call in tool_calls
+            ]
+            deadline = time.monotonic() + timeout
+            results = []
+            for call, future in zip(tool_calls, futures):
+                try:
+                    results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                except concurrent.futures.TimeoutError:
+                    self.log_debug(f"Tool {call.get('name')} timed out after {timeout} seconds")
+                    results.append({
+                        "status": "error",
+                        "content": f"Tool {call.get('name')} timed out after {timeout} seconds",
+                        "metadata": {"error": "timeout"}
+                    })
+            return results
+        finally:
+            # Don't wait for timed out tools
+            executor.shutdown(wait=False)
+    
     def execute_file_path_command(self, command: str) -> List[str]:
         """Execute command and return file paths.
         
@@ -211,11 +277,47 @@ class BaseHandler:
             self.log_debug(f"Error getting relevant files: {str(e)}")
             return []  # Return empty list on error to avoid breaking callers
     
-    def _create_file_context(self, file_paths: List[str]) -> str:
+    def _read_files(self, file_paths: List[str],
+                    prefetched: Optional[Dict[str, Optional[str]]] = None) -> List[Optional[str]]:
+        """Read several files concurrently.
+        
+        File reads are I/O bound, so they are dispatched to a thread pool
+        which hides per-file latency on slow (e.g. network-mounted) checkouts.
+        
+        Args:
+            file_paths: List of file paths
+            prefetched: Optional contents already read, by path; only the
+                remaining files are read
+            
+        Returns:
+            List of file contents (None for unreadable files) in input order
+        """
+        if prefetched:
+            missing = [path for path in file_paths if path not in prefetched]
+            FILE_CACHE_REQUESTS.labels("hit").inc(len(file_paths) - len(missing))
+            contents = dict(zip(missing, self._read_files(missing)))
+            return [prefetched[path] if path in prefetched else contents[path] for path in file_paths]
+        
+        FILE_CACHE_REQUESTS.labels("miss").inc(len(file_paths))
+        if len(file_paths) <= 1:
+            return [self.file_manager.read_file(path) for path in file_paths]
+        
+        max_workers = min(len(file_paths), self.config.get(
+            "max_parallel_file_reads", min(16, (os.cpu_count() or 1) * 4)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # executor.map yields results in submission order
+            return list(executor.map(bind_context(self.file_manager.read_file), file_paths))
+    
+    def _create_file_context(self, file_paths: List[str], query: Optional[str] = None) -> str:
         """Create a context string from file paths.
         
+        When a query is given, files that exceed their share of the
+        per-request token budget (config "context_token_budget") are
+        reduced to the parts relevant to the query.
+        
         Args:
             file_paths: List of file paths
+            query: Optional query used to excerpt oversized files
             
         Returns:
             Context string with file information
@@ -223,23 +325,73 @@ class BaseHandler:
         if not file_paths:
             return ""
         
-        file_contexts = []
-        for path in file_paths:
-            content = self.file_manager.read_file(path)
-            if content:
-                # Format the file content with proper markdown
-                file_contexts.append(f"File: {path}\n```\n{content}\n```\n")
-            else:
-                file_contexts.append(f"File: {path} (could not be read)")
+        contents = self._read_files(file_paths)
         
-        if file_contexts:
-            return "\n".join(file_contexts)
-        else:
-            return "No file contents available."
+        if query:
+            per_file_budget = self.config.get("context_token_budget", 50000) // len(file_paths)
+            contents = [
+                create_file_excerpt(content, path, query, per_file_budget,
+                                    token_counter=self.token_counter) if content else content
+                for path, content in zip(file_paths, contents)
+            ]
+        
+        # Format each file with proper markdown and join once
+        return "\n".join(
+            f"File: {path}\n```\n{content}\n```\n" if content else f"File: {path} (could not be read)"
+            for path, content in zip(file_paths, contents)
+        )
+    
+    def _pack_file_context(self, matches: List[Any], query: Optional[str] = None,
+                           sent_versions: Optional[Dict[str, str]] = None,
+                           prefetched: Optional[Dict[str, Optional[str]]] = None) -> PackedContext:
+        """Pack matched files into the context token budget.
+        
+        Unlike _create_file_context, which includes every file, this admits
+        files by relevance per token until config "context_token_budget" is
+        spent, degrading the rest to their global index summaries or
+        dropping them.
+        
+        Args:
+            matches: Match tuples or file paths, most relevant first
+            query: Optional query used to excerpt oversized files
+            sent_versions: Optional mapping of paths to content hashes the
+                model has already seen; matching files are only referenced
+            prefetched: Optional file contents already read, by path
+            
+        Returns:
+            PackedContext with the context text and packing decisions
+        """
+        token_budget = self.config.get("context_token_budget", 50000)
+        
+        def read_files(paths: List[str]) -> List[Optional[str]]:
+            return self._read_files(paths, prefetched)
+        
+        excerpt = None
+        if query and matches:
+            # Excerpting happens after hashing, so a file's version does
+            # not change with the query
+            per_file_budget = token_budget // len(matches)
+            
+            def excerpt(path: str, content: str) -> str:
+                return create_file_excerpt(content, path, query, per_file_budget,
+                                           token_counter=self.token_counter)
+        
+        try:
+            global_index = self.memory_system.get_global_index()
+        except Exception as e:
+            self.log_debug(f"Error getting global index: {str(e)}")
+            global_index = {}
+        
+        packed = pack_context(matches, token_budget, read_files, global_index,
+                              sent_versions=sent_versions, token_counter=self.token_counter,
+                              excerpt=excerpt)
+        self.log_debug(f"Packed file context: {packed}")
+        return packed
     
     def reset_conversation(self) -> None:
         """Reset the conversation state."""
         self.conversation_history = []
+        self.history_manager.reset()
     
     def log_debug(self, message: str) -> None:
         """Log debug information if debug mode is enabled.
@@ -0,0 +1,115 @@
+"""
+Process-wide registry of shared Anthropic API clients.
+
+Creating a client per provider (and so per handler) gives every handler its
+own HTTP connection pool. Clients from this registry are shared by API key,
+so handlers and shard workers reuse pooled keep-alive connections.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import anthropic
+
+# Connection pool limits, configurable through the environment
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("ANTHROPIC_MAX_CONNECTIONS", "20"))
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "10"))
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, int], anthropic.Anthropic] = {}
+# Async clients are bound to the event loop that created their connections
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, int], anthropic.AsyncAnthropic]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def _limits(max_connections: int) -> Any:
+    """Get pool limits for a connection count.
+
+    Built from the SDK's own default limits type, so the limits always
+    match the HTTP library the installed SDK uses.
+    """
+    return type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_connections, DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+        keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY
+    )
+
+
+def get_client(api_key: str, max_connections: Optional[int] = None) -> anthropic.Anthropic:
+    """Get the shared synchronous client for an API key.
+
+    Args:
+        api_key: Anthropic API key
+        max_connections: Optional connection pool size (defaults to
+                         ANTHROPIC_MAX_CONNECTIONS or 20)
+
+    Returns:
+        Shared anthropic.Anthropic client
+    """
+    key = (api_key, max_connections or DEFAULT_MAX_CONNECTIONS)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            # Retries are handled by handler.rate_limiting.RetryPolicy
+            client = anthropic.Anthropic(
+                api_key=api_key,
+                max_retries=0,
+                http_client=anthropic.DefaultHttpxClient(limits=_limits(key[1]))
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(api_key: str, max_connections: Optional[int] = None) -> anthropic.AsyncAnthropic:
+    """Get the shared asynchronous client for an API key and the running loop.
+
+    Must be called from within a running event loop.
+
+    Args:
+        api_key: Anthropic API key
+        max_connections: Optional connection pool size
+
+    Returns:
+        Shared anthropic.AsyncAnthropic client for the current event loop
+    """
+    loop = asyncio.get_running_loop()
+    key = (api_key, max_connections or DEFAULT_MAX_CONNECTIONS)
+    with _lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = anthropic.AsyncAnthropic(
+                api_key=api_key,
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=_limits(key[1]))
+            )
+            loop_clients[key] = client
+        return client
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    """Get the number of shared clients currently registered."""
+    with _lock:
+        return {
+            "sync_clients": len(_clients),
+            "async_clients": sum(len(clients) for clients in _async_clients.values())
+        }
+
+
+def clear_clients() -> None:
+    """Close and forget all shared synchronous clients.
+
+    Async clients are dropped together with their event loop.
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _async_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
@@ -0,0 +1,201 @@
+"""Token-aware compaction of conversation history."""
+from typing import Any, Callable, Dict, List, Optional
+
+from memory.token_counting import RatioTokenCounter, TokenCounter, get_token_counter
+
+# Summarizer signature: (previous_summary, messages_to_fold_in) -> new summary
+Summarizer = Callable[[str, List[Dict[str, Any]]], str]
+
+# Characters kept from each message by the default extractive summarizer
+SUMMARY_CHARS_PER_MESSAGE = 200
+
+
+def extractive_summary(previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+    """Fold messages into a summary by keeping the start of each message.
+
+    A cheap local summarizer that needs no model call. It can be replaced
+    with a model-backed summarizer through the history manager.
+
+    Args:
+        previous_summary: Summary of the messages folded in earlier
+        messages: Messages to add to the summary
+
+    Returns:
+        Updated summary
+    """
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        content = " ".join(str(message.get("content", "")).split())
+        if len(content) > SUMMARY_CHARS_PER_MESSAGE:
+            content = content[:SUMMARY_CHARS_PER_MESSAGE] + "..."
+        lines.append(f"- {message.get('role', 'user')}: {content}")
+    return "\n".join(lines)
+
+
+class ConversationHistoryManager:
+    """Keeps the conversation sent to the model under a token ceiling.
+
+    The most recent turns are sent verbatim; older turns are collapsed into
+    a rolling summary. Per-message token estimates are kept as prefix sums
+    alongside the (append-only) history list, so checking whether compaction
+    is needed and sizing the verbatim window are O(1) per message. The
+    summary is only produced when the ceiling is exceeded, and is extended
+    incrementally as more turns fall out of the verbatim window.
+    """
+
+    def __init__(self, token_ceiling: int = 20000, keep_turns: int = 3,
+                 token_ratio: Optional[float] = None, summarizer: Optional[Summarizer] = None,
+                 max_summary_tokens: Optional[int] = None,
+                 token_counter: Optional[TokenCounter] = None):
+        """Initialize the history manager.
+
+        Args:
+            token_ceiling: Estimated token ceiling for the history sent to the model
+            keep_turns: Number of most recent user/assistant turns kept verbatim
+            token_ratio: Optional character to token ratio used for
+                estimation instead of the token counter
+            summarizer: Optional summarizer; defaults to extractive_summary
+            max_summary_tokens: Cap on the rolling summary (defaults to a
+                quarter of the ceiling)
+            token_counter: Optional token counter (defaults to the shared
+                approximate counter)
+        """
+        self.token_ceiling = token_ceiling
+        self.keep_turns = keep_turns
+        if token_counter is None:
+            token_counter = RatioTokenCounter(token_ratio) if token_ratio is not None else get_token_counter()
+        self.token_counter = token_counter
+        self.summarizer = summarizer or extractive_summary
+        self.max_summary_tokens = max_summary_tokens or token_ceiling // 4
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all token accounting and the cached summary."""
+        self._history_id = None
+        self._prefix_tokens = [0]   # _prefix_tokens[i] = tokens of messages[:i]
+        self._summary = ""
+        self._summarized_count = 0  # Messages already folded into the summary
+
+    @property
+    def summarized_count(self) -> int:
+        """Number of leading messages folded into the rolling summary."""
+        return self._summarized_count
+
+    def estimate_tokens(self, message: Dict[str, Any]) -> int:
+        """Estimate the tokens used by a message (including attached file context)."""
+        return (self.token_counter.count(str(message.get("content", "")))
+                + self.token_counter.count(message.get("file_context") or ""))
+
+    def _sync(self, history: List[Dict[str, Any]]) -> None:
+        """Account for messages appended since the last call."""
+        if id(history) != self._history_id or len(history) < len(self._prefix_tokens) - 1:
+            # A different or truncated history list: start over
+            self.reset()
+            self._history_id = id(history)
+        elif len(self._prefix_tokens) > 1:
+            # The newest message may have been updated since (e.g. file context attached)
+            self._prefix_tokens.pop()
+        for message in history[len(self._prefix_tokens) - 1:]:
+            self._prefix_tokens.append(self._prefix_tokens[-1] + self.estimate_tokens(message))
+
+    def total_tokens(self, history: List[Dict[str, Any]]) -> int:
+        """Get the estimated tokens of the full history."""
+        self._sync(history)
+        return self._prefix_tokens[-1]
+
+    def get_messages(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Get the messages to send to the model.
+
+        Args:
+            history: Full conversation history (append-only list of
+                     {"role", "content"} messages)
+
+        Returns:
+            The history itself when under the ceiling, otherwise a summary
+            of older turns followed by the most recent turns verbatim
+        """
+        start = self.window_start(history)
+        if start == 0:
+            return self._format(history)
+
+        # Lazily extend the rolling summary with messages leaving the window
+        if start > self._summarized_count:
+            self._summary = self._cap_summary(
+                self.summarizer(self._summary, history[self._summarized_count:start]))
+            self._summarized_count = start
+
+        window = self._format(history[start:])
+        if window and window[0]["role"] == "user":
+            window[0] = {
+                "role": "user",
+                "content": f"Summary of the earlier conversation:\n{self._summary}\n\n{window[0]['content']}"
+            }
+        return window
+
+    def window_start(self, history: List[Dict[str, Any]], extra_tokens: int = 0) -> int:
+        """Get the index of the first message that would be sent verbatim.
+
+        Does not change the cached summary, so callers can anticipate which
+        messages are about to be folded away.
+
+        Args:
+            history: Full conversation history
+            extra_tokens: Tokens about to be added to the newest message
+
+        Returns:
+            Index of the first verbatim message (0 when nothing is compacted)
+        """
+        self._sync(history)
+        total = self._prefix_tokens[-1] + extra_tokens
+        if total <= self.token_ceiling or len(history) < 2:
+            return self._summarized_count
+
+        # Verbatim window: the last N turns plus the pending user message
+        start = max(0, len(history) - (2 * self.keep_turns + 1))
+        # Shrink the window further if it alone exceeds the ceiling
+        window_budget = self.token_ceiling - self.max_summary_tokens
+        while start < len(history) - 1 and total - self._prefix_tokens[start] > window_budget:
+            start += 1
+        # The window must open with a user message
+        while start < len(history) - 1 and history[start].get("role") != "user":
+            start += 1
+        # Never move the boundary backwards, the summary already covers those messages
+        return max(start, self._summarized_count)
+
+    @staticmethod
+    def _format(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Format messages for the provider, inlining attached file context."""
+        return [
+            {
+                "role": msg["role"],
+                "content": f"Relevant files:\n{msg['file_context']}\n\n{msg['content']}"
+                if msg.get("file_context") else msg["content"]
+            }
+            for msg in messages
+        ]
+
+    def _cap_summary(self, summary: str) -> str:
+        """Trim the summary to its token cap, keeping the most recent part."""
+        tokens = self.token_counter.count(summary)
+        if tokens <= self.max_summary_tokens:
+            return summary
+        # Keep the share of characters matching the share of tokens allowed
+        max_chars = int(len(summary) * self.max_summary_tokens / tokens)
+        return "..." + summary[-max_chars:] if max_chars else ""
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ConversationHistoryManager":
+        """Create a history manager from handler configuration.
+
+        Args:
+            config: Handler configuration dictionary
+
+        Returns:
+            Configured ConversationHistoryManager
+        """
+        return cls(
+            token_ceiling=config.get("history_token_ceiling", 20000),
+            keep_turns=config.get("history_keep_turns", 3),
+            summarizer=config.get("history_summarizer"),
+            token_counter=get_token_counter(config)
+        )
@@ -4,6 +4,8 @@ File access module for reading file contents.
 import os
 from typing import Dict, Optional
 
+from system.tracing import current_span, traced
+
 class FileAccessManager:
     """
     Manager for file access operations.
@@ -19,6 +21,7 @@ class FileAccessManager:
         """
         self.base_path = base_path or os.getcwd()
     
+    @traced("file.read")
     def read_file(self, file_path: str, max_size: int = 100 * 1024) -> Optional[str]:
         """
         Read file contents safely.
@@ -47,6 +50,8 @@ class FileAccessManager:
                 return f"File too large: {file_path} ({file_size} bytes)"
             
             # Read file
+            current_span().set_attribute("path", file_path)
+            current_span().set_attribute("bytes", file_size)
             with open(file_path, "r", encoding="utf-8") as f:
                 return f.read()
         except Exception as e:
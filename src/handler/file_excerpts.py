@@ -0,0 +1,158 @@
+"""
+Relevance-driven excerpting of file contents for LLM context.
+"""
+import os
+import re
+from typing import Optional, Set
+
+from memory.indexers.text_extraction import extract_definitions
+from memory.token_counting import RatioTokenCounter, TokenCounter, default_token_counter
+
+# Words that carry no signal when matching a query against code
+QUERY_STOPWORDS = {
+    "the", "and", "for", "how", "what", "does", "this", "that", "with", "from",
+    "are", "can", "you", "where", "which", "why", "when", "into", "about",
+    "file", "code", "work", "works", "use", "used", "please", "show", "tell"
+}
+
+# Lines of surrounding context kept around a query match outside definitions
+CONTEXT_LINES = 2
+
+IMPORT_PATTERN = re.compile(r'^\s*(?:import\s|from\s+\S+\s+import\s)')
+
+
+def extract_query_terms(query: str) -> Set[str]:
+    """Extract lowercase search terms from a query.
+
+    Args:
+        query: Natural language query
+
+    Returns:
+        Set of terms worth matching against code
+    """
+    terms = set()
+    for word in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', query or ""):
+        word = word.lower()
+        if len(word) >= 3 and word not in QUERY_STOPWORDS:
+            terms.add(word)
+            # Also match the parts of snake_case identifiers
+            terms.update(part for part in word.split('_') if len(part) >= 3 and part not in QUERY_STOPWORDS)
+    return terms
+
+
+def _count_hits(text: str, terms: Set[str]) -> int:
+    """Count query term occurrences in text."""
+    text = text.lower()
+    return sum(text.count(term) for term in terms)
+
+
+def create_file_excerpt(content: str, file_path: str, query: str,
+                        max_tokens: int, token_ratio: Optional[float] = None,
+                        token_counter: Optional[TokenCounter] = None) -> str:
+    """Reduce a file to the parts relevant to a query within a token budget.
+
+    Imports and the signatures of all definitions are always kept. Full
+    bodies are included for definitions that match the query, most matches
+    first, while they fit the budget; everything else is collapsed to
+    its signature followed by "...". Files without recognizable
+    definitions keep the lines matching the query plus surrounding lines.
+
+    Args:
+        content: Full file content
+        file_path: Path of the file (used to detect the language)
+        query: Query the excerpt should be relevant to
+        max_tokens: Token budget for the excerpt
+        token_ratio: Optional character to token ratio used for estimation
+                     instead of the token counter
+        token_counter: Optional token counter (defaults to the shared
+                       approximate counter); pass the handler's counter so
+                       excerpts and context packing measure budgets alike
+
+    Returns:
+        The content unchanged if it fits the budget, otherwise an excerpt
+    """
+    if token_counter is None:
+        token_counter = RatioTokenCounter(token_ratio) if token_ratio is not None else default_token_counter
+    estimate = token_counter.count
+
+    if estimate(content) <= max_tokens:
+        return content
+
+    lines = content.split('\n')
+    terms = extract_query_terms(query)
+    definitions = extract_definitions(content, os.path.splitext(file_path)[1])
+
+    keep = [False] * len(lines)
+
+    # Imports are cheap and tell the model where symbols come from
+    for i, line in enumerate(lines):
+        if IMPORT_PATTERN.match(line):
+            keep[i] = True
+
+    # Signatures (with decorators) of every definition
+    for definition in definitions:
+        start = definition["start"]
+        keep[start] = True
+        j = start - 1
+        while j >= 0 and lines[j].strip().startswith('@'):
+            keep[j] = True
+            j -= 1
+
+    # Candidate regions ranked by how strongly they match the query
+    candidates = []
+    for definition in definitions:
+        body = "\n".join(lines[definition["start"]:definition["end"]])
+        hits = _count_hits(definition["name"], terms) * 5 + _count_hits(body, terms)
+        if hits:
+            candidates.append((hits, definition["start"], definition["end"]))
+
+    # Matching lines outside any definition, with surrounding lines
+    inside_definition = [False] * len(lines)
+    for definition in definitions:
+        if definition["indent"] == 0:
+            for i in range(definition["start"], definition["end"]):
+                inside_definition[i] = True
+    for i, line in enumerate(lines):
+        if not inside_definition[i]:
+            hits = _count_hits(line, terms)
+            if hits:
+                candidates.append((hits, max(0, i - CONTEXT_LINES), min(len(lines), i + CONTEXT_LINES + 1)))
+
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+    budget_used = estimate("\n".join(line for line, kept in zip(lines, keep) if kept))
+    for _, start, end in candidates:
+        added = [i for i in range(start, end) if not keep[i]]
+        cost = estimate("\n".join(lines[i] for i in added))
+        if budget_used + cost > max_tokens:
+            continue
+        for i in added:
+            keep[i] = True
+        budget_used += cost
+
+    # Render kept lines, collapsing each run of omitted lines to "..."
+    output = []
+    i = 0
+    while i < len(lines):
+        if keep[i]:
+            output.append(lines[i])
+            i += 1
+            continue
+        run_start = i
+        while i < len(lines) and not keep[i]:
+            i += 1
+        if any(line.strip() for line in lines[run_start:i]):
+            first = next(line for line in lines[run_start:i] if line.strip())
+            indent = len(first) - len(first.lstrip())
+            output.append(" " * indent + "...")
+        else:
+            output.extend(lines[run_start:i])
+
+    excerpt = "\n".join(output)
+
+    # Hard cap if even the skeleton exceeds the budget, cutting at the
+    # excerpt's own characters-per-token rate
+    excerpt_tokens = estimate(excerpt)
+    if excerpt_tokens > max_tokens:
+        excerpt = excerpt[:len(excerpt) * max_tokens // excerpt_tokens] + "\n..."
+
+    return f"[Excerpt: {len(lines)} lines reduced to parts relevant to the query]\n{excerpt}"
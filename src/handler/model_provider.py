@@ -1,11 +1,28 @@
 """
 Model provider module for LLM API integrations.
 """
+import asyncio
+import concurrent.futures
+import json
 import os
-from typing import Dict, List, Optional, Union, Any
+import time
+from typing import Dict, Iterator, List, Optional, Union, Any
 
 import anthropic
 
+from handler.client_registry import get_async_client, get_client
+from handler.rate_limiting import (
+    RateLimiter, RetryPolicy, get_rate_limiter, get_retry_after, is_retryable_error
+)
+from handler.request_coalescing import default_singleflight, request_fingerprint
+from memory.token_counting import default_calibration, default_token_counter
+from system.metrics import get_registry
+from system.tracing import bind_context, current_span, traced
+
+LLM_INPUT_TOKENS = get_registry().counter("llm_input_tokens_total", "Input tokens reported by the API", ["model"])
+LLM_OUTPUT_TOKENS = get_registry().counter("llm_output_tokens_total", "Output tokens reported by the API", ["model"])
+
+
 class ProviderAdapter:
     """Base adapter interface for model providers.
     
@@ -29,6 +46,89 @@ class ProviderAdapter:
         """
         raise NotImplementedError("Subclasses must implement send_message")
     
+    def stream_message(self,
+                       messages: List[Dict[str, str]],
+                       system_prompt: str = "",
+                       tools: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """Send a message and yield the response incrementally.
+        
+        Providers without native streaming fall back to this implementation,
+        which sends a buffered request and replays it as events.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to the model
+            tools: Optional list of tool specifications
+            
+        Yields:
+            Events of the form:
+            {"type": "text", "text": str}  # Text delta
+            {"type": "tool_call", "name": str, "parameters": {}}  # Complete tool call
+            {"type": "stop", "stop_reason": str}  # Why the response ended (optional)
+        """
+        response = self.send_message(messages=messages, system_prompt=system_prompt, tools=tools)
+        extracted = self.extract_tool_calls(response)
+        if extracted.get("content"):
+            yield {"type": "text", "text": extracted["content"]}
+        for tool_call in extracted.get("tool_calls", []):
+            yield {"type": "tool_call", **tool_call}
+        if extracted.get("awaiting_tool_response"):
+            yield {"type": "stop", "stop_reason": "tool_use"}
+    
+    async def async_send_message(self,
+                                 messages: List[Dict[str, str]],
+                                 system_prompt: str = "",
+                                 tools: Optional[List[Dict[str, Any]]] = None) -> Union[str, Dict[str, Any]]:
+        """Send a message to the model provider without blocking the event loop.
+        
+        Providers without a native async client fall back to running
+        send_message in a worker thread.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to the model
+            tools: Optional list of tool specifications
+            
+        Returns:
+            Model's response (same format as send_message)
+        """
+        return await asyncio.to_thread(self.send_message, messages, system_prompt, tools)
+    
+    def send_batch(self, requests: List[Dict[str, Any]],
+                   max_workers: Optional[int] = None) -> List[Union[str, Dict[str, Any]]]:
+        """Send many independent requests, returning responses in request order.
+        
+        Providers without a batch API fall back to this local stand-in,
+        which sends the requests concurrently from a thread pool.
+        
+        Args:
+            requests: List of dicts with 'messages' and optional
+                      'system_prompt', 'tools' and 'model' (for providers
+                      whose send_message accepts a model override)
+            max_workers: Optional limit on concurrent requests
+            
+        Returns:
+            One response per request (same format as send_message); failed
+            requests yield an error string
+        """
+        if not requests:
+            return []
+        
+        def send(request):
+            try:
+                model_kwargs = {"model": request["model"]} if request.get("model") else {}
+                return self.send_message(
+                    messages=request["messages"],
+                    system_prompt=request.get("system_prompt", ""),
+                    tools=request.get("tools"),
+                    **model_kwargs
+                )
+            except Exception as e:
+                return f"Error in batch request: {str(e)}"
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or min(8, len(requests))) as executor:
+            return list(executor.map(bind_context(send), requests))
+    
     def extract_tool_calls(self, response: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
         """Extract tool calls from a response into a standardized format.
         
@@ -51,24 +151,73 @@ class ProviderAdapter:
         """
         raise NotImplementedError("Subclasses must implement extract_tool_calls")
 
+def collect_stream(events: Iterator[Dict[str, Any]]) -> Union[str, Dict[str, Any]]:
+    """Collect streamed events into a buffered response.
+    
+    Lets callers that expect send_message results consume a streaming
+    provider; the result is understood by extract_tool_calls.
+    
+    Args:
+        events: Events yielded by stream_message
+        
+    Returns:
+        Response text, or a dict with text and tool calls if any were made
+    """
+    text_parts = []
+    tool_calls = []
+    stop_reason = None
+    for event in events:
+        if event.get("type") == "text":
+            text_parts.append(event.get("text", ""))
+        elif event.get("type") == "tool_call":
+            tool_call = {"name": event.get("name", ""), "input": event.get("parameters", {})}
+            if event.get("id"):
+                tool_call["id"] = event["id"]
+            tool_calls.append(tool_call)
+        elif event.get("type") == "stop":
+            stop_reason = event.get("stop_reason")
+    
+    text = "".join(text_parts)
+    if not tool_calls:
+        return text
+    response = {"text": text, "tool_calls": tool_calls}
+    if stop_reason:
+        response["stop_reason"] = stop_reason
+    return response
+
 class ClaudeProvider(ProviderAdapter):
     """
     Claude API integration for LLM interactions.
     """
-    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-7-sonnet-20250219"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-7-sonnet-20250219",
+                 max_connections: Optional[int] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 coalesce_requests: bool = True):
         """
         Initialize Claude provider with API key and model.
         
         Args:
             api_key: Anthropic API key, defaults to ANTHROPIC_API_KEY environment variable
             model: Claude model to use, defaults to claude-3-7-sonnet
+            max_connections: Optional HTTP connection pool size for the shared client
+            retry_policy: Optional retry policy for transient API errors
+            rate_limiter: Optional rate limiter (defaults to the one shared
+                by all providers using the same API key)
+            coalesce_requests: Whether identical concurrent requests share
+                one upstream call
         """
         self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
         self.model = model
+        self.max_connections = max_connections
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.api_key)
+        self.singleflight = default_singleflight if coalesce_requests else None
         
         # Allow initialization without API key for testing
         if self.api_key:
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+            # Shared across providers so handlers reuse pooled connections
+            self.client = get_client(self.api_key, max_connections)
         else:
             self.client = None
             print("Warning: No API key provided. Running in test/mock mode.")
@@ -79,12 +228,14 @@ class ClaudeProvider(ProviderAdapter):
             "max_tokens": 4000
         }
     
+    @traced("provider.send_message")
     def send_message(self, 
                      messages: List[Dict[str, str]], 
                      system_prompt: str = "", 
                      tools: Optional[List[Dict[str, Any]]] = None,
                      temperature: Optional[float] = None,
-                     max_tokens: Optional[int] = None) -> Union[str, Dict[str, Any]]:
+                     max_tokens: Optional[int] = None,
+                     model: Optional[str] = None) -> Union[str, Dict[str, Any]]:
         """
         Send messages to Claude API and get response.
         
@@ -94,6 +245,7 @@ class ClaudeProvider(ProviderAdapter):
             tools: Optional list of tool specifications in Anthropic format
             temperature: Temperature parameter (0-1), defaults to 0.7
             max_tokens: Maximum tokens in response, defaults to 4000
+            model: Optional model overriding the provider default
             
         Returns:
             Claude's response text or a dict with response and tool call info
@@ -106,44 +258,336 @@ class ClaudeProvider(ProviderAdapter):
             return mock_response
             
         try:
-            # Build request parameters
-            params = {
-                "model": self.model,
-                "system": system_prompt,
-                "messages": messages,
-                "temperature": temperature or self.default_params["temperature"],
-                "max_tokens": max_tokens or self.default_params["max_tokens"]
-            }
+            params = self._build_params(messages, system_prompt, tools, temperature, max_tokens, model)
             
-            # Add tools if provided
-            if tools:
-                params["tools"] = tools
+            request_tokens = self._estimate_request_tokens(params)
+            current_span().set_attribute("model", params.get("model"))
             
-            # Send request to Claude API
-            response = self.client.messages.create(**params)
-            
-            # Check if response contains tool calls
-            if hasattr(response, 'tool_calls') and response.tool_calls:
-                # Return both the text and tool call information
-                return {
-                    "text": response.content[0].text if response.content else "",
-                    "tool_calls": response.tool_calls
-                }
-            
-            # Return just the text for regular responses
-            if hasattr(response, 'content') and response.content:
-                if isinstance(response.content, list) and len(response.content) > 0:
-                    if hasattr(response.content[0], 'text'):
-                        return response.content[0].text
+            def create():
+                # Every attempt, including retries, counts against the shared limits
+                self.rate_limiter.acquire(request_tokens)
+                with self.rate_limiter.slot():
+                    return self.client.messages.create(**params)
             
-            # Fallback for other response formats
-            return "Response processed successfully"
+            # Send request to Claude API, retrying transient failures
+            if self.singleflight:
+                # Identical concurrent requests share one upstream call
+                response, shared = self.singleflight.do(
+                    request_fingerprint(params), lambda: self.retry_policy.call(create))
+                current_span().set_attribute("coalesced", shared)
+            else:
+                response, shared = self.retry_policy.call(create), False
+            if not shared:
+                # Only the request that made the API call records its usage
+                self._record_usage(params, response)
+            return self._parse_response(response)
         except Exception as e:
             # Basic error handling
             error_msg = f"Error calling Claude API: {str(e)}"
             print(error_msg)  # Log the error
             return error_msg
+    
+    async def async_send_message(self,
+                                 messages: List[Dict[str, str]],
+                                 system_prompt: str = "",
+                                 tools: Optional[List[Dict[str, Any]]] = None,
+                                 temperature: Optional[float] = None,
+                                 max_tokens: Optional[int] = None,
+                                 model: Optional[str] = None) -> Union[str, Dict[str, Any]]:
+        """
+        Send messages to Claude API using the shared async client.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to Claude
+            tools: Optional list of tool specifications in Anthropic format
+            temperature: Temperature parameter (0-1)
+            max_tokens: Maximum tokens in response
+            model: Optional model overriding the provider default
+            
+        Returns:
+            Claude's response text or a dict with response and tool call info
+        """
+        # If no client (test mode), return the mock response
+        if self.client is None:
+            return self.send_message(messages, system_prompt, tools, temperature, max_tokens, model)
+        
+        try:
+            params = self._build_params(messages, system_prompt, tools, temperature, max_tokens, model)
+            client = get_async_client(self.api_key, self.max_connections)
+            request_tokens = self._estimate_request_tokens(params)
+            
+            async def create():
+                await self.rate_limiter.async_acquire(request_tokens)
+                async with self.rate_limiter.async_slot():
+                    return await client.messages.create(**params)
+            
+            if self.singleflight:
+                response, shared = await self.singleflight.async_do(
+                    request_fingerprint(params), lambda: self.retry_policy.async_call(create))
+            else:
+                response, shared = await self.retry_policy.async_call(create), False
+            if not shared:
+                self._record_usage(params, response)
+            return self._parse_response(response)
+        except Exception as e:
+            error_msg = f"Error calling Claude API: {str(e)}"
+            print(error_msg)
+            return error_msg
+    
+    def send_batch(self, requests: List[Dict[str, Any]],
+                   max_workers: Optional[int] = None,
+                   poll_interval: float = 30.0,
+                   timeout: Optional[float] = None) -> List[Union[str, Dict[str, Any]]]:
+        """
+        Send many requests as one Message Batches job.
+        
+        Batches are processed asynchronously at reduced cost and outside the
+        interactive rate limits, so they suit bulk, throughput-oriented work.
+        This call blocks, polling until the batch has ended.
+        
+        Args:
+            requests: List of dicts with 'messages' and optional 'system_prompt',
+                      'tools', 'temperature', 'max_tokens' and 'model'
+            max_workers: Unused; batches are processed server-side
+            poll_interval: Seconds between status checks
+            timeout: Optional seconds to wait before cancelling the batch
+            
+        Returns:
+            One response per request, in request order; requests that failed,
+            expired or were cancelled yield an error string
+        """
+        if not requests:
+            return []
+        # Test mode: fall back to the local stand-in
+        if self.client is None:
+            return super().send_batch(requests, max_workers)
+        
+        try:
+            batch_requests = []
+            for i, request in enumerate(requests):
+                batch_requests.append({
+                    "custom_id": f"request-{i}",
+                    "params": self._build_params(
+                        request["messages"],
+                        request.get("system_prompt", ""),
+                        request.get("tools"),
+                        request.get("temperature"),
+                        request.get("max_tokens"),
+                        request.get("model")
+                    )
+                })
+            
+            batch = self.retry_policy.call(lambda: self.client.messages.batches.create(requests=batch_requests))
+            started = time.monotonic()
+            cancelled = False
+            while getattr(batch, "processing_status", None) != "ended":
+                if timeout is not None and not cancelled and time.monotonic() - started > timeout:
+                    # Requests still processing end as "canceled"; keep polling until they do
+                    self.client.messages.batches.cancel(batch.id)
+                    cancelled = True
+                self.retry_policy.sleep(poll_interval)
+                batch = self.retry_policy.call(lambda: self.client.messages.batches.retrieve(batch.id))
+            
+            results: List[Union[str, Dict[str, Any]]] = [
+                "Error calling Claude API: batch request missing from results"
+            ] * len(requests)
+            for entry in self.client.messages.batches.results(batch.id):
+                index = int(entry.custom_id.rsplit("-", 1)[1])
+                result = entry.result
+                if result.type == "succeeded":
+                    results[index] = self._parse_response(result.message)
+                else:
+                    detail = getattr(result, "error", None) or result.type
+                    results[index] = f"Error calling Claude API: batch request {result.type}: {detail}"
+            return results
+        except Exception as e:
+            error_msg = f"Error calling Claude API: {str(e)}"
+            print(error_msg)
+            return [error_msg] * len(requests)
+    
+    def _parse_response(self, response: Any) -> Union[str, Dict[str, Any]]:
+        """Convert a Messages API response to the send_message result format."""
+        # Check if response contains tool calls
+        if hasattr(response, 'tool_calls') and response.tool_calls:
+            # Return both the text and tool call information
+            return {
+                "text": response.content[0].text if response.content else "",
+                "tool_calls": response.tool_calls
+            }
+        
+        content = getattr(response, 'content', None)
+        if isinstance(content, list) and content:
+            # Messages API responses hold text and tool_use content blocks
+            text_parts = []
+            tool_calls = []
+            for block in content:
+                if getattr(block, 'type', None) == "tool_use":
+                    tool_calls.append({"id": block.id, "name": block.name, "input": block.input})
+                elif isinstance(getattr(block, 'text', None), str):
+                    text_parts.append(block.text)
+            
+            if tool_calls:
+                result = {"text": "".join(text_parts), "tool_calls": tool_calls}
+                if isinstance(getattr(response, 'stop_reason', None), str):
+                    result["stop_reason"] = response.stop_reason
+                return result
             
+            # Return just the text for regular responses
+            if text_parts:
+                return "".join(text_parts)
+        
+        # Fallback for other response formats
+        return "Response processed successfully"
+    
+    @staticmethod
+    def _record_usage(params: Dict[str, Any], response: Any) -> None:
+        """Calibrate local token counting with the input tokens the API reports."""
+        usage = getattr(response, "usage", None)
+        reported = getattr(usage, "input_tokens", None)
+        if not isinstance(reported, int):
+            return
+        model = params.get("model")
+        current_span().set_attribute("input_tokens", reported)
+        LLM_INPUT_TOKENS.labels(model).inc(reported)
+        output_tokens = getattr(usage, "output_tokens", None)
+        if isinstance(output_tokens, int):
+            current_span().set_attribute("output_tokens", output_tokens)
+            LLM_OUTPUT_TOKENS.labels(model).inc(output_tokens)
+        text = ClaudeProvider._calibration_text(params)
+        if text is not None:
+            default_calibration.record(default_token_counter.count_raw(text), reported)
+    
+    @staticmethod
+    def _calibration_text(params: Dict[str, Any]) -> Optional[str]:
+        """Get the text of a request whose reported input tokens calibrate local counting.
+        
+        Requests with tools are skipped: the API adds a tool-use prompt of
+        its own to them, which no local text accounts for. So are requests
+        with non-text blocks such as images.
+        
+        Returns:
+            Request text, or None if the request is not a usable sample
+        """
+        if params.get("tools"):
+            return None
+        parts = [params.get("system") or ""]
+        
+        def add_content(content: Any) -> bool:
+            if isinstance(content, str):
+                parts.append(content)
+                return True
+            if not isinstance(content, list):
+                return False
+            for block in content:
+                block_type = block.get("type") if isinstance(block, dict) else None
+                if block_type == "text":
+                    parts.append(block.get("text", ""))
+                elif block_type == "tool_use":
+                    parts.append(block.get("name", "") + json.dumps(block.get("input", {})))
+                elif block_type == "tool_result":
+                    if not add_content(block.get("content", "")):
+                        return False
+                else:
+                    return False
+            return True
+        
+        for message in params.get("messages", []):
+            if not add_content(message.get("content", "")):
+                return None
+        return "".join(parts)
+    
+    @staticmethod
+    def _estimate_request_tokens(params: Dict[str, Any]) -> int:
+        """Estimate the input tokens of a request for rate limiting."""
+        chars = len(params.get("system") or "")
+        for message in params.get("messages", []):
+            chars += len(str(message.get("content", "")))
+        return chars // 4
+    
+    def _build_params(self,
+                      messages: List[Dict[str, str]],
+                      system_prompt: str = "",
+                      tools: Optional[List[Dict[str, Any]]] = None,
+                      temperature: Optional[float] = None,
+                      max_tokens: Optional[int] = None,
+                      model: Optional[str] = None) -> Dict[str, Any]:
+        """Build the request parameters for the Messages API."""
+        params = {
+            "model": model or self.model,
+            "system": system_prompt,
+            "messages": messages,
+            "temperature": temperature or self.default_params["temperature"],
+            "max_tokens": max_tokens or self.default_params["max_tokens"]
+        }
+        
+        # Add tools if provided
+        if tools:
+            params["tools"] = tools
+        return params
+    
+    def stream_message(self,
+                       messages: List[Dict[str, str]],
+                       system_prompt: str = "",
+                       tools: Optional[List[Dict[str, Any]]] = None,
+                       temperature: Optional[float] = None,
+                       max_tokens: Optional[int] = None,
+                       model: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream a response from the Claude API.
+        
+        Text deltas are yielded as they arrive; tool calls are yielded once
+        their input is complete.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to Claude
+            tools: Optional list of tool specifications in Anthropic format
+            temperature: Temperature parameter (0-1)
+            max_tokens: Maximum tokens in response
+            model: Optional model overriding the provider default
+            
+        Yields:
+            Text and tool call events (see ProviderAdapter.stream_message)
+        """
+        # Test mode: replay the mock response
+        if self.client is None:
+            yield {"type": "text", "text": self.send_message(messages, system_prompt, tools)}
+            return
+        
+        try:
+            params = self._build_params(messages, system_prompt, tools, temperature, max_tokens, model)
+            request_tokens = self._estimate_request_tokens(params)
+            attempt = 0
+            while True:
+                streamed = False
+                try:
+                    self.rate_limiter.acquire(request_tokens)
+                    with self.rate_limiter.slot(), self.client.messages.stream(**params) as stream:
+                        for text in stream.text_stream:
+                            streamed = True
+                            yield {"type": "text", "text": text}
+                        final_message = stream.get_final_message()
+                    break
+                except Exception as e:
+                    # Text already yielded cannot be taken back, so only a stream
+                    # that failed before its first event is retried
+                    policy = self.retry_policy
+                    if streamed or attempt >= policy.max_retries or not is_retryable_error(e):
+                        raise
+                    policy.sleep(policy.compute_delay(attempt, get_retry_after(e)))
+                    attempt += 1
+            self._record_usage(params, final_message)
+            
+            for block in final_message.content:
+                if getattr(block, "type", None) == "tool_use":
+                    yield {"type": "tool_call", "name": block.name, "parameters": block.input, "id": block.id}
+            yield {"type": "stop", "stop_reason": final_message.stop_reason}
+        except Exception as e:
+            # Same error reporting as send_message
+            error_msg = f"Error calling Claude API: {str(e)}"
+            print(error_msg)
+            yield {"type": "text", "text": error_msg}
+    
     def extract_tool_calls(self, response: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
         """Extract tool calls from a response into a standardized format.
         
@@ -158,6 +602,7 @@ class ClaudeProvider(ProviderAdapter):
                     {
                         "name": str,      # Tool name
                         "parameters": {},  # Tool parameters
+                        "id": str,        # Tool use id (native tool calls only)
                     },
                     ...
                 ],
@@ -197,10 +642,14 @@ class ClaudeProvider(ProviderAdapter):
                         parameters = tool_call.get("input", {})
                         
                         if name:
-                            result["tool_calls"].append({
+                            tool_call_info = {
                                 "name": name,
                                 "parameters": parameters
-                            })
+                            }
+                            # Ids link tool results back to the call
+                            if tool_call.get("id"):
+                                tool_call_info["id"] = tool_call["id"]
+                            result["tool_calls"].append(tool_call_info)
             
             # Check if model is awaiting tool response
             # Claude indicates this with stop_reason="tool_use"
@@ -0,0 +1,242 @@
+"""
+Routing of model requests to models by task class, task type and template.
+"""
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from handler.model_provider import ProviderAdapter
+from system.metrics import get_registry
+
+# Task classes
+RETRIEVAL = "retrieval"  # Associative matching and shard calls: high volume, simple
+ANSWER = "answer"        # Final answers to the user
+
+# Default candidates per task class, tried in order. None stands for the
+# provider's own default model.
+DEFAULT_ROUTES: Dict[str, List[Optional[str]]] = {
+    RETRIEVAL: ["claude-3-5-haiku-latest"],
+    ANSWER: [None],
+}
+
+# Model names used in template "model" declarations mapped to API model ids
+MODEL_ALIASES = {
+    "claude-3-haiku": "claude-3-haiku-20240307",
+    "claude-3-5-haiku": "claude-3-5-haiku-latest",
+    "claude-3-5-sonnet": "claude-3-5-sonnet-latest",
+    "claude-3-7-sonnet": "claude-3-7-sonnet-latest",
+}
+
+# Provider error strings that trigger a fallback to the next model
+ERROR_PREFIX = "Error calling"
+
+LLM_REQUEST_SECONDS = get_registry().histogram(
+    "llm_request_seconds", "Latency of model requests, including fallbacks, by template", ["template"])
+LLM_FALLBACKS = get_registry().counter("llm_fallbacks_total", "Model requests retried on a fallback model")
+
+
+def _accepts_model(provider: ProviderAdapter, method: str = "send_message") -> bool:
+    """Check whether a provider method takes a model override."""
+    try:
+        parameters = inspect.signature(getattr(provider, method)).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return "model" in parameters or any(p.kind == p.VAR_KEYWORD for p in parameters.values())
+
+
+def _is_error(response: Any) -> bool:
+    return isinstance(response, str) and response.startswith(ERROR_PREFIX)
+
+
+class ModelRouter:
+    """Chooses models for requests, falling back on errors or overload.
+
+    Candidates for a request come from, in order:
+    1. A route configured for the template name (e.g. "find_relevant_files")
+    2. A route configured for the task type (e.g. "atomic:associative_matching")
+    3. The route for the task class (e.g. "retrieval")
+    4. The template's own "model" preferences and fallbacks
+    5. The provider's default model
+
+    Routes map to a model id or a list of model ids.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Union[str, List[Optional[str]]]]] = None,
+                 aliases: Optional[Dict[str, str]] = None):
+        """Initialize the router.
+
+        Args:
+            routes: Optional routes by template name, task type or task class
+            aliases: Optional extra model name aliases
+        """
+        self.routes: Dict[str, List[Optional[str]]] = dict(DEFAULT_ROUTES)
+        for key, models in (routes or {}).items():
+            self.routes[key] = [models] if isinstance(models, str) or models is None else list(models)
+        self.aliases = {**MODEL_ALIASES, **(aliases or {})}
+        self.stats = {"requests": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ModelRouter":
+        """Create a router from handler configuration ("model_routes", "model_aliases")."""
+        return cls(config.get("model_routes"), config.get("model_aliases"))
+
+    def _template_models(self, template: Optional[Dict[str, Any]]) -> List[str]:
+        """Get the API model ids a template declares, skipping unknown names."""
+        preference = template.get("model") if isinstance(template, dict) else None
+        if isinstance(preference, str):
+            names = [preference]
+        elif isinstance(preference, dict):
+            names = [preference.get("preferred")] + list(preference.get("fallback") or [])
+        else:
+            names = []
+        # Only names that map to a model this provider family serves
+        return [self.aliases[name] for name in names if name in self.aliases]
+
+    def candidates(self, task_class: str = ANSWER,
+                   template: Optional[Dict[str, Any]] = None) -> List[Optional[str]]:
+        """Get the models to try for a request, in order.
+
+        Args:
+            task_class: Task class (RETRIEVAL or ANSWER)
+            template: Optional template the request is made for
+
+        Returns:
+            Model ids without duplicates; None means the provider default
+        """
+        models: List[Optional[str]] = []
+        if isinstance(template, dict):
+            for key in (template.get("name"), f"{template.get('type')}:{template.get('subtype')}"):
+                if key in self.routes:
+                    models.extend(self.routes[key])
+                    break
+        models.extend(self.routes.get(task_class, [None]))
+        models.extend(self._template_models(template))
+        models.append(None)
+
+        unique = []
+        for model in models:
+            if model not in unique:
+                unique.append(model)
+        return unique
+
+    def send_message(self, provider: ProviderAdapter, messages: List[Dict[str, Any]],
+                     system_prompt: str = "", tools: Optional[List[Dict[str, Any]]] = None,
+                     task_class: str = ANSWER,
+                     template: Optional[Dict[str, Any]] = None) -> Union[str, Dict[str, Any]]:
+        """Send a message through the routed models, falling back on errors.
+
+        Args:
+            provider: Provider adapter sending the request
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt
+            tools: Optional list of tool specifications
+            task_class: Task class (RETRIEVAL or ANSWER)
+            template: Optional template the request is made for
+
+        Returns:
+            Response of the first model that succeeds (or the last error)
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+        start = time.perf_counter()
+        try:
+            if not _accepts_model(provider):
+                return provider.send_message(messages=messages, system_prompt=system_prompt, tools=tools)
+            return self._send_with_fallback(provider, self.candidates(task_class, template),
+                                            messages, system_prompt, tools)
+        finally:
+            LLM_REQUEST_SECONDS.labels((template or {}).get("name") or task_class).observe(
+                time.perf_counter() - start)
+
+    def _send_with_fallback(self, provider: ProviderAdapter, models: List[Optional[str]],
+                            messages: List[Dict[str, Any]], system_prompt: str,
+                            tools: Optional[List[Dict[str, Any]]]) -> Union[str, Dict[str, Any]]:
+        """Try models in order until one responds without an error."""
+        for i, model in enumerate(models):
+            last = i == len(models) - 1
+            kwargs = {"model": model} if model else {}
+            try:
+                response = provider.send_message(messages=messages, system_prompt=system_prompt,
+                                                 tools=tools, **kwargs)
+            except Exception as e:
+                if last:
+                    raise
+                logging.warning("Model %s failed (%s), falling back", model or "default", e)
+            else:
+                if last or not _is_error(response):
+                    return response
+                logging.warning("Model %s failed, falling back: %s", model or "default", response[:200])
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            LLM_FALLBACKS.inc()
+
+    def select(self, provider: ProviderAdapter, task_class: str = ANSWER,
+               template: Optional[Dict[str, Any]] = None,
+               method: str = "send_message") -> Dict[str, Any]:
+        """Get provider keyword arguments selecting the first routed model.
+
+        For requests that cannot fall back transparently (e.g. streaming).
+
+        Args:
+            provider: Provider adapter sending the request
+            task_class: Task class (RETRIEVAL or ANSWER)
+            template: Optional template the request is made for
+            method: Provider method the arguments are for
+
+        Returns:
+            {"model": id} or an empty dict for the provider default
+        """
+        model = self.candidates(task_class, template)[0]
+        return {"model": model} if model and _accepts_model(provider, method) else {}
+
+    def send_batch(self, provider: ProviderAdapter, requests: List[Dict[str, Any]],
+                   task_class: str = ANSWER,
+                   template: Optional[Dict[str, Any]] = None) -> List[Union[str, Dict[str, Any]]]:
+        """Send a batch with the first routed model, retrying failures with fallbacks.
+
+        Args:
+            provider: Provider adapter sending the requests
+            requests: Batch requests (see ProviderAdapter.send_batch)
+            task_class: Task class (RETRIEVAL or ANSWER)
+            template: Optional template the requests are made for
+
+        Returns:
+            One response per request, in request order
+        """
+        with self._lock:
+            self.stats["requests"] += len(requests)
+        if not _accepts_model(provider):
+            return provider.send_batch(requests)
+
+        models = self.candidates(task_class, template)
+        model_kwargs = {"model": models[0]} if models[0] else {}
+        responses = provider.send_batch([{**request, **model_kwargs} for request in requests])
+        if len(models) < 2:
+            return responses
+
+        # Retry failed requests one by one with the remaining models
+        for i, response in enumerate(responses):
+            if _is_error(response):
+                with self._lock:
+                    self.stats["fallbacks"] += 1
+                request = requests[i]
+                responses[i] = self._send_with_fallback(
+                    provider, models[1:], request["messages"],
+                    request.get("system_prompt", ""), request.get("tools"))
+        return responses
+
+
+def get_model_router(handler: Any) -> ModelRouter:
+    """Get a handler's model router, or a router with the default routes.
+
+    Args:
+        handler: Handler instance (may lack a router, e.g. mocks)
+
+    Returns:
+        ModelRouter instance
+    """
+    router = getattr(handler, "model_router", None)
+    return router if isinstance(router, ModelRouter) else ModelRouter()
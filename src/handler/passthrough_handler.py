@@ -1,8 +1,16 @@
 """Passthrough handler for processing raw text queries."""
-from typing import Dict, Any, Optional, List, Union
+import concurrent.futures
+import time
+from typing import Callable, Dict, Any, Optional, List, Tuple, Union
 
 from handler.base_handler import BaseHandler
+from handler.model_router import ANSWER
 from handler.command_executor import execute_command_safely, parse_file_paths_from_output
+from memory.context_packing import PackedContext
+from system.tracing import bind_context
+
+# Marks that no template lookup has been done yet for a query
+_NOT_MATCHED = object()
 
 class PassthroughHandler(BaseHandler):
     """Handles raw text queries without AST compilation.
@@ -11,6 +19,9 @@ class PassthroughHandler(BaseHandler):
     while maintaining conversation state and context management.
     """
     
+    # Stages of a query that run concurrently (see _run_query_stages)
+    QUERY_STAGES = ("retrieval", "template_match", "speculative_read")
+    
     def __init__(self, task_system, memory_system, model_provider=None, config=None):
         """Initialize the passthrough handler.
         
@@ -24,6 +35,10 @@ class PassthroughHandler(BaseHandler):
         
         # Passthrough-specific attributes
         self.active_subtask_id = None
+        # File versions sent in the active subtask: path -> (content hash, history index)
+        self.sent_files: Dict[str, Tuple[str, int]] = {}
+        # Files retrieved for the previous query, read speculatively on the next one
+        self.last_relevant_files: List[str] = []
         
         # Extend base system prompt with passthrough-specific instructions
         passthrough_extension = """
@@ -51,7 +66,7 @@ class PassthroughHandler(BaseHandler):
         # Register built-in tools
         self.register_command_execution_tool()
     
-    def handle_query(self, query: str) -> Dict[str, Any]:
+    def handle_query(self, query: str, stream_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """Handle a raw text query in passthrough mode.
         
         Creates or continues a subtask for the query, maintaining
@@ -59,6 +74,8 @@ class PassthroughHandler(BaseHandler):
         
         Args:
             query: Raw text query from the user
+            stream_callback: Optional callback receiving response text
+                deltas as they stream in
             
         Returns:
             Task result containing the response
@@ -68,21 +85,35 @@ class PassthroughHandler(BaseHandler):
         # Add user message to conversation history
         self.conversation_history.append({"role": "user", "content": query})
         
-        # Get relevant files from memory system based on query
-        relevant_files = self._get_relevant_files(query)
+        # Retrieval, template matching and reading the previous query's files
+        # are independent, so they run as concurrent stages
+        stage_timings: Dict[str, float] = {}
+        relevant_files, template, prefetched = self._run_query_stages(query, stage_timings)
         self.log_debug(f"Found relevant files: {relevant_files}")
+        self.last_relevant_files = relevant_files
         
         # Check if query is an Aider command
         is_aider_command = query.startswith("/aider")
         if is_aider_command:
             self.log_debug("Detected Aider command")
         
+        start = time.perf_counter()
         if not self.active_subtask_id:
             self.log_debug("Creating new subtask")
-            result = self._create_new_subtask(query, relevant_files)
+            result = self._create_new_subtask(query, relevant_files, stream_callback, template, prefetched)
         else:
             self.log_debug(f"Continuing subtask: {self.active_subtask_id}")
-            result = self._continue_subtask(query, relevant_files)
+            result = self._continue_subtask(query, relevant_files, stream_callback, template, prefetched)
+        stage_timings["respond"] = time.perf_counter() - start
+        
+        # The critical path is the slowest concurrent stage followed by the response
+        concurrent_stages = {k: v for k, v in stage_timings.items() if k in self.QUERY_STAGES}
+        critical_stage = max(concurrent_stages, key=concurrent_stages.get) if concurrent_stages else None
+        result.setdefault("metadata", {})["stage_timings"] = {
+            **{stage: round(seconds, 4) for stage, seconds in stage_timings.items()},
+            "critical_path": [stage for stage in (critical_stage, "respond") if stage]
+        }
+        self.log_debug(f"Query stage timings: {result['metadata']['stage_timings']}")
             
         # Add assistant response to conversation history
         self.conversation_history.append({"role": "assistant", "content": result["content"]})
@@ -90,6 +121,52 @@ class PassthroughHandler(BaseHandler):
         self.log_debug(f"Query processing complete. Status: {result.get('status', 'unknown')}")
         return result
     
+    def _run_query_stages(self, query: str,
+                          stage_timings: Dict[str, float]) -> Tuple[List[str], Optional[Dict[str, Any]], Dict[str, Optional[str]]]:
+        """Run the independent stages of a query concurrently.
+        
+        Context retrieval (one or more model calls), template matching and
+        reading the files retrieved for the previous query don't depend on
+        each other, so the query waits only for the slowest of them. Files
+        read speculatively are reused when they are retrieved again, which
+        is common for follow-up queries.
+        
+        Args:
+            query: User query
+            stage_timings: Dict receiving the duration of each stage in seconds
+            
+        Returns:
+            Tuple of (relevant file paths, matching template or None,
+            speculatively read file contents by path)
+        """
+        def timed(stage: str, func: Callable, *args) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                stage_timings[stage] = time.perf_counter() - start
+        
+        previous_files = list(self.last_relevant_files)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.QUERY_STAGES)) as executor:
+            timed = bind_context(timed)
+            retrieval = executor.submit(timed, "retrieval", self._get_relevant_files, query)
+            template_match = executor.submit(timed, "template_match", self._find_matching_template, query)
+            speculative_read = None
+            if previous_files:
+                speculative_read = executor.submit(timed, "speculative_read", self._read_files, previous_files)
+            
+            relevant_files = retrieval.result()
+            template = template_match.result()
+            prefetched = {}
+            if speculative_read:
+                try:
+                    prefetched = dict(zip(previous_files, speculative_read.result()))
+                except Exception as e:
+                    # Speculation only saves time; the files are read again if needed
+                    self.log_debug(f"Speculative file read failed: {str(e)}")
+        
+        return relevant_files, template, prefetched
+    
     def _find_matching_template(self, query: str):
         """Find a matching template for the query using ContextGenerationInput.
         
@@ -134,12 +211,18 @@ class PassthroughHandler(BaseHandler):
             self.log_debug(f"Error finding matching template: {str(e)}")
             return None
     
-    def _create_new_subtask(self, query: str, relevant_files: List[str]) -> Dict[str, Any]:
+    def _create_new_subtask(self, query: str, relevant_files: List[str],
+                            stream_callback: Optional[Callable[[str], None]] = None,
+                            template: Any = _NOT_MATCHED,
+                            prefetched: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
         """Create a new subtask for the initial query.
         
         Args:
             query: Initial query from the user
             relevant_files: List of relevant file paths
+            stream_callback: Optional callback receiving response text deltas
+            template: Matching template (or None) if already looked up
+            prefetched: Optional file contents already read, by path
             
         Returns:
             Task result from the subtask
@@ -148,18 +231,22 @@ class PassthroughHandler(BaseHandler):
         self.active_subtask_id = f"subtask_{len(self.conversation_history)}"
         
         # Find matching template
-        template = self._find_matching_template(query)
+        if template is _NOT_MATCHED:
+            template = self._find_matching_template(query)
         
-        # Create file context
-        file_context = self._create_file_context(relevant_files)
+        # Pack file context into the token budget and attach it to the query
+        self.sent_files = {}
+        packed = self._pack_file_context(relevant_files, query, prefetched=prefetched)
+        self._attach_file_context(packed)
         
         # Send to model and get response
-        response_text = self._send_to_model(query, file_context, template)
+        response_text = self._send_to_model(query, "", template, stream_callback)
         
         # Prepare metadata
         metadata = {
             "subtask_id": self.active_subtask_id,
-            "relevant_files": relevant_files
+            "relevant_files": relevant_files,
+            "context_packing": packed.to_notes()
         }
         
         # Add template info if available
@@ -176,54 +263,152 @@ class PassthroughHandler(BaseHandler):
             "metadata": metadata
         }
     
-    def _continue_subtask(self, query: str, relevant_files: List[str]) -> Dict[str, Any]:
+    def _continue_subtask(self, query: str, relevant_files: List[str],
+                          stream_callback: Optional[Callable[[str], None]] = None,
+                          template: Any = _NOT_MATCHED,
+                          prefetched: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
         """Continue an existing subtask with a follow-up query.
         
         Args:
             query: Follow-up query from the user
             relevant_files: List of relevant file paths
+            stream_callback: Optional callback receiving response text deltas
+            template: Matching template (or None) if already looked up
+            prefetched: Optional file contents already read, by path
             
         Returns:
             Task result from the continued subtask
         """
         # Find matching template
-        template = self._find_matching_template(query)
+        if template is _NOT_MATCHED:
+            template = self._find_matching_template(query)
         
-        # Create file context
-        file_context = self._create_file_context(relevant_files)
+        # Only send files that are new or changed since earlier turns
+        packed = self._pack_delta_file_context(relevant_files, query, prefetched)
+        self._attach_file_context(packed)
         
         # Send to model and get response
-        response_text = self._send_to_model(query, file_context, template)
+        response_text = self._send_to_model(query, "", template, stream_callback)
         
         return {
             "status": "success",
             "content": response_text,
             "metadata": {
                 "subtask_id": self.active_subtask_id,
-                "relevant_files": relevant_files
+                "relevant_files": relevant_files,
+                "context_packing": packed.to_notes()
             }
         }
     
-    def _send_to_model(self, query: str, file_context: str, template=None) -> str:
+    def _pack_delta_file_context(self, relevant_files: List[str], query: str,
+                                 prefetched: Optional[Dict[str, Optional[str]]] = None) -> PackedContext:
+        """Pack only the files the model has not seen in this subtask.
+        
+        File contents travel with the user message of the turn that sent
+        them, so a file only counts as already sent while that message is
+        still kept verbatim by the history manager. Adding this turn's
+        context may push older messages into the summary, so the set of
+        already-sent files is re-checked against the resulting window.
+        
+        Args:
+            relevant_files: List of relevant file paths
+            query: Query used to excerpt oversized files
+            prefetched: Optional file contents already read, by path
+            
+        Returns:
+            PackedContext referencing unchanged files by name only
+        """
+        window_start = self.history_manager.window_start(self.conversation_history)
+        for _ in range(3):
+            sent_versions = {
+                path: version for path, (version, index) in self.sent_files.items()
+                if index >= window_start
+            }
+            packed = self._pack_file_context(relevant_files, query, sent_versions, prefetched)
+            if not packed.unchanged:
+                return packed
+            
+            added_tokens = self.history_manager.estimate_tokens({"content": "", "file_context": packed.text})
+            new_start = self.history_manager.window_start(self.conversation_history, added_tokens)
+            if new_start == window_start:
+                return packed
+            window_start = new_start
+        
+        # Compaction keeps moving: send everything in full
+        return self._pack_file_context(relevant_files, query, prefetched=prefetched)
+    
+    def _attach_file_context(self, packed: PackedContext) -> None:
+        """Attach packed file context to the pending user message.
+        
+        Args:
+            packed: Packed file context for the current turn
+        """
+        if not self.conversation_history or self.conversation_history[-1].get("role") != "user":
+            return
+        
+        index = len(self.conversation_history) - 1
+        if packed.text:
+            self.conversation_history[index]["file_context"] = packed.text
+        for path, version in packed.versions.items():
+            self.sent_files[path] = (version, index)
+    
+    def _stream_from_model(self, messages: List[Dict[str, Any]], system_prompt: str,
+                           tools: Optional[List[Dict[str, Any]]],
+                           stream_callback: Callable[[str], None],
+                           template=None) -> Tuple[str, Dict[str, Any]]:
+        """Stream a response from the model, forwarding text deltas.
+        
+        Streams use the first routed model only: text already forwarded
+        cannot be taken back to retry with a fallback model.
+        
+        Args:
+            messages: Formatted conversation messages
+            system_prompt: Complete system prompt
+            tools: Optional tool specifications
+            stream_callback: Called with each text delta
+            template: Optional template the response is for (model routing)
+            
+        Returns:
+            Tuple of (full response text, extracted tool call information)
+        """
+        text_parts = []
+        tool_calls = []
+        awaiting_tool_response = False
+        model_kwargs = self.model_router.select(self.model_provider, ANSWER, template, "stream_message")
+        for event in self.model_provider.stream_message(
+                messages=messages, system_prompt=system_prompt, tools=tools, **model_kwargs):
+            if event.get("type") == "text":
+                text_parts.append(event["text"])
+                stream_callback(event["text"])
+            elif event.get("type") == "tool_call":
+                tool_call = {"name": event.get("name"), "parameters": event.get("parameters", {})}
+                if event.get("id"):
+                    tool_call["id"] = event["id"]
+                tool_calls.append(tool_call)
+            elif event.get("type") == "stop":
+                awaiting_tool_response = event.get("stop_reason") == "tool_use"
+        
+        content = "".join(text_parts)
+        return content, {"content": content, "tool_calls": tool_calls,
+                         "awaiting_tool_response": awaiting_tool_response}
+    
+    def _send_to_model(self, query: str, file_context: str, template=None,
+                       stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Send query to model and get response.
         
         Args:
             query: User's query
             file_context: Context string with file information
             template: Optional template with system_prompt
+            stream_callback: Optional callback receiving text deltas as
+                the response streams in
             
         Returns:
             Model response text
         """
         self.log_debug(f"Sending query to model: '{query[:50]}...' with {len(self.tool_executors)} registered tools")
-        # Format conversation history for provider
-        formatted_messages = [
-            {
-                "role": msg["role"],
-                "content": msg["content"]
-            }
-            for msg in self.conversation_history
-        ]
+        # Format conversation history for provider, compacting older turns
+        formatted_messages = self.history_manager.get_messages(self.conversation_history)
         
         # Build system prompt using hierarchical pattern
         system_prompt = self._build_system_prompt(template, file_context)
@@ -234,39 +419,59 @@ class PassthroughHandler(BaseHandler):
         if tools:
             self.log_debug(f"Available tools: {[t['name'] for t in tools]}")
         
+        prompt_tokens = self.token_counter.count(system_prompt) + sum(
+            self.token_counter.count(str(message["content"])) for message in formatted_messages)
+        self.log_debug(f"Estimated prompt tokens: {prompt_tokens}")
+        
         try:
-            # Send to model
-            response = self.model_provider.send_message(
-                messages=formatted_messages,
-                system_prompt=system_prompt,
-                tools=tools
-            )
-            
-            # Extract tool calls using provider adapter
-            extracted = self.model_provider.extract_tool_calls(response)
-            content = extracted.get("content", "")
-            tool_calls = extracted.get("tool_calls", [])
+            # Tool use loop: while the model waits on tool results, run the
+            # requested tools and send the results back, for at most
+            # config "max_tool_rounds" rounds
+            max_tool_rounds = self.config.get("max_tool_rounds", 5)
+            messages = list(formatted_messages)
+            for round_number in range(max_tool_rounds + 1):
+                if stream_callback:
+                    # Stream text to the caller as it arrives
+                    response, extracted = self._stream_from_model(
+                        messages, system_prompt, tools, stream_callback, template)
+                else:
+                    # Send to the model routed for final answers, falling back on errors
+                    response = self.model_router.send_message(
+                        self.model_provider,
+                        messages=messages,
+                        system_prompt=system_prompt,
+                        tools=tools,
+                        task_class=ANSWER,
+                        template=template
+                    )
+                    
+                    # Extract tool calls using provider adapter
+                    extracted = self.model_provider.extract_tool_calls(response)
+                content = extracted.get("content", "")
+                tool_calls = extracted.get("tool_calls", [])
+                
+                if not (tool_calls and extracted.get("awaiting_tool_response", False)):
+                    break
+                if round_number == max_tool_rounds:
+                    self.log_debug(f"Stopping tool use after {max_tool_rounds} rounds")
+                    return content or f"Stopped after {max_tool_rounds} rounds of tool use without a final answer."
+                
+                # Independent tool calls from one response run concurrently
+                self.log_debug(f"Executing {len(tool_calls)} tool calls (round {round_number + 1})")
+                tool_results = self._execute_tool_calls(tool_calls)
+                messages.extend(self._format_tool_round(content, tool_calls, tool_results, round_number))
             
-            # Check for tool calls
+            # Tool calls the model does not wait on: only the first one that
+            # runs is answered, so run them in order and stop there
             if tool_calls:
                 self.log_debug(f"Found {len(tool_calls)} tool calls")
                 for tool_call in tool_calls:
-                    tool_name = tool_call.get("name")
-                    tool_params = tool_call.get("parameters")
-                    
-                    self.log_debug(f"Executing tool {tool_name}")
-                    tool_result = self._execute_tool(tool_name, tool_params)
-                    
+                    self.log_debug(f"Executing tool {tool_call.get('name')}")
+                    tool_result = self._execute_tool(tool_call.get("name"), tool_call.get("parameters"))
                     if tool_result:
                         self.log_debug("Tool was executed, returning tool result")
                         return tool_result.get("content", f"Tool execution completed: {tool_result.get('status', 'unknown')}")
             
-            # Check if the model is awaiting a tool response (provider-specific handling)
-            if extracted.get("awaiting_tool_response", False):
-                # In a complete implementation, this would handle multi-step tool interactions
-                # For now, just inform the user that tool calls need to be handled
-                return "The model is requesting to use a tool, but multi-step tool interactions are not fully implemented yet."
-            
             # Return the regular response if no tool was executed
             if not content and isinstance(response, str):
                 # Fallback if extraction doesn't return content
@@ -277,6 +482,44 @@ class PassthroughHandler(BaseHandler):
             print(f"Error sending to model: {str(e)}")
             return f"Processed query: {query}"
         
+    def _format_tool_round(self, content: str, tool_calls: List[Dict[str, Any]],
+                           tool_results: List[Optional[Dict[str, Any]]],
+                           round_number: int) -> List[Dict[str, Any]]:
+        """Format one round of tool use as messages for the next request.
+        
+        Args:
+            content: Text the model sent along with its tool calls
+            tool_calls: Tool calls from the model's response
+            tool_results: Results of the tool calls, in call order
+            round_number: Zero-based tool use round (for generated ids)
+            
+        Returns:
+            Assistant message with the tool_use blocks and a user message
+            with the matching tool_result blocks
+        """
+        assistant_content = [{"type": "text", "text": content}] if content else []
+        result_content = []
+        for i, (tool_call, tool_result) in enumerate(zip(tool_calls, tool_results)):
+            tool_use_id = tool_call.get("id") or f"toolu_{round_number}_{i}"
+            assistant_content.append({
+                "type": "tool_use",
+                "id": tool_use_id,
+                "name": tool_call.get("name"),
+                "input": tool_call.get("parameters") or {}
+            })
+            if tool_result is None:
+                tool_result = {"status": "error", "content": f"Tool {tool_call.get('name')} not found"}
+            result_content.append({
+                "type": "tool_result",
+                "tool_use_id": tool_use_id,
+                "content": str(tool_result.get("content", "")),
+                "is_error": tool_result.get("status") == "error"
+            })
+        return [
+            {"role": "assistant", "content": assistant_content},
+            {"role": "user", "content": result_content}
+        ]
+    
     def register_command_execution_tool(self):
         """Register the command execution tool.
         
@@ -341,6 +584,8 @@ class PassthroughHandler(BaseHandler):
         """Reset the conversation state."""
         super().reset_conversation()
         self.active_subtask_id = None
+        self.sent_files = {}
+        self.last_relevant_files = []
         
     def registerDirectTool(self, name: str, func: Any) -> bool:
         """Register a direct tool.
@@ -0,0 +1,335 @@
+"""
+Client-side rate limiting and retry with backoff for model provider calls.
+"""
+import asyncio
+import contextlib
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import anthropic
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors and overload
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Default bound on requests in flight at once per API key, across every task
+# of the process; ANTHROPIC_MAX_CONCURRENT_REQUESTS overrides it (0 disables)
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize the bucket.
+
+        Args:
+            rate_per_minute: Units added to the bucket per minute
+            capacity: Maximum burst size (defaults to one minute's worth)
+            clock: Monotonic clock, injectable for testing
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.clock = clock
+        self._available = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take units from the bucket, going into debt if needed.
+
+        Reserving up front (rather than polling) keeps concurrent callers
+        in first-come order and never lets the bucket be claimed twice.
+
+        Args:
+            amount: Units to take (capped at the bucket capacity)
+
+        Returns:
+            Seconds the caller must wait before proceeding
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._available -= amount
+            if self._available >= 0:
+                return 0.0
+            return -self._available / self.rate_per_second
+
+
+class RateLimiter:
+    """Requests-per-minute, tokens-per-minute and in-flight request limits shared by all callers."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 max_concurrent: Optional[int] = None):
+        """Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Optional request limit (None for unlimited)
+            tokens_per_minute: Optional token limit (None for unlimited)
+            clock: Monotonic clock, injectable for testing
+            sleep: Sleep function, injectable for testing
+            max_concurrent: Optional limit on requests in flight at once
+                (None for unlimited)
+        """
+        self.requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self.sleep = sleep
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request of the given size may be sent.
+
+        Args:
+            tokens: Estimated tokens used by the request
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    async def async_acquire(self, tokens: int = 0) -> float:
+        """Wait without blocking the event loop until a request may be sent."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold one of the in-flight request slots while a request runs.
+
+        Requests are leaves of any task tree, so parallel task execution
+        (sequential steps, reduce leaves, function calls) can share this
+        limit without nested work waiting on its own parent.
+        """
+        if self._slots is None:
+            yield
+            return
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self):
+        """Hold an in-flight request slot without blocking the event loop.
+
+        The slots are shared with threads, so a busy slot is waited for on
+        a worker thread. That wait cannot be interrupted: if the awaiting
+        task is cancelled, the slot is released as soon as it is acquired.
+        """
+        if self._slots is None:
+            yield
+            return
+        if not self._slots.acquire(blocking=False):
+            acquiring = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+            try:
+                await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                acquiring.add_done_callback(self._release_abandoned_slot)
+                raise
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+    def _release_abandoned_slot(self, acquiring: "asyncio.Future") -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self._slots.release()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honors retry-after headers."""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 60.0,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        """Initialize the retry policy.
+
+        Args:
+            max_retries: Retries after the first attempt
+            base_delay: Delay cap for the first retry in seconds
+            max_delay: Upper bound for any single delay
+            sleep: Sleep function, injectable for testing
+            rng: Optional random generator, injectable for testing
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Get the delay before a retry.
+
+        Args:
+            attempt: Zero-based retry number
+            retry_after: Server-requested delay, if any
+
+        Returns:
+            Delay in seconds
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_delay)
+        # Full jitter: uniform in [0, base * 2^attempt]
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func: Callable[[], T]) -> T:
+        """Call func, retrying transient failures.
+
+        Args:
+            func: Zero-argument callable making the request
+
+        Returns:
+            Result of func
+
+        Raises:
+            The last exception once retries are exhausted or the error is not retryable
+        """
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                self.sleep(self.compute_delay(attempt, get_retry_after(e)))
+                attempt += 1
+
+    async def async_call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Await func, retrying transient failures without blocking the event loop."""
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                await asyncio.sleep(self.compute_delay(attempt, get_retry_after(e)))
+                attempt += 1
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether an API error is transient.
+
+    Args:
+        error: Exception raised by the API client
+
+    Returns:
+        True for connection errors, timeouts, rate limits and overload
+    """
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Get the server-requested retry delay from an API error.
+
+    Args:
+        error: Exception raised by the API client
+
+    Returns:
+        Delay in seconds, or None if the response did not specify one
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        parsed = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+_limiters_lock = threading.Lock()
+_limiters: Dict[Any, RateLimiter] = {}
+
+
+def get_rate_limiter(key: Any = None, requests_per_minute: Optional[float] = None,
+                     tokens_per_minute: Optional[float] = None,
+                     max_concurrent: Optional[int] = None) -> RateLimiter:
+    """Get the process-wide rate limiter for a key (e.g. an API key).
+
+    Limits default to ANTHROPIC_REQUESTS_PER_MINUTE and
+    ANTHROPIC_TOKENS_PER_MINUTE, unset meaning unlimited, and
+    ANTHROPIC_MAX_CONCURRENT_REQUESTS, unset meaning
+    DEFAULT_MAX_CONCURRENT_REQUESTS and 0 meaning unlimited. Limits only
+    apply when the limiter for a key is first created.
+
+    Args:
+        key: Identity of the quota being shared
+        requests_per_minute: Optional request limit
+        tokens_per_minute: Optional token limit
+        max_concurrent: Optional in-flight request limit
+
+    Returns:
+        Shared RateLimiter
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            concurrent = max_concurrent or _env_float("ANTHROPIC_MAX_CONCURRENT_REQUESTS")
+            if concurrent is None:
+                concurrent = DEFAULT_MAX_CONCURRENT_REQUESTS
+            limiter = RateLimiter(
+                requests_per_minute or _env_float("ANTHROPIC_REQUESTS_PER_MINUTE"),
+                tokens_per_minute or _env_float("ANTHROPIC_TOKENS_PER_MINUTE"),
+                max_concurrent=int(concurrent) if concurrent else None
+            )
+            _limiters[key] = limiter
+        return limiter
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
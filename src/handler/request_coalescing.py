@@ -0,0 +1,142 @@
+"""
+Coalescing of identical in-flight model requests (singleflight).
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def request_fingerprint(params: Dict[str, Any]) -> str:
+    """Get a canonical hash of a model request.
+
+    Two requests with the same model, system prompt, messages and sampling
+    parameters have the same fingerprint regardless of dict key order.
+
+    Args:
+        params: Request parameters (model, system, messages, tools, ...)
+
+    Returns:
+        Hex digest identifying the request
+    """
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """A call in flight, waited on by duplicate callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a shared async call was cancelled before it finished."""
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, sharing its outcome.
+
+    Callers arriving while a call with the same key is in flight wait for
+    it and receive the same result, or the same exception.
+    """
+
+    def __init__(self):
+        """Initialize the SingleFlight instance."""
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    def do(self, key: str, func: Callable[[], T]) -> Tuple[T, bool]:
+        """Run func for key, or wait for the identical call already in flight.
+
+        Args:
+            key: Request fingerprint
+            func: Zero-argument callable making the request
+
+        Returns:
+            Tuple of (result, shared) where shared is True when the result
+            came from another caller's request
+
+        Raises:
+            Whatever exception the upstream call raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking waiters so later callers start fresh
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def async_do(self, key: str, func: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Await func for key, or the identical call in flight on this event loop.
+
+        Args:
+            key: Request fingerprint
+            func: Zero-argument callable returning an awaitable
+
+        Returns:
+            Tuple of (result, shared)
+
+        Raises:
+            Whatever exception the upstream call raised; if the caller running
+            it is cancelled, a waiter runs func again instead
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        future = self._async_calls.get(loop_key)
+        while future is not None:
+            try:
+                # shield: a cancelled waiter must not cancel the shared call
+                return await asyncio.shield(future), True
+            except _LeaderCancelled:
+                # The first waiter to get here re-runs the call; the rest wait for it
+                future = self._async_calls.get(loop_key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[loop_key] = future
+        try:
+            result = await func()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            # Cancellation belongs to this caller only, so waiters are told to retry
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark the exception retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[loop_key]
+
+    def in_flight(self) -> int:
+        """Get the number of distinct calls currently in flight."""
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
+
+
+# Shared by every provider so duplicates from different handlers coalesce
+default_singleflight = SingleFlight()
@@ -0,0 +1,364 @@
+"""
+Persistent on-disk cache of model responses with record/replay modes.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from handler.model_provider import ProviderAdapter
+from handler.request_coalescing import request_fingerprint
+from system.metrics import get_registry
+from system.tracing import current_span, traced
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_REQUESTS = get_registry().counter(
+    "response_cache_requests_total", "Response cache lookups", ["result"])
+
+# Cache modes:
+#   off        - no caching, every request goes to the provider
+#   read_write - serve hits from the cache, store misses
+#   record     - always call the provider and (over)write the cache
+#   replay     - serve only from the cache, fail on misses (offline runs)
+CACHE_MODES = ("off", "read_write", "record", "replay")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "llm_responses")
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# Provider error strings are not worth caching
+ERROR_PREFIX = "Error calling"
+
+# Batch request fields passed to the provider as parameters, so part of the cache key
+BATCH_PARAMS = ("temperature", "max_tokens", "model")
+
+
+class ResponseCacheMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class CachingProvider(ProviderAdapter):
+    """Wraps a ProviderAdapter with a persistent response cache.
+
+    Each response is stored as a JSON file named after the canonical hash
+    of its request. File modification times track recency; when the cache
+    grows past max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, provider: ProviderAdapter, cache_dir: Optional[str] = None,
+                 mode: str = "read_write", max_bytes: int = DEFAULT_MAX_BYTES):
+        """Initialize the caching provider.
+
+        Args:
+            provider: Provider adapter to wrap
+            cache_dir: Directory holding cached responses
+            mode: One of CACHE_MODES
+            max_bytes: Size cap for the cache directory
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode '{mode}', expected one of {', '.join(CACHE_MODES)}")
+        self.provider = provider
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Sizes of the entries on disk, so the size cap is checked without rescanning
+        self._sizes: Dict[str, int] = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                self._sizes[name[:-5]] = os.path.getsize(os.path.join(self.cache_dir, name))
+        self._total_bytes = sum(self._sizes.values())
+
+    def cache_key(self, messages: List[Dict[str, str]], system_prompt: str = "",
+                  tools: Optional[List[Dict[str, Any]]] = None, **kwargs) -> str:
+        """Get the canonical cache key for a request."""
+        return request_fingerprint({
+            "provider": type(self.provider).__name__,
+            "model": getattr(self.provider, "model", None),
+            "system": system_prompt,
+            "messages": messages,
+            "tools": tools,
+            "params": kwargs
+        })
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load a cached entry, marking it as recently used."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, response: Union[str, Dict[str, Any]]) -> None:
+        """Store a response and evict old entries past the size cap."""
+        try:
+            data = json.dumps({"response": response})
+        except (TypeError, ValueError):
+            # Responses holding SDK objects cannot be replayed faithfully
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # The response is already paid for; failing to cache it must not lose it
+            logger.warning("Could not write response cache entry %s: %s", path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._total_bytes += len(data) - self._sizes.get(key, 0)
+            self._sizes[key] = len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until under the size cap."""
+        entries = []
+        for key in self._sizes:
+            try:
+                entries.append((os.path.getmtime(self._path(key)), key))
+            except OSError:
+                entries.append((0, key))
+        entries.sort()
+        for _, key in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._total_bytes -= self._sizes.pop(key)
+            self.stats["evictions"] += 1
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load a cached entry for a request, counting the hit or miss.
+
+        Raises:
+            ResponseCacheMiss: In replay mode, when the request was never recorded
+        """
+        entry = self._load(key)
+        with self._lock:
+            self.stats["hits" if entry is not None else "misses"] += 1
+        current_span().set_attribute("cache_hit", entry is not None)
+        RESPONSE_CACHE_REQUESTS.labels("hit" if entry is not None else "miss").inc()
+        if entry is None and self.mode == "replay":
+            raise ResponseCacheMiss(f"No recorded response for request {key[:12]}")
+        return entry
+
+    @traced("response_cache.send_message")
+    def send_message(self, messages: List[Dict[str, str]], system_prompt: str = "",
+                     tools: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Union[str, Dict[str, Any]]:
+        """Send a message, serving it from the cache when possible.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to the model
+            tools: Optional list of tool specifications
+            **kwargs: Additional provider parameters (part of the cache key)
+
+        Returns:
+            Model's response (from the cache or the wrapped provider)
+
+        Raises:
+            ResponseCacheMiss: In replay mode, when the request was never recorded
+        """
+        if self.mode == "off":
+            return self.provider.send_message(messages, system_prompt, tools, **kwargs)
+
+        key = self.cache_key(messages, system_prompt, tools, **kwargs)
+        if self.mode in ("read_write", "replay"):
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry["response"]
+
+        response = self.provider.send_message(messages, system_prompt, tools, **kwargs)
+        if not (isinstance(response, str) and response.startswith(ERROR_PREFIX)):
+            self._store(key, response)
+        return response
+
+    async def async_send_message(self, messages: List[Dict[str, str]], system_prompt: str = "",
+                                 tools: Optional[List[Dict[str, Any]]] = None,
+                                 **kwargs) -> Union[str, Dict[str, Any]]:
+        """Send a message without blocking the event loop, serving it from the cache when possible.
+
+        Misses go to the wrapped provider's async_send_message; cache files
+        are read and written in a worker thread.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to the model
+            tools: Optional list of tool specifications
+            **kwargs: Additional provider parameters (part of the cache key)
+
+        Returns:
+            Model's response (from the cache or the wrapped provider)
+
+        Raises:
+            ResponseCacheMiss: In replay mode, when the request was never recorded
+        """
+        if self.mode == "off":
+            return await self.provider.async_send_message(messages, system_prompt, tools, **kwargs)
+
+        key = self.cache_key(messages, system_prompt, tools, **kwargs)
+        if self.mode in ("read_write", "replay"):
+            entry = await asyncio.to_thread(self._lookup, key)
+            if entry is not None:
+                return entry["response"]
+
+        response = await self.provider.async_send_message(messages, system_prompt, tools, **kwargs)
+        if not (isinstance(response, str) and response.startswith(ERROR_PREFIX)):
+            await asyncio.to_thread(self._store, key, response)
+        return response
+
+    def stream_message(self, messages: List[Dict[str, str]], system_prompt: str = "",
+                       tools: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Stream a response, replaying it from the cache when possible.
+
+        Cache hits are replayed as events in one go. Misses stream from the
+        wrapped provider as it responds. Streamed responses are stored only
+        when they are plain text, the form send_message returns for them;
+        responses with tool calls are not cached.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            system_prompt: System prompt to provide instructions to the model
+            tools: Optional list of tool specifications
+            **kwargs: Additional provider parameters (part of the cache key)
+
+        Yields:
+            Events as described in ProviderAdapter.stream_message
+
+        Raises:
+            ResponseCacheMiss: In replay mode, when the request was never recorded
+        """
+        if self.mode == "off":
+            yield from self.provider.stream_message(messages, system_prompt, tools, **kwargs)
+            return
+
+        key = self.cache_key(messages, system_prompt, tools, **kwargs)
+        if self.mode in ("read_write", "replay"):
+            entry = self._lookup(key)
+            if entry is not None:
+                extracted = self.provider.extract_tool_calls(entry["response"])
+                if extracted.get("content"):
+                    yield {"type": "text", "text": extracted["content"]}
+                for tool_call in extracted.get("tool_calls", []):
+                    yield {"type": "tool_call", **tool_call}
+                if extracted.get("awaiting_tool_response"):
+                    yield {"type": "stop", "stop_reason": "tool_use"}
+                return
+
+        text_parts = []
+        cacheable = True
+        for event in self.provider.stream_message(messages, system_prompt, tools, **kwargs):
+            if event.get("type") == "text":
+                text_parts.append(event["text"])
+            elif event.get("type") == "tool_call" or event.get("stop_reason") == "tool_use":
+                cacheable = False
+            yield event
+        text = "".join(text_parts)
+        if cacheable and text and not text.startswith(ERROR_PREFIX):
+            self._store(key, text)
+
+    def send_batch(self, requests: List[Dict[str, Any]],
+                   max_workers: Optional[int] = None) -> List[Union[str, Dict[str, Any]]]:
+        """Send a batch, forwarding only the requests missing from the cache.
+
+        Args:
+            requests: List of dicts with 'messages' and optional
+                      'system_prompt', 'tools', 'temperature', 'max_tokens'
+                      and 'model'
+            max_workers: Optional limit on concurrent requests
+
+        Returns:
+            One response per request, in request order
+
+        Raises:
+            ResponseCacheMiss: In replay mode, when a request was never recorded
+        """
+        if self.mode == "off":
+            return self.provider.send_batch(requests, max_workers)
+
+        # Keyed like send_message, where these are provider parameters
+        keys = [self.cache_key(r["messages"], r.get("system_prompt", ""), r.get("tools"),
+                               **{name: r[name] for name in BATCH_PARAMS if r.get(name) is not None})
+                for r in requests]
+        results: List[Any] = [None] * len(requests)
+        missing = []
+        for i, key in enumerate(keys):
+            entry = self._load(key) if self.mode in ("read_write", "replay") else None
+            if entry is not None:
+                results[i] = entry["response"]
+            else:
+                missing.append(i)
+        if self.mode != "record":
+            with self._lock:
+                self.stats["hits"] += len(requests) - len(missing)
+                self.stats["misses"] += len(missing)
+
+        if missing and self.mode == "replay":
+            raise ResponseCacheMiss(f"No recorded response for {len(missing)} batch request(s)")
+
+        if missing:
+            responses = self.provider.send_batch([requests[i] for i in missing], max_workers)
+            for i, response in zip(missing, responses):
+                results[i] = response
+                if not (isinstance(response, str) and response.startswith(ERROR_PREFIX)):
+                    self._store(keys[i], response)
+        return results
+
+    def extract_tool_calls(self, response: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Extract tool calls using the wrapped provider."""
+        return self.provider.extract_tool_calls(response)
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose attributes of the wrapped provider (model, client, ...)
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+
+def wrap_with_response_cache(provider: ProviderAdapter,
+                             config: Optional[Dict[str, Any]] = None) -> ProviderAdapter:
+    """Wrap a provider with the response cache if caching is enabled.
+
+    The mode and directory come from config ("mode", "cache_dir",
+    "max_bytes"), falling back to the LLM_RESPONSE_CACHE_MODE and
+    LLM_RESPONSE_CACHE_DIR environment variables so CI and benchmark runs
+    can replay recorded responses without code changes.
+
+    Args:
+        provider: Provider adapter to wrap
+        config: Optional cache configuration
+
+    Returns:
+        The caching provider, or the provider itself when caching is off
+    """
+    config = config or {}
+    mode = config.get("mode") or os.environ.get("LLM_RESPONSE_CACHE_MODE", "off")
+    if mode == "off":
+        return provider
+    return CachingProvider(
+        provider,
+        cache_dir=config.get("cache_dir") or os.environ.get("LLM_RESPONSE_CACHE_DIR"),
+        mode=mode,
+        max_bytes=config.get("max_bytes", DEFAULT_MAX_BYTES)
+    )
@@ -9,6 +9,12 @@ import json
 import logging # Add logging import if not present
 from typing import Dict, List, Optional, Any
 
+# The --task thin client only forwards to a running daemon, so dispatch it
+# before the heavy imports below (they load the model provider SDK)
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "--task":
+    from daemon import run_client
+    sys.exit(run_client(sys.argv[2:]))
+
 # Import executor functions at the top level for use in initialize_aider
 # Ensure the path is correct relative to src/
 from executors.aider_executors import execute_aider_automatic, execute_aider_interactive
@@ -19,6 +25,9 @@ class Application:
     """
     Main application class that coordinates all components.
     """
+    # handle_query accepts a stream_callback for incremental output
+    supports_streaming = True
+    
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         """
         Initialize application with optional configuration.
@@ -119,17 +128,21 @@ class Application:
             print(f"Error indexing repository: {str(e)}")
             return False
     
-    def handle_query(self, query: str) -> Dict[str, Any]:
+    def handle_query(self, query: str, stream_callback=None) -> Dict[str, Any]:
         """
         Handle a user query.
         
         Args:
             query: User query
+            stream_callback: Optional callback receiving response text
+                deltas as they stream in
             
         Returns:
             Response dictionary
         """
         try:
+            if stream_callback:
+                return self.passthrough_handler.handle_query(query, stream_callback=stream_callback)
             return self.passthrough_handler.handle_query(query)
         except Exception as e:
             print(f"Error handling query: {str(e)}")
@@ -201,10 +214,50 @@ class Application:
         logging.info("Application initialized.")
 
 
+def _option_values(args: List[str], option: str) -> List[str]:
+    """Get the values following each occurrence of an option in args."""
+    return [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == option]
+
+
+def run_daemon(args: List[str]) -> None:
+    """
+    Run the daemon, keeping one warm Application for all requests.
+
+    Args:
+        args: Options after --daemon: [--port N] [--host HOST] [--index REPO]...
+    """
+    from daemon import DaemonServer, DEFAULT_DAEMON_HOST, DEFAULT_DAEMON_PORT
+
+    ports = _option_values(args, "--port")
+    hosts = _option_values(args, "--host")
+    app = Application()
+    for repo_path in _option_values(args, "--index"):
+        app.index_repository(repo_path)
+
+    server = DaemonServer(app, host=hosts[-1] if hosts else DEFAULT_DAEMON_HOST,
+                          port=int(ports[-1]) if ports else DEFAULT_DAEMON_PORT)
+    print(f"\nDaemon listening on {server.url}")
+    try:
+        server.serve_forever()
+    finally:
+        server.httpd.server_close()
+
+
 def main():
     """Main entry point."""
     # Configure logging
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Forward a /task command to a running daemon without starting an Application
+    if len(sys.argv) > 1 and sys.argv[1] == "--task":
+        from daemon import run_client
+        sys.exit(run_client(sys.argv[2:]))
+
+    # Serve tasks and queries from a warm Application
+    if len(sys.argv) > 1 and sys.argv[1] == "--daemon":
+        run_daemon(sys.argv[2:])
+        return
+
     # Create application
     app = Application()
     
@@ -0,0 +1,206 @@
+"""Token-budgeted packing of matched files into an LLM context."""
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from memory.token_counting import RatioTokenCounter, TokenCounter, default_token_counter
+
+# Prefix FileAccessManager.read_file uses when a file exceeds its size limit
+FILE_TOO_LARGE_PREFIX = "File too large:"
+
+
+class PackedContext:
+    """Result of packing matched files into a token budget.
+
+    Attributes:
+        text: Context string to hand to the model
+        included: Paths included with their full content
+        summarized: Paths degraded to their index metadata summary
+        dropped: Paths left out entirely
+        unchanged: Paths already sent earlier with identical content,
+                   referenced by name only
+        versions: Content hashes of the raw files included in full
+        tokens_used: Estimated tokens used by the packed text
+        token_budget: Token budget the context was packed into
+    """
+
+    def __init__(self, text: str, included: List[str], summarized: List[str],
+                 dropped: List[str], tokens_used: int, token_budget: int,
+                 unchanged: Optional[List[str]] = None, versions: Optional[Dict[str, str]] = None):
+        """Initialize a PackedContext instance."""
+        self.text = text
+        self.included = included
+        self.summarized = summarized
+        self.dropped = dropped
+        self.unchanged = unchanged or []
+        self.versions = versions or {}
+        self.tokens_used = tokens_used
+        self.token_budget = token_budget
+
+    def to_notes(self) -> Dict[str, Any]:
+        """Get a summary of the packing decisions for result notes.
+
+        Returns:
+            Dictionary suitable for a result's notes/metadata
+        """
+        return {
+            "included": self.included,
+            "summarized": self.summarized,
+            "dropped": self.dropped,
+            "unchanged": self.unchanged,
+            "tokens_used": self.tokens_used,
+            "token_budget": self.token_budget
+        }
+
+    def __repr__(self) -> str:
+        """Get string representation of the packed context."""
+        return (f"PackedContext(included={len(self.included)}, summarized={len(self.summarized)}, "
+                f"dropped={len(self.dropped)}, tokens={self.tokens_used}/{self.token_budget})")
+
+
+def content_hash(content: str) -> str:
+    """Get a short hash identifying a version of file content."""
+    return hashlib.sha1(content.encode("utf-8", errors="replace")).hexdigest()
+
+
+def get_context_token_budget(model_config: Any, default: Optional[int] = None) -> Optional[int]:
+    """Get the context token budget from a model configuration.
+
+    Args:
+        model_config: Template "model" entry or handler config dictionary
+        default: Value to use when no budget is configured
+
+    Returns:
+        Token budget or default
+    """
+    if isinstance(model_config, dict) and model_config.get("context_token_budget"):
+        return int(model_config["context_token_budget"])
+    return default
+
+
+def _match_score(match: Union[str, Sequence[Any]], rank: int) -> float:
+    """Get a match score, falling back to a rank-derived score.
+
+    Matches arrive sorted by relevance, so the rank is a usable proxy
+    when the match does not carry an explicit score.
+    """
+    if isinstance(match, (list, tuple)):
+        for value in match[2:3] or match[1:2]:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                pass
+    return 1.0 / (rank + 1)
+
+
+def pack_context(matches: Sequence[Union[str, Sequence[Any]]],
+                 token_budget: int,
+                 read_files: Callable[[List[str]], List[Optional[str]]],
+                 global_index: Optional[Dict[str, str]] = None,
+                 token_ratio: Optional[float] = None,
+                 sent_versions: Optional[Dict[str, str]] = None,
+                 token_counter: Optional[TokenCounter] = None,
+                 excerpt: Optional[Callable[[str, str], str]] = None) -> PackedContext:
+    """Pack matched files into a token budget.
+
+    Full file contents are admitted greedily by score per token. Files
+    that do not fit (or cannot be read) are degraded to their summary from
+    the global index metadata while space remains, and dropped otherwise.
+    Files whose content hash matches sent_versions were already given to
+    the model earlier in the conversation and are only referenced by name.
+
+    Args:
+        matches: Match tuples (path, relevance[, score]) or plain paths,
+                 ordered from most to least relevant
+        token_budget: Maximum estimated tokens for the packed context
+        read_files: Callable reading a list of paths, returning contents
+                    (None for unreadable files) in the same order
+        global_index: Optional mapping of file paths to metadata summaries
+        token_ratio: Optional character to token ratio used for estimation
+                     instead of the token counter
+        sent_versions: Optional mapping of paths to the content hashes
+                       already sent in the current conversation
+        token_counter: Optional token counter (defaults to the shared
+                       approximate counter)
+        excerpt: Optional callable (path, content) -> text to send in place
+                 of the full content; versions are hashed from the raw
+                 content before excerpting, so they stay stable across
+                 queries
+
+    Returns:
+        PackedContext with the context text and packing decisions
+    """
+    if token_counter is None:
+        token_counter = RatioTokenCounter(token_ratio) if token_ratio is not None else default_token_counter
+    estimate = token_counter.count
+
+    paths = [match if isinstance(match, str) else match[0] for match in matches]
+    scores = {path: _match_score(match, rank) for rank, (path, match) in enumerate(zip(paths, matches))}
+    if not isinstance(global_index, dict):
+        global_index = {}
+
+    contents = read_files(paths) if paths else []
+
+    decisions: Dict[str, str] = {}
+    versions: Dict[str, str] = {}
+
+    # Render each candidate once so costs are measured on the final text
+    full_entries: Dict[str, str] = {}
+    for path, content in zip(paths, contents):
+        if content and not content.startswith(FILE_TOO_LARGE_PREFIX):
+            versions[path] = content_hash(content)
+            if sent_versions and sent_versions.get(path) == versions[path]:
+                decisions[path] = "unchanged"
+                continue
+            if excerpt is not None:
+                content = excerpt(path, content)
+            full_entries[path] = f"File: {path}\n```\n{content}\n```\n"
+
+    entries: Dict[str, str] = {}
+    tokens_used = 0
+
+    # Pass 1: full contents by value density (score per token)
+    by_density = sorted(full_entries, key=lambda p: scores[p] / max(1, estimate(full_entries[p])), reverse=True)
+    for path in by_density:
+        cost = estimate(full_entries[path])
+        if tokens_used + cost <= token_budget:
+            decisions[path] = "included"
+            entries[path] = full_entries[path]
+            tokens_used += cost
+
+    # Pass 2: degrade the remaining files to summaries, most relevant first
+    for path in sorted(paths, key=lambda p: scores[p], reverse=True):
+        if path in decisions:
+            continue
+        summary = global_index.get(path)
+        if summary:
+            entry = f"File: {path} (summary only, full content omitted)\n{summary}\n"
+            cost = estimate(entry)
+            if tokens_used + cost <= token_budget:
+                decisions[path] = "summarized"
+                entries[path] = entry
+                tokens_used += cost
+                continue
+        decisions[path] = "dropped"
+
+    # Keep the original relevance order in the rendered context
+    included = [p for p in paths if decisions[p] == "included"]
+    summarized = [p for p in paths if decisions[p] == "summarized"]
+    dropped = [p for p in paths if decisions[p] == "dropped"]
+    unchanged = [p for p in paths if decisions[p] == "unchanged"]
+
+    parts = [entries[p] for p in paths if p in entries]
+    if unchanged:
+        parts.append(f"Files provided earlier in this conversation (unchanged): {', '.join(unchanged)}")
+    if dropped:
+        parts.append(f"Files omitted to fit the context budget: {', '.join(dropped)}")
+
+    return PackedContext(
+        text="\n".join(parts),
+        included=included,
+        summarized=summarized,
+        dropped=dropped,
+        tokens_used=tokens_used,
+        token_budget=token_budget,
+        unchanged=unchanged,
+        versions={p: versions[p] for p in included}
+    )
@@ -115,6 +115,59 @@ def extract_identifiers_by_language(content: str, file_ext: str) -> List[str]:
     unique_identifiers = list(set(identifiers))
     return unique_identifiers[:30]  # Limit to top 30 identifiers
 
+def extract_definitions(content: str, file_ext: str) -> List[Dict[str, object]]:
+    """Extract definition spans (functions and classes) from source code.
+
+    Uses the same definition patterns as extract_identifiers_by_language,
+    but also records where each definition starts and ends so callers can
+    include or collapse whole definitions.
+
+    Args:
+        content: File content
+        file_ext: File extension (e.g., '.py')
+
+    Returns:
+        List of dicts with 'name', 'kind', 'start', 'end' (exclusive line
+        indices) and 'indent'. Empty for unsupported languages.
+    """
+    # Normalize file extension
+    if file_ext.startswith('.'):
+        file_ext = file_ext[1:]
+
+    if file_ext != 'py':
+        return []
+
+    lines = content.split('\n')
+    definition_pattern = re.compile(r'^(\s*)(?:async\s+)?(def|class)\s+([a-zA-Z0-9_]+)\s*[\(:]')
+
+    definitions = []
+    for i, line in enumerate(lines):
+        match = definition_pattern.match(line)
+        if not match:
+            continue
+        indent = len(match.group(1))
+
+        # The body ends at the next non-blank line that is not indented deeper
+        end = len(lines)
+        for j in range(i + 1, len(lines)):
+            stripped = lines[j].strip()
+            if stripped and len(lines[j]) - len(lines[j].lstrip()) <= indent and not stripped.startswith(')'):
+                end = j
+                break
+        # Do not swallow trailing blank lines into the definition
+        while end > i + 1 and not lines[end - 1].strip():
+            end -= 1
+
+        definitions.append({
+            "name": match.group(3),
+            "kind": "function" if match.group(2) == "def" else "class",
+            "start": i,
+            "end": end,
+            "indent": indent
+        })
+
+    return definitions
+
 def extract_markdown_headings(content: str) -> List[str]:
     """Extract headings from markdown content.
     
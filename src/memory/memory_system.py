@@ -8,7 +8,14 @@ import concurrent.futures
 
 from memory.context_generation import ContextGenerationInput
 from memory.context_generation import AssociativeMatchResult  # Import the standard result type
+from memory.token_counting import RatioTokenCounter, get_token_counter
 from system.prompt_registry import registry as prompt_registry
+from system.metrics import SIZE_BUCKETS, get_registry
+from system.tracing import bind_context, current_span, traced
+
+INDEX_FILES = get_registry().gauge("memory_index_files", "Files in the global index")
+SHARD_FANOUT = get_registry().histogram(
+    "memory_shard_fanout", "Shards queried per sharded context request", buckets=SIZE_BUCKETS)
 
 class MemorySystem:
     """Memory System for metadata management and associative matching.
@@ -35,13 +42,16 @@ class MemorySystem:
             "sharding_enabled": False,
             "token_size_per_shard": 4000,   # Target tokens per shard (~1/4 of context window)
             "max_shards": 8,                # Maximum number of shards
-            "token_estimation_ratio": 0.25, # Character to token ratio (4 chars per token)
+            "token_estimation_ratio": 0.25, # Character to token ratio, used only when configured explicitly
             "max_parallel_shards": min(8, (os.cpu_count() or 1) * 2)  # Limit parallel processing
         }
         
         # Update configuration if provided
         if config:
             self._config.update(config)
+        
+        # Local token counter; an explicit token_estimation_ratio keeps the ratio estimate
+        self._token_counter = get_token_counter(config)
             
         # Initialize internal state
         self._sharded_index = []  # List of index shards
@@ -64,9 +74,7 @@ class MemorySystem:
         Returns:
             Estimated token count
         """
-        # Simple estimation based on character count
-        token_ratio = self._config["token_estimation_ratio"]
-        return int(len(text) * token_ratio)
+        return self._token_counter.count(text)
 
     def _update_shards(self) -> None:
         """
@@ -124,6 +132,7 @@ class MemorySystem:
                 
         # Update the global index
         self.global_index.update(normalized_index)  # Update instead of replace
+        INDEX_FILES.set(len(self.global_index))
         
         # Update shards if sharding is enabled
         if self._config["sharding_enabled"]:
@@ -142,6 +151,7 @@ class MemorySystem:
         if enabled:
             self._update_shards()
 
+    @traced("memory.shard")
     def _process_single_shard(self,
                              shard_index: int,
                              shard_data: Dict[str, str],
@@ -165,6 +175,8 @@ class MemorySystem:
                 raise RuntimeError("TaskSystem not available during shard processing.")
 
             logging.debug("Processing shard %d/%d with %d files (Thread)", shard_index + 1, total_shards, len(shard_data))
+            current_span().set_attribute("shard_index", shard_index)
+            current_span().set_attribute("files", len(shard_data))
 
             # Create a copy of the context input for this shard
             # Ensure all relevant fields from the original context_input are copied
@@ -212,6 +224,7 @@ class MemorySystem:
             shard_result.matches = validated_matches
 
             logging.debug("Shard %d finished processing, found %d matches.", shard_index + 1, len(shard_result.matches))
+            current_span().set_attribute("matches", len(shard_result.matches))
             return shard_index, shard_result # Return index and result
 
         except Exception as e:
@@ -242,6 +255,7 @@ class MemorySystem:
             
         if token_estimation_ratio is not None:
             self._config["token_estimation_ratio"] = token_estimation_ratio
+            self._token_counter = RatioTokenCounter(token_estimation_ratio)
             
         if max_parallel_shards is not None:
             self._config["max_parallel_shards"] = max_parallel_shards
@@ -282,6 +296,7 @@ class MemorySystem:
                 
         return result
     
+    @traced("memory.get_relevant_context_for")
     def get_relevant_context_for(self, input_data: Union[Dict[str, Any], ContextGenerationInput]) -> AssociativeMatchResult:  # Update return type hint
         """Get relevant context for a task using TaskSystem mediator exclusively.
         
@@ -326,6 +341,7 @@ class MemorySystem:
                 return self._get_relevant_context_with_mediator(context_input)
             
             # Otherwise, use sharded approach
+            current_span().set_attribute("shards", len(self._sharded_index))
             return self._get_relevant_context_sharded_with_mediator(context_input)
         except Exception as e:
             # Improved error handling - return empty result with error message
@@ -333,6 +349,79 @@ class MemorySystem:
             logging.error(error_msg)
             return AssociativeMatchResult(context=error_msg, matches=[])  # Return standard type
     
+    def get_relevant_context_batch(self, inputs: List[Union[Dict[str, Any], ContextGenerationInput]]) -> List[AssociativeMatchResult]:
+        """Get relevant context for many tasks at once.
+
+        Intended for bulk, throughput-oriented context generation (such as
+        pre-computing context for queued tasks). All associative matching
+        requests, one per input (or per input and shard when sharding is
+        enabled), are submitted together through the provider's batch path.
+
+        Args:
+            inputs: List of legacy dicts or ContextGenerationInput instances
+
+        Returns:
+            One AssociativeMatchResult per input, in input order
+        """
+        context_inputs = [
+            ContextGenerationInput.from_legacy_format(item) if isinstance(item, dict) else item
+            for item in inputs
+        ]
+
+        if not hasattr(self, 'task_system') or self.task_system is None:
+            logging.warning("TaskSystem not available for batch context generation")
+            return [AssociativeMatchResult(context="TaskSystem not available for context generation", matches=[])
+                    for _ in context_inputs]
+
+        if self._config["sharding_enabled"] and len(self._sharded_index) > 1:
+            indexes = [shard for shard in self._sharded_index if shard]
+        else:
+            indexes = [self.get_global_index()]
+
+        # One request per (input, index) pair; owners maps requests back to inputs
+        requests = []
+        owners = []
+        results: List[Optional[AssociativeMatchResult]] = [None] * len(context_inputs)
+        for i, context_input in enumerate(context_inputs):
+            if getattr(context_input, 'fresh_context', None) == "disabled":
+                results[i] = AssociativeMatchResult(
+                    context=context_input.inherited_context or "No context available", matches=[])
+            elif not any(indexes):
+                results[i] = AssociativeMatchResult(context="No files in index", matches=[])
+            else:
+                for index in indexes:
+                    requests.append((context_input, index))
+                    owners.append(i)
+
+        if requests:
+            try:
+                batch_results = self.task_system.generate_context_batch_for_memory_system(requests)
+            except Exception as e:
+                error_msg = f"Error during batch context generation: {str(e)}"
+                logging.exception("Error during batch context generation:")
+                batch_results = [AssociativeMatchResult(context=error_msg, matches=[]) for _ in requests]
+
+            grouped: Dict[int, List[AssociativeMatchResult]] = {}
+            for owner, result in zip(owners, batch_results):
+                grouped.setdefault(owner, []).append(result)
+            for i, shard_results in grouped.items():
+                if len(shard_results) == 1:
+                    results[i] = shard_results[0]
+                    continue
+                # Merge shard results, removing duplicate paths while preserving order
+                seen = set()
+                matches = []
+                for result in shard_results:
+                    for path, relevance in result.matches:
+                        if path not in seen:
+                            seen.add(path)
+                            matches.append((path, relevance))
+                results[i] = AssociativeMatchResult(
+                    context=f"Found {len(matches)} relevant files across {len(shard_results)} shards.",
+                    matches=matches)
+
+        return results
+
     def _get_relevant_context_with_mediator(self, context_input: ContextGenerationInput) -> AssociativeMatchResult:  # Update return type hint
         """
         Get relevant context using TaskSystem mediator.
@@ -411,13 +500,14 @@ class MemorySystem:
                 # Submit the processing of this shard to the thread pool
                 # Pass necessary arguments to the helper function
                 future = executor.submit(
-                    self._process_single_shard,
+                    bind_context(self._process_single_shard),
                     shard_index,
                     shard,
                     context_input, # Pass the original context_input
                     total_shards
                 )
                 futures.append(future)
+            SHARD_FANOUT.observe(len(futures))
 
             # Process results as they complete
             for future in concurrent.futures.as_completed(futures):
@@ -0,0 +1,194 @@
+"""
+Local token counting for sizing prompts, shards and history.
+"""
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+# Pre-tokenization in the style of byte-level BPE tokenizers: words (split
+# at camelCase boundaries), short digit groups, punctuation runs and
+# whitespace runs each become one or more tokens
+_PIECE_PATTERN = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)"
+    r"| ?[A-Z]?[a-z]+"
+    r"| ?[A-Z]+(?![a-z])"
+    r"| ?[^\W\d_]+"
+    r"| ?\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+
+# Texts shorter than this are counted directly rather than memoized
+MEMOIZE_MIN_CHARS = 256
+
+
+class TokenCounter:
+    """Interface for counting the tokens of a text."""
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a text.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Token count
+        """
+        raise NotImplementedError("Subclasses must implement count")
+
+
+class RatioTokenCounter(TokenCounter):
+    """Estimates tokens as a fixed fraction of the character count."""
+
+    def __init__(self, token_ratio: float = 0.25):
+        """Initialize the counter.
+
+        Args:
+            token_ratio: Character to token ratio
+        """
+        self.token_ratio = token_ratio
+
+    def count(self, text: str) -> int:
+        return int(len(text) * self.token_ratio)
+
+
+class UsageCalibration:
+    """Scale between local counts and token usage reported by the provider.
+
+    Providers report the input tokens of every request. Recording them
+    next to the local count of the same text corrects the systematic bias
+    of the local approximation (tokenizer differences, message framing).
+    """
+
+    def __init__(self, max_samples: int = 200):
+        """Initialize the calibration.
+
+        Args:
+            max_samples: Number of most recent samples kept
+        """
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, counted_tokens: int, reported_tokens: int) -> None:
+        """Record a sample.
+
+        Args:
+            counted_tokens: Uncalibrated local count of the request text
+            reported_tokens: Input tokens reported by the provider
+        """
+        if counted_tokens > 0 and reported_tokens > 0:
+            with self._lock:
+                self._samples.append((counted_tokens, reported_tokens))
+
+    @property
+    def sample_count(self) -> int:
+        """Number of samples recorded."""
+        return len(self._samples)
+
+    @property
+    def scale(self) -> float:
+        """Factor converting local counts to provider tokens (1.0 until calibrated)."""
+        with self._lock:
+            counted = sum(c for c, _ in self._samples)
+            reported = sum(r for _, r in self._samples)
+        return reported / counted if counted else 1.0
+
+
+class ApproximateTokenCounter(TokenCounter):
+    """Fast local approximation of a byte-level BPE tokenizer.
+
+    Text is split into word, number, punctuation and whitespace pieces and
+    each piece is costed by its length. Counts of long texts are memoized
+    by content hash, so re-measuring the same file or prompt is cheap.
+    """
+
+    def __init__(self, calibration: Optional[UsageCalibration] = None, cache_size: int = 4096):
+        """Initialize the counter.
+
+        Args:
+            calibration: Optional calibration applied to counts
+            cache_size: Maximum number of memoized counts
+        """
+        self.calibration = calibration
+        self.cache_size = cache_size
+        self.stats = {"hits": 0, "misses": 0}
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _piece_tokens(piece: str) -> int:
+        core = piece.lstrip(" ") or piece
+        if core.isspace():
+            # Indentation and blank lines merge into few tokens
+            return math.ceil(len(core) / 8)
+        if core[0].isdigit():
+            return 1
+        if core[0].isalpha():
+            if core.isascii():
+                # Common words are single tokens; long or rare ones split
+                return 1 + (len(core) - 1) // 8
+            # Non-Latin scripts take about one token per character
+            return math.ceil(len(core.encode("utf-8")) / 3)
+        return math.ceil(len(core) / 2)
+
+    def count_raw(self, text: str) -> int:
+        """Count tokens without applying the calibration.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Uncalibrated token count
+        """
+        if not text:
+            return 0
+        if len(text) < MEMOIZE_MIN_CHARS:
+            return sum(self._piece_tokens(piece) for piece in _PIECE_PATTERN.findall(text))
+
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
+            self.stats["misses"] += 1
+
+        tokens = sum(self._piece_tokens(piece) for piece in _PIECE_PATTERN.findall(text))
+        with self._lock:
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count(self, text: str) -> int:
+        tokens = self.count_raw(text)
+        if self.calibration is None or not tokens:
+            return tokens
+        return max(1, round(tokens * self.calibration.scale))
+
+
+# Shared so usage recorded by any provider calibrates every counter user
+default_calibration = UsageCalibration()
+default_token_counter = ApproximateTokenCounter(default_calibration)
+
+
+def get_token_counter(config: Optional[Dict[str, Any]] = None) -> TokenCounter:
+    """Get the token counter for a component configuration.
+
+    An explicit "token_estimation_ratio" keeps the character ratio
+    estimate; otherwise the shared approximate counter is used.
+
+    Args:
+        config: Optional configuration dictionary
+
+    Returns:
+        TokenCounter instance
+    """
+    if config and config.get("token_estimation_ratio") is not None:
+        return RatioTokenCounter(config["token_estimation_ratio"])
+    return default_token_counter
@@ -6,6 +6,65 @@ import shlex # Add shlex import
 import json # Add json import
 import logging # Add logging import
 
+from system.metrics import get_registry
+from system.tracing import get_tracer
+
+
+def parse_task_args(arg_list: List[str]) -> Tuple[Dict[str, Any], Dict[str, bool], Optional[str]]:
+    """
+    Parses /task arguments and flags from a list of strings.
+    
+    Args:
+        arg_list: List of argument strings (from shlex.split)
+        
+    Returns:
+        Tuple of (params, flags, error_message)
+        error_message is None if parsing succeeded
+    """
+    params: Dict[str, Any] = {}
+    flags: Dict[str, bool] = {}
+    error_message = None
+
+    for item in arg_list:
+        if item.startswith("--"):
+            # Handle flags
+            flag_name = item[2:]
+            if not flag_name:
+                error_message = f"Warning: Ignoring invalid flag format: {item}"
+                continue
+            flags[flag_name] = True
+        elif "=" in item:
+            # Handle key=value parameters
+            key, value = item.split("=", 1)
+            key = key.strip()
+            value = value.strip() # Keep original value from shlex
+            if not key:
+                error_message = f"Warning: Ignoring parameter with empty key: {item}"
+                continue
+
+            # Attempt JSON parsing for values starting/ending with brackets/braces/quotes
+            # Check common JSON starts/ends
+            is_potential_json = (value.startswith("[") and value.endswith("]")) or \
+                                (value.startswith("{") and value.endswith("}")) or \
+                                (value.startswith('"') and value.endswith('"'))
+
+            if is_potential_json:
+                try:
+                    # json.loads expects double quotes for strings within JSON.
+                    params[key] = json.loads(value)
+                except json.JSONDecodeError:
+                    # If JSON parsing fails, treat as a plain string
+                    error_message = f"Warning: Could not parse value for '{key}' as JSON - treating as string."
+                    params[key] = value # Store the raw string value
+            else:
+                # Plain string value (shlex handles quotes)
+                params[key] = value
+        else:
+            error_message = f"Warning: Ignoring invalid parameter format (expected key=value or --flag): {item}"
+
+    return params, flags, error_message
+
+
 class Repl:
     """Interactive REPL (Read-Eval-Print Loop) interface.
     
@@ -33,6 +92,8 @@ class Repl:
             "/index": self._cmd_index,
             "/test-aider": self._cmd_test_aider,
             "/debug": self._cmd_debug,
+            "/trace": self._cmd_trace,
+            "/stats": self._cmd_stats,
             "/task": self._cmd_task # Add the new command
         }
         # Add dispatcher import
@@ -112,6 +173,11 @@ class Repl:
             return
         
         if self.mode == "passthrough":
+            # Stream the response when the application supports it
+            if getattr(self.application, "supports_streaming", False) is True:
+                self._handle_query_streaming(query)
+                return
+            
             # Show thinking indicator
             print("\nThinking...", end="", flush=True, file=self.output)
             
@@ -148,6 +214,49 @@ class Repl:
         else:
             print("Standard mode not implemented yet", file=self.output)
     
+    def _handle_query_streaming(self, query: str) -> None:
+        """Handle a passthrough query, printing the response as it streams in.
+        
+        Args:
+            query: Query from the user
+        """
+        print("\nThinking...", end="", flush=True, file=self.output)
+        streamed = []
+        
+        def render_delta(text: str) -> None:
+            if not streamed:
+                # Replace the thinking indicator with the response header
+                print("\r" + " " * 12 + "\r", end="", file=self.output)
+                print("Response:", file=self.output)
+            streamed.append(text)
+            print(text, end="", flush=True, file=self.output)
+        
+        result = self.application.handle_query(query, stream_callback=render_delta)
+        content = result.get("content", "No response")
+        
+        if not streamed:
+            print("\r" + " " * 12 + "\r", end="", file=self.output)
+            print("Response:", file=self.output)
+            print(content, file=self.output)
+        else:
+            print("", file=self.output)
+            # Tool execution can replace the streamed text with its result
+            if content != "".join(streamed):
+                print(content, file=self.output)
+        
+        relevant_files = result.get("metadata", {}).get("relevant_files")
+        if relevant_files:
+            print("\nFiles in context:", file=self.output)
+            for i, file_path in enumerate(relevant_files, 1):
+                print(f"  {i}. {file_path}", file=self.output)
+            print("", file=self.output)
+        
+        if self.verbose and "metadata" in result:
+            print("\nMetadata:", file=self.output)
+            for key, value in result["metadata"].items():
+                if key != "relevant_files":
+                    print(f"  {key}: {value}", file=self.output)
+    
     def _cmd_help(self, args: str) -> None:
         """Handle the help command.
         
@@ -161,6 +270,8 @@ class Repl:
         print("  /reset - Reset conversation state", file=self.output)
         print("  /verbose [on|off] - Toggle verbose mode", file=self.output)
         print("  /debug [on|off] - Toggle debug mode for tool selection", file=self.output)
+        print("  /trace [on|off|clear|save PATH] - Record timing spans and export them as Chrome trace JSON", file=self.output)
+        print("  /stats [prometheus|save PATH|serve [PORT]] - Show performance metrics or export them in Prometheus format", file=self.output)
         print("  /test-aider [interactive|automatic] - Test Aider tool integration", file=self.output)
         print("  /task <identifier> [param=value] [param2='<json_value>'] [--flag] [--help] - Execute a task programmatically", file=self.output)
         print("      Aider shortcuts: /task aider:automatic prompt=\"Fix bug\" file_context='[\"src/file.py\"]'", file=self.output)
@@ -240,6 +351,76 @@ class Repl:
         current_mode = getattr(self.application.passthrough_handler, 'debug_mode', False)
         print(f"Debug mode: {'on' if current_mode else 'off'}", file=self.output)
     
+    def _cmd_trace(self, args: str) -> None:
+        """Control tracing and export recorded spans.
+        
+        Args:
+            args: 'on', 'off', 'clear' or 'save PATH'; no arguments shows the status
+        """
+        tracer = get_tracer()
+        parts = args.split(maxsplit=1)
+        action = parts[0].lower() if parts else ""
+        
+        if action in ["on", "off"]:
+            tracer.enable(action == "on")
+        elif action == "clear":
+            tracer.clear()
+        elif action == "save" and len(parts) > 1:
+            path = os.path.expanduser(parts[1])
+            try:
+                count = tracer.export_chrome_trace(path)
+            except OSError as e:
+                print(f"Error writing trace: {e}", file=self.output)
+                return
+            print(f"Wrote {count} spans to {path} (open in chrome://tracing or Perfetto)", file=self.output)
+            return
+        elif action:
+            print(f"Invalid option: {args}", file=self.output)
+            print("Usage: /trace [on|off|clear|save PATH]", file=self.output)
+            return
+        
+        print(f"Tracing: {'on' if tracer.enabled else 'off'} ({len(tracer.finished_spans())} spans recorded)",
+              file=self.output)
+    
+    def _cmd_stats(self, args: str) -> None:
+        """Show or export performance metrics.
+        
+        Args:
+            args: 'prometheus', 'save PATH' or 'serve [PORT]'; no arguments shows a summary
+        """
+        registry = get_registry()
+        parts = args.split()
+        action = parts[0].lower() if parts else ""
+        
+        if not action:
+            lines = registry.summary()
+            if not lines:
+                print("No metrics recorded yet", file=self.output)
+            for line in lines:
+                print(f"  {line}", file=self.output)
+        elif action == "prometheus":
+            print(registry.to_prometheus(), end="", file=self.output)
+        elif action == "save" and len(parts) > 1:
+            path = os.path.expanduser(parts[1])
+            try:
+                registry.write_prometheus(path)
+            except OSError as e:
+                print(f"Error writing metrics: {e}", file=self.output)
+                return
+            print(f"Metrics written to {path}", file=self.output)
+        elif action == "serve" and (len(parts) == 1 or parts[1].isdigit()):
+            if getattr(self, "metrics_server", None) is None:
+                try:
+                    self.metrics_server = registry.serve(int(parts[1]) if len(parts) > 1 else 0)
+                except OSError as e:
+                    print(f"Error starting metrics server: {e}", file=self.output)
+                    return
+            host, port = self.metrics_server.server_address[:2]
+            print(f"Serving metrics at http://{host}:{port}/metrics", file=self.output)
+        else:
+            print(f"Invalid option: {args}", file=self.output)
+            print("Usage: /stats [prometheus|save PATH|serve [PORT]]", file=self.output)
+    
     def _cmd_index(self, args: str) -> None:
         """Handle the index command.
         
@@ -347,48 +528,7 @@ class Repl:
             Tuple of (params, flags, error_message)
             error_message is None if parsing succeeded
         """
-        params: Dict[str, Any] = {}
-        flags: Dict[str, bool] = {}
-        error_message = None
-
-        for item in arg_list:
-            if item.startswith("--"):
-                # Handle flags
-                flag_name = item[2:]
-                if not flag_name:
-                    error_message = f"Warning: Ignoring invalid flag format: {item}"
-                    continue
-                flags[flag_name] = True
-            elif "=" in item:
-                # Handle key=value parameters
-                key, value = item.split("=", 1)
-                key = key.strip()
-                value = value.strip() # Keep original value from shlex
-                if not key:
-                    error_message = f"Warning: Ignoring parameter with empty key: {item}"
-                    continue
-
-                # Attempt JSON parsing for values starting/ending with brackets/braces/quotes
-                # Check common JSON starts/ends
-                is_potential_json = (value.startswith("[") and value.endswith("]")) or \
-                                    (value.startswith("{") and value.endswith("}")) or \
-                                    (value.startswith('"') and value.endswith('"'))
-
-                if is_potential_json:
-                    try:
-                        # json.loads expects double quotes for strings within JSON.
-                        params[key] = json.loads(value)
-                    except json.JSONDecodeError:
-                        # If JSON parsing fails, treat as a plain string
-                        error_message = f"Warning: Could not parse value for '{key}' as JSON - treating as string."
-                        params[key] = value # Store the raw string value
-                else:
-                    # Plain string value (shlex handles quotes)
-                    params[key] = value
-            else:
-                error_message = f"Warning: Ignoring invalid parameter format (expected key=value or --flag): {item}"
-
-        return params, flags, error_message
+        return parse_task_args(arg_list)
         
     def _handle_task_help(self, identifier: str) -> bool:
         """
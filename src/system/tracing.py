@@ -0,0 +1,246 @@
+"""Lightweight tracing: nested, timed spans exportable as Chrome trace JSON.
+
+Spans record their parent through a context variable, so nesting follows
+the call stack. Work submitted to thread pools keeps its parent when the
+callable is wrapped with bind_context. Tracing is off unless enabled
+(LLM_TRACE=1 or get_tracer().enable()); disabled spans cost one attribute
+check.
+
+Example:
+    with span("memory.shard", shard_index=3) as current:
+        ...
+        current.set_attribute("matches", len(matches))
+
+The resulting trace can be opened in chrome://tracing or Perfetto.
+"""
+import collections
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Finished spans kept by default; the oldest are dropped beyond this
+DEFAULT_MAX_SPANS = 100000
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """A timed operation with attributes, used as a context manager."""
+
+    __slots__ = ("tracer", "name", "span_id", "parent_id", "start_ns", "end_ns",
+                 "thread_id", "attributes", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.thread_id = 0
+        self.attributes = attributes
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute (e.g. token counts, cache hit) to the span."""
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds (0 while the span is open)."""
+        return max(0, self.end_ns - self.start_ns) / 1e9
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.thread_id = threading.get_ident()
+        self._token = _current_span.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.end_ns = time.perf_counter_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Span stand-in used while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collects finished spans in memory."""
+
+    def __init__(self, enabled: bool = False, max_spans: int = DEFAULT_MAX_SPANS):
+        """Initialize the tracer.
+
+        Args:
+            enabled: Whether spans are recorded
+            max_spans: Maximum finished spans kept
+        """
+        self.enabled = enabled
+        self._spans = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+
+    def enable(self, enabled: bool = True) -> None:
+        """Turn span recording on or off."""
+        self.enabled = enabled
+
+    def span(self, name: str, **attributes) -> Any:
+        """Start a span; use as a context manager.
+
+        Args:
+            name: Operation name (e.g. "task_system.execute_task")
+            **attributes: Initial attributes
+
+        Returns:
+            The span, or a no-op span while tracing is disabled
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def finished_spans(self) -> List[Span]:
+        """Get the finished spans, oldest first."""
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        """Drop all finished spans."""
+        with self._lock:
+            self._spans.clear()
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Convert finished spans to the Chrome trace event format.
+
+        Returns:
+            Dict with "traceEvents" of complete ("X") events; timestamps
+            and durations are in microseconds
+        """
+        pid = os.getpid()
+        events = []
+        for span in self.finished_spans():
+            args = {key: value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+                    for key, value in span.attributes.items()}
+            args["span_id"] = span.span_id
+            args["parent_id"] = span.parent_id
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (span.start_ns - self._origin_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": args,
+            })
+        events.sort(key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> int:
+        """Write finished spans as Chrome trace JSON.
+
+        Args:
+            path: Output file
+
+        Returns:
+            Number of spans written
+        """
+        trace = self.to_chrome_trace()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        return len(trace["traceEvents"])
+
+
+_tracer = Tracer(enabled=os.environ.get("LLM_TRACE", "").lower() in ("1", "true", "yes", "on"))
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer."""
+    return _tracer
+
+
+def span(name: str, **attributes) -> Any:
+    """Start a span on the process-wide tracer (see Tracer.span)."""
+    if not _tracer.enabled:
+        return NOOP_SPAN
+    return Span(_tracer, name, attributes)
+
+
+def current_span() -> Any:
+    """Get the innermost open span (a no-op span if there is none)."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: str) -> Callable:
+    """Decorate a function so each call is recorded as a span.
+
+    Args:
+        name: Span name
+
+    Returns:
+        Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(_tracer, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind_context(func: Callable) -> Callable:
+    """Make spans started by func in another thread nest under the current span.
+
+    Call this in the submitting thread. The returned callable may be run
+    by several threads at once (e.g. with executor.map).
+
+    Args:
+        func: Callable to run in another thread
+
+    Returns:
+        Callable running func under the caller's current span
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return run
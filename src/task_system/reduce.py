@@ -0,0 +1,380 @@
+"""Reduce operator: parallel map over inputs and tree-shaped reduction.
+
+Every input runs through the inner task concurrently. When the template
+declares its reduction associative, results are combined pairwise in
+rounds, so N inputs take ceil(log2 N) sequential reduction rounds instead
+of N; otherwise they are folded in input order as documented in
+docs/misc/operators.md.
+
+Completed map and reduction results are kept in a ReduceCheckpoint, so a
+rerun after a failure only executes the work that did not complete.
+"""
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from system.errors import (
+    create_input_validation_error, create_task_failure, format_error_result, SUBTASK_FAILURE
+)
+from system.tracing import bind_context
+from .sequential import MAX_PARALLEL_STEPS, execute_step, resolve_step_inputs
+
+# Context management defaults for reduce tasks (see docs/misc/operators.md)
+REDUCE_CONTEXT_DEFAULTS = {
+    "inherit_context": "none",
+    "accumulate_data": True,
+    "accumulation_format": "notes_only",
+}
+
+# Default retries of a failed inner or reduction task within one execution
+DEFAULT_LEAF_RETRIES = 1
+
+
+def reduce_fingerprint(template: Dict[str, Any], items: List[Tuple[str, Any]], initial_value: Any) -> str:
+    """Identify the work of a reduce task, so checkpoints are only reused for the same work."""
+    payload = json.dumps([template.get("name"), template.get("inner_task"), template.get("reduction_task"),
+                          items, initial_value], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ReduceCheckpoint:
+    """Completed results of a reduce task, keyed by map leaf or tree node.
+
+    Keys are "map:<i>" for the inner task of input i, "tree:<lo>:<hi>" for
+    the reduction of leaves lo..hi-1 and "fold:<i>" for the accumulator
+    after input i. When a path is given the checkpoint is written to it
+    after every new result.
+    """
+
+    def __init__(self, fingerprint: str, path: Optional[str] = None,
+                 entries: Optional[Dict[str, Any]] = None):
+        """Initialize the checkpoint.
+
+        Args:
+            fingerprint: Identity of the reduce task's work
+            path: Optional JSON file to persist to
+            entries: Optional previously completed results
+        """
+        self.fingerprint = fingerprint
+        self.path = path
+        self.entries: Dict[str, Any] = dict(entries or {})
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, fingerprint: str, source: Any = None, path: Optional[str] = None) -> "ReduceCheckpoint":
+        """Restore a checkpoint, ignoring one made for different work.
+
+        Args:
+            fingerprint: Identity of the reduce task's work
+            source: Optional checkpoint dict from a previous result's notes
+            path: Optional JSON file to restore from and persist to
+
+        Returns:
+            Checkpoint with the matching completed results
+        """
+        if source is None and path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    source = json.load(f)
+            except (OSError, ValueError):
+                source = None
+        entries = None
+        if isinstance(source, dict) and source.get("fingerprint") == fingerprint:
+            entries = source.get("entries")
+        return cls(fingerprint, path, entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up a completed result.
+
+        Returns:
+            Tuple of (found, content)
+        """
+        with self._lock:
+            if key not in self.entries:
+                return False, None
+            self.hits += 1
+            return True, self.entries[key]
+
+    def put(self, key: str, content: Any) -> None:
+        """Record a completed result.
+
+        Persisting is best effort: a checkpoint file that cannot be written
+        is logged and the result is still kept in memory.
+        """
+        with self._lock:
+            self.entries[key] = content
+            if self.path:
+                try:
+                    self._save()
+                except OSError as e:
+                    logging.warning("Could not write reduce checkpoint %s: %s", self.path, e)
+
+    def _save(self) -> None:
+        # Write-then-rename so an interrupted run never leaves a torn file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, default=str)
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the checkpoint."""
+        return {"fingerprint": self.fingerprint, "entries": dict(self.entries)}
+
+
+class _ReduceFailure(Exception):
+    """A map leaf or reduction node failed after its retries."""
+
+    def __init__(self, message: str, details: Dict[str, Any]):
+        super().__init__(message)
+        self.details = details
+
+
+class ReduceExecutor:
+    """Runs one reduce task."""
+
+    def __init__(self, task_system, template: Dict[str, Any], inputs: Dict[str, Any],
+                 memory_system=None, handler=None, call_depth: int = 0,
+                 max_workers: Optional[int] = None, checkpoint: Optional[Dict[str, Any]] = None,
+                 **kwargs):
+        """Initialize the executor.
+
+        Args:
+            task_system: TaskSystem executing the inner and reduction tasks
+            template: Reduce task template
+            inputs: Resolved task inputs
+            memory_system: Optional Memory System instance
+            handler: Optional handler shared by the subtasks
+            call_depth: Call depth of the reduce task
+            max_workers: Maximum concurrently running subtasks
+            checkpoint: Optional checkpoint from a previous failed result
+            **kwargs: Execution options of the reduce task (inherited_context, ...)
+        """
+        self.task_system = task_system
+        self.template = template
+        self.inputs = inputs
+        self.memory_system = memory_system
+        self.handler = handler
+        self.call_depth = call_depth
+        self.max_workers = max_workers or MAX_PARALLEL_STEPS
+        self.checkpoint_source = checkpoint
+        self.kwargs = kwargs
+        self.retries = 0
+        self._lock = threading.Lock()
+
+        settings = dict(REDUCE_CONTEXT_DEFAULTS)
+        settings.update(template.get("context_management", {}))
+        self.context_management = settings
+
+    def _items(self) -> List[Tuple[str, Any]]:
+        """Get the named inputs to reduce, from the template or a task input."""
+        items = self.template.get("items")
+        if items is None:
+            items = self.inputs.get(self.template.get("items_from", "items"))
+        if isinstance(items, dict):
+            return list(items.items())
+        if isinstance(items, list):
+            return [(f"item_{i + 1}", value) for i, value in enumerate(items)]
+        raise ValueError("Reduce task requires a list or dict of inputs")
+
+    def _run(self, task: Dict[str, Any], sources: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute the inner or reduction task once."""
+        task_kwargs = {}
+        if self.context_management["inherit_context"] != "none" and "inherited_context" in self.kwargs:
+            task_kwargs["inherited_context"] = self.kwargs["inherited_context"]
+        if "handler_config" in self.kwargs:
+            task_kwargs["handler_config"] = dict(self.kwargs["handler_config"])
+        try:
+            task_inputs = resolve_step_inputs(task, self.inputs, sources)
+        except ValueError as e:
+            return {"status": "FAILED", "content": str(e), "notes": {"error": str(e)}}
+        return execute_step(self.task_system, task, task_inputs, memory_system=self.memory_system,
+                            handler=self.handler, call_depth=self.call_depth + 1, **task_kwargs)
+
+    def _run_node(self, key: str, task: Dict[str, Any], sources: Dict[str, Any],
+                  details: Dict[str, Any]) -> Any:
+        """Get a node's result from the checkpoint, or run it with retries.
+
+        Raises:
+            _ReduceFailure: If the node still fails after its retries
+        """
+        found, content = self.checkpoint.get(key)
+        if found:
+            return content
+        attempts = 1 + self.template.get("leaf_retries", DEFAULT_LEAF_RETRIES)
+        for attempt in range(attempts):
+            if attempt:
+                with self._lock:
+                    self.retries += 1
+            result = self._run(task, sources)
+            if result.get("status") != "FAILED":
+                content = result.get("content", "")
+                self.checkpoint.put(key, content)
+                return content
+        raise _ReduceFailure(result.get("content", ""), details)
+
+    def _run_all(self, executor, jobs: List[Callable[[], Any]]) -> List[Any]:
+        """Run jobs concurrently, raising the failure of the first job in order."""
+        futures = [executor.submit(bind_context(job)) for job in jobs]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+
+    def execute(self) -> Dict[str, Any]:
+        """Run the map phase and the reduction.
+
+        Returns:
+            Task result with the reduced value as content, the number of
+            sequential reduction rounds in notes["rounds"] and, on failure,
+            a checkpoint in notes["checkpoint"] to resume from
+        """
+        inner_task = self.template.get("inner_task")
+        reduction_task = self.template.get("reduction_task")
+        if not isinstance(inner_task, dict) or not isinstance(reduction_task, dict):
+            return format_error_result(create_input_validation_error(
+                "Reduce task requires an inner_task and a reduction_task"))
+        try:
+            items = self._items()
+        except ValueError as e:
+            return format_error_result(create_input_validation_error(str(e)))
+
+        initial_value = self.template.get("initial_value")
+        self.checkpoint = ReduceCheckpoint.load(
+            reduce_fingerprint(self.template, items, initial_value), self.checkpoint_source,
+            self.kwargs.get("checkpoint_path", self.template.get("checkpoint_path")))
+        associative = self.template.get("associative", False)
+        timings = {}
+        rounds = 0
+        started = time.perf_counter()
+
+        workers = max(1, min(self.max_workers, len(items)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                # Map: all inputs through the inner task concurrently
+                mapped = self._run_all(executor, [
+                    (lambda i=i, name=name, value=value: self._run_node(
+                        f"map:{i}", inner_task, {"current_data": value, "input_name": name},
+                        {"phase": "map", "input": name}))
+                    for i, (name, value) in enumerate(items)
+                ])
+                timings["map"] = time.perf_counter() - started
+
+                reduce_started = time.perf_counter()
+                if associative:
+                    content, rounds = self._reduce_tree(executor, reduction_task, items, mapped, initial_value)
+                else:
+                    content, rounds = self._reduce_fold(reduction_task, items, mapped, initial_value)
+                timings["reduce"] = time.perf_counter() - reduce_started
+            except _ReduceFailure as e:
+                return self._failure(str(e), e.details, len(items), rounds)
+
+        return {
+            "status": "COMPLETE",
+            "content": content,
+            "notes": {
+                "inputs": len(items),
+                "rounds": rounds,
+                "associative": associative,
+                "retries": self.retries,
+                "checkpoint_hits": self.checkpoint.hits,
+                "timings": timings,
+                "context_management": dict(self.context_management),
+            },
+        }
+
+    def _reduce_tree(self, executor, reduction_task, items, mapped, initial_value) -> Tuple[Any, int]:
+        """Combine adjacent results pairwise until one remains.
+
+        Nodes are (lo, hi, content) over leaf positions; the initial value,
+        if any, is the leftmost leaf. The reduction receives the left node as
+        "accumulator" and the right node as "current_result"; its
+        "original_input" is the right node's input (a list when it covers
+        several).
+        """
+        values = [value for _, value in items]
+        offset = 0
+        nodes = [(i, i + 1, content) for i, content in enumerate(mapped)]
+        if initial_value is not None:
+            offset = 1
+            nodes = [(0, 1, initial_value)] + [(lo + 1, hi + 1, content) for lo, hi, content in nodes]
+        if not nodes:
+            return "", 0
+
+        def original(lo, hi):
+            covered = values[lo - offset:hi - offset]
+            return covered[0] if len(covered) == 1 else covered
+
+        rounds = 0
+        while len(nodes) > 1:
+            pairs = [(nodes[i], nodes[i + 1]) for i in range(0, len(nodes) - 1, 2)]
+            combined = self._run_all(executor, [
+                (lambda left=left, right=right: self._run_node(
+                    f"tree:{left[0]}:{right[1]}", reduction_task,
+                    {"accumulator": left[2], "current_result": right[2],
+                     "original_input": original(right[0], right[1])},
+                    {"phase": "reduce", "round": rounds + 1, "range": [left[0], right[1]]}))
+                for left, right in pairs
+            ])
+            next_nodes = [(left[0], right[1], content) for (left, right), content in zip(pairs, combined)]
+            if len(nodes) % 2:
+                next_nodes.append(nodes[-1])
+            nodes = next_nodes
+            rounds += 1
+        return nodes[0][2], rounds
+
+    def _reduce_fold(self, reduction_task, items, mapped, initial_value) -> Tuple[Any, int]:
+        """Fold results into the accumulator in input order."""
+        if not mapped:
+            return initial_value if initial_value is not None else "", 0
+        start = 0
+        accumulator = initial_value
+        if accumulator is None:
+            accumulator, start = mapped[0], 1
+        for i in range(start, len(mapped)):
+            accumulator = self._run_node(
+                f"fold:{i}", reduction_task,
+                {"accumulator": accumulator, "current_result": mapped[i], "original_input": items[i][1]},
+                {"phase": "reduce", "input": items[i][0]})
+        return accumulator, len(mapped) - start
+
+    def _failure(self, message: str, details: Dict[str, Any], count: int, rounds: int) -> Dict[str, Any]:
+        """Build a failed result carrying the checkpoint to resume from."""
+        where = f"input '{details['input']}'" if "input" in details else f"reduction of {details.get('range')}"
+        result = format_error_result(create_task_failure(
+            f"Reduce {details['phase']} failed for {where}: {message}",
+            reason=SUBTASK_FAILURE,
+            details=details,
+        ))
+        result["notes"].update({
+            "inputs": count,
+            "rounds": rounds,
+            "retries": self.retries,
+            "checkpoint": self.checkpoint.to_dict(),
+        })
+        return result
+
+
+def execute_reduce(task_system, template: Dict[str, Any], inputs: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    """Execute a reduce task.
+
+    Args:
+        task_system: TaskSystem executing the inner and reduction tasks
+        template: Reduce task template
+        inputs: Resolved task inputs
+        **kwargs: See ReduceExecutor
+
+    Returns:
+        Task result
+    """
+    return ReduceExecutor(task_system, template, inputs, **kwargs).execute()
@@ -0,0 +1,386 @@
+"""Sequential operator: steps scheduled as a dependency DAG.
+
+By default each step waits for every step before it, so steps run one at a
+time in order. Steps may have side effects (aider edits, shell commands)
+whose order matters, so running them early is opt-in: a step whose template
+declares ``"parallel_safe": True``, or any step of a task declaring
+``"parallel_steps": True``, waits only for the steps it references through
+its inputs (``{"from": "step"}``) or an explicit ``depends_on`` list. Such
+steps run concurrently on a bounded worker pool; results are always
+reported in step order, so the outcome does not depend on scheduling.
+"""
+import concurrent.futures
+import json
+import logging
+import time
+from typing import Any, Collection, Dict, List, Optional, Set, Tuple
+
+from system.errors import (
+    create_input_validation_error, create_task_failure, format_error_result, SUBTASK_FAILURE
+)
+from system.tracing import bind_context
+
+# Default bound on concurrently running steps of one sequential task
+MAX_PARALLEL_STEPS = 4
+
+# Context management defaults for sequential tasks (see docs/misc/operators.md)
+SEQUENTIAL_CONTEXT_DEFAULTS = {
+    "inherit_context": "full",
+    "accumulate_data": True,
+    "accumulation_format": "notes_only",
+}
+
+
+def step_name(step: Dict[str, Any], index: int) -> str:
+    """Get a step's name, defaulting to its 1-based position."""
+    return step.get("name") or f"step_{index + 1}"
+
+
+def build_step_graph(steps: List[Dict[str, Any]], run_early: Collection[int] = ()) -> List[Set[int]]:
+    """Build the dependencies of each step.
+
+    Args:
+        steps: Step definitions
+        run_early: Indices of steps that depend only on the steps they
+            reference; every other step depends on all steps before it
+
+    Returns:
+        For each step, the indices of the steps it directly depends on
+
+    Raises:
+        ValueError: If step names are duplicated or a step depends on itself
+            or on a later step
+    """
+    indices: Dict[str, int] = {}
+    for index, step in enumerate(steps):
+        name = step_name(step, index)
+        if name in indices:
+            raise ValueError(f"Duplicate step name: '{name}'")
+        indices[name] = index
+
+    graph = []
+    for index, step in enumerate(steps):
+        sources = [spec["from"] for spec in step.get("inputs", {}).values()
+                   if isinstance(spec, dict) and "from" in spec]
+        explicit = step.get("depends_on", [])
+        if isinstance(explicit, str):
+            explicit = [explicit]
+        for name in explicit:
+            if name not in indices:
+                raise ValueError(f"Step '{step_name(step, index)}' depends on unknown step '{name}'")
+
+        dependencies = set()
+        for name in [*sources, *explicit]:
+            if name not in indices:
+                continue  # Parent task input
+            if indices[name] >= index:
+                raise ValueError(f"Step '{step_name(step, index)}' depends on step '{name}', "
+                                 "which does not come before it")
+            dependencies.add(indices[name])
+        if index not in run_early:
+            dependencies.update(range(index))
+        graph.append(dependencies)
+    return graph
+
+
+def step_ancestors(graph: List[Set[int]]) -> List[Set[int]]:
+    """Get the transitive dependencies of each step."""
+    ancestors: List[Set[int]] = []
+    for dependencies in graph:
+        # Dependencies always come earlier, so their ancestors are known
+        closure = set(dependencies)
+        for dependency in dependencies:
+            closure |= ancestors[dependency]
+        ancestors.append(closure)
+    return ancestors
+
+
+def resolve_step_inputs(step: Dict[str, Any], parent_inputs: Dict[str, Any],
+                        outputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve a step's inputs.
+
+    Args:
+        step: Step definition
+        parent_inputs: Inputs of the sequential task
+        outputs: Content of completed steps by step name
+
+    Returns:
+        Input values by name
+
+    Raises:
+        ValueError: If an input references an unknown source
+    """
+    resolved = {}
+    for name, spec in step.get("inputs", {}).items():
+        if isinstance(spec, dict) and "from" in spec:
+            source = spec["from"]
+            if source in outputs:
+                resolved[name] = outputs[source]
+            elif source in parent_inputs:
+                resolved[name] = parent_inputs[source]
+            else:
+                raise ValueError(f"Input '{name}' references unknown source '{source}'")
+        else:
+            resolved[name] = spec
+    return resolved
+
+
+def accumulated_output(name: str, result: Dict[str, Any], accumulation_format: str) -> str:
+    """Render a step result for accumulation into later steps.
+
+    Args:
+        name: Step name
+        result: Step result
+        accumulation_format: "full_output" for the step content, otherwise
+            only its notes are kept
+
+    Returns:
+        Accumulated output text
+    """
+    if accumulation_format == "full_output":
+        return f"{name}: {result.get('content', '')}"
+    return f"{name}: {json.dumps(result.get('notes', {}), sort_keys=True, default=str)}"
+
+
+def step_task_key(task_system, step: Dict[str, Any]) -> Tuple[str, str]:
+    """Get the task type and subtype a step runs.
+
+    Args:
+        task_system: TaskSystem holding the templates
+        step: Step definition naming a registered "template" or a type/subtype
+
+    Returns:
+        Tuple of (task type, task subtype)
+
+    Raises:
+        ValueError: If the step names an unknown template
+    """
+    if "template" in step:
+        template = task_system.templates.get(step["template"])
+        if template is None:
+            raise ValueError(f"Unknown template: '{step['template']}'")
+        return template.get("type", "atomic"), template.get("subtype", "")
+    return step.get("type", "atomic"), step.get("subtype", "")
+
+
+def step_runs_early(task_system, step: Dict[str, Any]) -> bool:
+    """Check whether a step may start before the steps preceding it.
+
+    Only steps running a registered template that declares
+    "parallel_safe": True may; the order of the others' side effects matters.
+
+    Args:
+        task_system: TaskSystem holding the templates
+        step: Step definition naming a registered "template" or a type/subtype
+
+    Returns:
+        True if the step only has to wait for the steps it references
+    """
+    if "template" in step:
+        template = task_system.templates.get(step["template"])
+    else:
+        key = f"{step.get('type', 'atomic')}:{step.get('subtype', '')}"
+        template = task_system.templates.get(task_system.template_index.get(key))
+    return isinstance(template, dict) and template.get("parallel_safe") is True
+
+
+def execute_step(task_system, step: Dict[str, Any], step_inputs: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    """Execute a step as a task, converting exceptions to failed results.
+
+    Args:
+        task_system: TaskSystem executing the step
+        step: Step definition
+        step_inputs: Resolved step inputs
+        **kwargs: Options for TaskSystem.execute_task
+
+    Returns:
+        Step result
+    """
+    try:
+        task_type, task_subtype = step_task_key(task_system, step)
+        return task_system.execute_task(task_type, task_subtype, step_inputs, **kwargs)
+    except Exception as e:
+        logging.exception("Step %s failed", step.get("name") or step.get("template") or step.get("subtype"))
+        return {"status": "FAILED", "content": str(e), "notes": {"error": str(e)}}
+
+
+class SequentialExecutor:
+    """Runs the steps of one sequential task."""
+
+    def __init__(self, task_system, template: Dict[str, Any], inputs: Dict[str, Any],
+                 memory_system=None, handler=None, call_depth: int = 0,
+                 max_workers: Optional[int] = None, **kwargs):
+        """Initialize the executor.
+
+        Args:
+            task_system: TaskSystem executing the steps
+            template: Sequential task template
+            inputs: Resolved task inputs
+            memory_system: Optional Memory System instance
+            handler: Optional handler shared by the steps
+            call_depth: Call depth of the sequential task
+            max_workers: Maximum concurrently running steps
+            **kwargs: Execution options of the sequential task (inherited_context, ...)
+        """
+        self.task_system = task_system
+        self.template = template
+        self.inputs = inputs
+        self.memory_system = memory_system
+        self.handler = handler
+        self.call_depth = call_depth
+        self.max_workers = max_workers or MAX_PARALLEL_STEPS
+        self.kwargs = kwargs
+
+        settings = dict(SEQUENTIAL_CONTEXT_DEFAULTS)
+        settings.update(template.get("context_management", {}))
+        self.context_management = settings
+
+    def _run_step(self, index: int, step: Dict[str, Any], step_inputs: Dict[str, Any],
+                  previous_outputs: Optional[List[str]]) -> Dict[str, Any]:
+        """Execute one step with the sequential task's context settings."""
+        step_kwargs = {}
+        if self.context_management["inherit_context"] != "none" and "inherited_context" in self.kwargs:
+            step_kwargs["inherited_context"] = self.kwargs["inherited_context"]
+        if previous_outputs is not None:
+            step_kwargs["previous_outputs"] = previous_outputs
+        if "handler_config" in self.kwargs:
+            step_kwargs["handler_config"] = dict(self.kwargs["handler_config"])
+        return execute_step(self.task_system, step, step_inputs, memory_system=self.memory_system,
+                            handler=self.handler, call_depth=self.call_depth + 1, **step_kwargs)
+
+    def execute(self) -> Dict[str, Any]:
+        """Run all steps.
+
+        A failed step skips the steps depending on it, which by default are
+        all later steps; steps that run early and do not reference it still
+        run. The reported failure is the first failed step in step
+        order.
+
+        Returns:
+            Task result with the content of the last step, per-step status in
+            notes["steps"] and timings in notes["step_timings"]
+        """
+        steps = self.template.get("steps")
+        if not isinstance(steps, list) or not steps:
+            return format_error_result(create_input_validation_error(
+                "Sequential task requires a non-empty list of steps"))
+        if self.template.get("parallel_steps") is True:
+            run_early = set(range(len(steps)))
+        else:
+            run_early = {index for index, step in enumerate(steps) if step_runs_early(self.task_system, step)}
+        try:
+            graph = build_step_graph(steps, run_early)
+        except ValueError as e:
+            return format_error_result(create_input_validation_error(f"Invalid sequential task: {e}"))
+        ancestors = step_ancestors(graph)
+        names = [step_name(step, index) for index, step in enumerate(steps)]
+        accumulate = self.context_management["accumulate_data"]
+        accumulation_format = self.context_management["accumulation_format"]
+
+        results: Dict[int, Dict[str, Any]] = {}
+        timings: Dict[int, Dict[str, float]] = {}
+        skipped: Set[int] = set()
+        outputs: Dict[str, Any] = {}
+        accumulated: Dict[int, str] = {}
+        started = time.perf_counter()
+
+        def run(index: int, step_inputs: Dict[str, Any], previous_outputs: Optional[List[str]]):
+            start = time.perf_counter()
+            result = self._run_step(index, steps[index], step_inputs, previous_outputs)
+            return result, start, time.perf_counter()
+
+        pending = list(range(len(steps)))
+        running: Dict[concurrent.futures.Future, int] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(steps))) as executor:
+            while pending or running:
+                # Submit ready steps in step order
+                for index in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if graph[index] & skipped:
+                        pending.remove(index)
+                        skipped.add(index)
+                        continue
+                    if not graph[index] <= results.keys():
+                        continue
+                    pending.remove(index)
+                    try:
+                        step_inputs = resolve_step_inputs(steps[index], self.inputs, outputs)
+                    except ValueError as e:
+                        results[index] = {"status": "FAILED", "content": str(e), "notes": {"error": str(e)}}
+                        skipped.add(index)
+                        continue
+                    # Only ancestors are accumulated, so concurrent siblings see the same outputs
+                    # regardless of which finishes first
+                    previous_outputs = [accumulated[i] for i in sorted(ancestors[index])] if accumulate else None
+                    running[executor.submit(bind_context(run), index, step_inputs, previous_outputs)] = index
+
+                if not running:
+                    continue
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in sorted(done, key=running.get):
+                    index = running.pop(future)
+                    result, start, end = future.result()
+                    results[index] = result
+                    timings[index] = {"start": start - started, "duration": end - start}
+                    if result.get("status") == "FAILED":
+                        skipped.add(index)
+                    else:
+                        outputs[names[index]] = result.get("content", "")
+                        accumulated[index] = accumulated_output(names[index], result, accumulation_format)
+
+        return self._build_result(steps, names, results, timings, skipped, time.perf_counter() - started)
+
+    def _build_result(self, steps, names, results, timings, skipped, elapsed) -> Dict[str, Any]:
+        """Combine step results in step order."""
+        step_notes = []
+        failed = None
+        for index, name in enumerate(names):
+            result = results.get(index)
+            if result is None:
+                step_notes.append({"step": name, "status": "SKIPPED"})
+                continue
+            status = result.get("status", "COMPLETE")
+            entry = {"step": name, "status": status, "notes": result.get("notes", {})}
+            if self.context_management["accumulation_format"] == "full_output":
+                entry["content"] = result.get("content", "")
+            step_notes.append(entry)
+            if status == "FAILED" and failed is None:
+                failed = index
+
+        notes = {
+            "steps": step_notes,
+            "step_timings": {names[index]: timing for index, timing in sorted(timings.items())},
+            "elapsed": elapsed,
+            "context_management": dict(self.context_management),
+        }
+
+        if failed is not None:
+            result = format_error_result(create_task_failure(
+                f"Step '{names[failed]}' failed: {results[failed].get('content', '')}",
+                reason=SUBTASK_FAILURE,
+                details={"step": names[failed], "step_index": failed},
+            ))
+            result["notes"].update(notes)
+            return result
+
+        return {
+            "status": "COMPLETE",
+            "content": results[len(steps) - 1].get("content", ""),
+            "notes": notes,
+        }
+
+
+def execute_sequential(task_system, template: Dict[str, Any], inputs: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    """Execute a sequential task.
+
+    Args:
+        task_system: TaskSystem executing the steps
+        template: Sequential task template
+        inputs: Resolved task inputs
+        **kwargs: See SequentialExecutor
+
+    Returns:
+        Task result
+    """
+    return SequentialExecutor(task_system, template, inputs, **kwargs).execute()
@@ -5,14 +5,19 @@ import os
 import logging
 from unittest.mock import MagicMock
 
-from .template_utils import resolve_parameters, ensure_template_compatibility, get_preferred_model
+from .template_utils import resolve_parameters, ensure_template_compatibility, get_preferred_model, MAX_PARALLEL_CALLS
 from .ast_nodes import FunctionCallNode
 from .template_utils import Environment
 from system.errors import TaskError, create_task_failure, format_error_result
 from evaluator.interfaces import EvaluatorInterface, TemplateLookupInterface
 from .template_processor import TemplateProcessor
+from .template_matching import IndexedTemplates, TemplateMatchIndex, jaccard_similarity, tokenize_for_matching
+from .sequential import execute_sequential, MAX_PARALLEL_STEPS
+from system.tracing import current_span, traced
+from .reduce import execute_reduce
 from .mock_handler import MockHandler
 from memory.context_generation import ContextGenerationInput
+from memory.context_packing import get_context_token_budget, pack_context
 from .ast_nodes import SubtaskRequest # Adjust import path if needed
 from .template_utils import Environment
 from .ast_nodes import SubtaskRequest # Add SubtaskRequest import
@@ -39,8 +44,11 @@ class TaskSystem(TemplateLookupInterface):
             evaluator: Optional Evaluator instance for AST evaluation
             memory_system: Optional Memory System instance
         """
+        self._match_index = TemplateMatchIndex()  # Word index for find_matching_tasks
         self.templates = {}  # Templates by name
         self.template_index = {}  # Maps type:subtype to template name
+        self.max_parallel_calls = MAX_PARALLEL_CALLS  # Concurrent function calls per template field
+        self.max_parallel_steps = MAX_PARALLEL_STEPS  # Concurrent subtasks per sequential or reduce task
         self.evaluator = evaluator  # Store evaluator (dependency injection)
         
         # If no evaluator was provided, initialize one later when needed
@@ -57,7 +65,16 @@ class TaskSystem(TemplateLookupInterface):
         
         # Store memory system reference
         self.memory_system = memory_system
-    
+
+    @property
+    def templates(self) -> Dict[str, Any]:
+        """Templates by name; assignments keep the match index current."""
+        return self._templates
+
+    @templates.setter
+    def templates(self, templates: Dict[str, Any]) -> None:
+        self._templates = IndexedTemplates(self._match_index, templates)
+
     def _ensure_evaluator(self):
         """
         Ensure an evaluator is available, creating one if needed.
@@ -547,28 +564,22 @@ class TaskSystem(TemplateLookupInterface):
         Returns:
             List of matching templates with scores
         """
+        # Only atomic templates sharing a word with the input are scored
         matches = []
-        
-        # Filter for atomic templates only
-        for name, template in self.templates.items():
-            if template.get("type") == "atomic":
-                # Calculate similarity score
-                description = template.get("description", "")
-                score = self._calculate_similarity_score(input_text, description)
-                
-                # Add to matches if score is above threshold
-                if score > 0.1:  # Low threshold to ensure we get some matches
-                    task_type = template.get("type", "")
-                    subtype = template.get("subtype", "")
-                    matches.append({
-                        "task": template,
-                        "score": score,
-                        "taskType": task_type,
-                        "subtype": subtype
-                    })
-        
-        # Sort by score (descending)
-        matches.sort(key=lambda x: x["score"], reverse=True)
+        for name, score in self._match_index.score(input_text):
+            # Add to matches if score is above threshold
+            if score > 0.1:  # Low threshold to ensure we get some matches
+                template = self.templates.get(name)
+                if template is None:
+                    continue  # Removed on another thread since scoring
+                matches.append({
+                    "task": template,
+                    "score": score,
+                    "taskType": template.get("type", ""),
+                    "subtype": template.get("subtype", "")
+                })
+        
+        # Already sorted by score (descending)
         return matches
     
     def _calculate_similarity_score(self, input_text: str, template_description: str) -> float:
@@ -583,31 +594,9 @@ class TaskSystem(TemplateLookupInterface):
         Returns:
             Similarity score (0-1)
         """
-        # Normalize texts
-        input_text = input_text.lower()
-        template_description = template_description.lower()
-        
-        # Remove punctuation
-        for char in ".,;:!?()[]{}\"'":
-            input_text = input_text.replace(char, " ")
-            template_description = template_description.replace(char, " ")
-        
-        # Split into words
-        input_words = set(input_text.split())
-        template_words = set(template_description.split())
-        
-        # Calculate overlap
-        if not template_words:
-            return 0.0
-            
-        # Jaccard similarity
-        intersection = len(input_words.intersection(template_words))
-        union = len(input_words.union(template_words))
-        
-        if union == 0:
-            return 0.0
-            
-        return intersection / union
+        # Jaccard similarity of the normalized word sets
+        return jaccard_similarity(tokenize_for_matching(input_text),
+                                  tokenize_for_matching(template_description))
     
     def register_template(self, template: Dict[str, Any]) -> None:
         """Register a task template with enhanced structure.
@@ -623,9 +612,12 @@ class TaskSystem(TemplateLookupInterface):
         template_type = enhanced_template.get("type")
         template_subtype = enhanced_template.get("subtype")
         
-        # Register by name (primary key)
+        # Register by name (primary key); this also indexes the description
         self.templates[template_name] = enhanced_template
         
+        # Compile variable references and function calls once
+        self.template_processor.compile_template(enhanced_template)
+        
         # Also index by type and subtype
         if template_type and template_subtype:
             key = f"{template_type}:{template_subtype}"
@@ -721,47 +713,7 @@ class TaskSystem(TemplateLookupInterface):
                 matches_data = []
             else:
                 matches_data = json.loads(content) if isinstance(content, str) and content.strip() else content
-            
-            if isinstance(matches_data, list):
-                logging.debug("Parsed %d items from LLM JSON response", len(matches_data))
-                for item in matches_data:
-                    # Ensure item is a dictionary before accessing keys
-                    if not isinstance(item, dict):
-                        logging.warning("Skipping non-dict item in matches: %s", item)
-                        continue
-                        
-                    if "path" in item:
-                        path = item["path"]
-                        relevance = item.get("relevance", "Relevant to query")
-                        score = item.get("score")
-                        
-                        # Convert score to float if present (score is no longer part of the tuple)
-                        # if score is not None:
-                        #     try:
-                        #         score = float(score)
-                        #     except (ValueError, TypeError):
-                        #         score = None
-
-                        # Try exact match first
-                        if path in global_index:
-                            # Create 2-tuple (path, relevance)
-                            file_matches.append((path, relevance))
-                        else:
-                            # Try to match by basename if exact match fails
-                            # This helps with relative vs absolute path differences
-                            path_basename = os.path.basename(path)
-                            matched = False
-
-                            for index_path in global_index.keys():
-                                if os.path.basename(index_path) == path_basename:
-                                    # Create 2-tuple (path, relevance)
-                                    file_matches.append((index_path, relevance))
-                                    matched = True
-                                    break
-                            if not matched:
-                                logging.warning("Path not found in index: %s", path)
-            else:
-                logging.warning("Expected list but got %s: %s", type(matches_data).__name__, matches_data)
+            file_matches = self._resolve_file_matches(matches_data, global_index)
         except Exception as e:
             logging.exception("Error processing context generation result:")
         
@@ -773,20 +725,120 @@ class TaskSystem(TemplateLookupInterface):
         # Ensure file_matches is now List[Tuple[str, str]]
         return AssociativeMatchResult(context=context, matches=file_matches)
 
-    def _execute_context_generation_task(self, context_input, global_index, handler):
-        import os  # Add import for os.path functions
-        """Execute specialized context generation task using LLM.
+    def generate_context_batch_for_memory_system(self, requests: List[Tuple[Any, Dict[str, str]]]) -> List[Any]:
+        """Generate context for many requests with one provider batch.
         
-        This creates a specialized task for context generation and executes it
-        using the appropriate Handler.
+        Bulk counterpart of generate_context_for_memory_system: every
+        associative matching request is submitted through the provider's
+        send_batch, so throughput-oriented jobs (e.g. pre-computing context
+        for queued tasks) use the provider's batch path instead of one
+        interactive call per request.
+        
+        Args:
+            requests: List of (context_input, file_metadata) pairs
+            
+        Returns:
+            One AssociativeMatchResult per request, in request order
+        """
+        from memory.context_generation import AssociativeMatchResult
+        from .templates.associative_matching import (
+            ASSOCIATIVE_MATCHING_TEMPLATE, build_matching_request, parse_matching_response
+        )
+        from handler.model_router import RETRIEVAL, get_model_router
+        
+        handler = getattr(self.memory_system, "handler", None) if getattr(self, "memory_system", None) else None
+        provider = getattr(handler, "model_provider", None)
+        if not provider:
+            logging.error("Cannot perform batch associative matching: No handler with a model provider.")
+            return [AssociativeMatchResult(context="Error: Handler not available for context generation", matches=[])
+                    for _ in requests]
+        
+        results: List[Any] = [None] * len(requests)
+        batch_requests = []
+        batch_positions = []
+        for i, (context_input, global_index) in enumerate(requests):
+            if context_input.fresh_context == "disabled":
+                results[i] = AssociativeMatchResult(
+                    context=context_input.inherited_context or "No context available", matches=[])
+                continue
+            request = build_matching_request(self._build_context_generation_inputs(context_input, global_index))
+            if request is None:
+                results[i] = AssociativeMatchResult(context="No files in index", matches=[])
+                continue
+            batch_requests.append(request)
+            batch_positions.append(i)
+        
+        if batch_requests:
+            logging.info("Submitting %d associative matching requests as a batch", len(batch_requests))
+            responses = get_model_router(handler).send_batch(
+                provider, batch_requests, task_class=RETRIEVAL, template=ASSOCIATIVE_MATCHING_TEMPLATE)
+            for i, response in zip(batch_positions, responses):
+                global_index = requests[i][1]
+                file_matches = self._resolve_file_matches(parse_matching_response(response, provider), global_index)
+                if file_matches:
+                    context = f"Found {len(file_matches)} relevant files."
+                elif isinstance(response, str) and response.startswith("Error"):
+                    context = response
+                else:
+                    context = "No relevant files found."
+                results[i] = AssociativeMatchResult(context=context, matches=file_matches)
+        return results
+
+    def _resolve_file_matches(self, matches_data, global_index) -> List[Tuple[str, str]]:
+        """Resolve parsed associative matching output against the global index.
+        
+        Args:
+            matches_data: Parsed list of file objects with 'path' and 'relevance'
+            global_index: Global file metadata index
+            
+        Returns:
+            List of (path, relevance) tuples for files found in the index
+        """
+        file_matches = []
+        if not isinstance(matches_data, list):
+            logging.warning("Expected list but got %s: %s", type(matches_data).__name__, matches_data)
+            return file_matches
+        
+        logging.debug("Parsed %d items from LLM JSON response", len(matches_data))
+        for item in matches_data:
+            # Ensure item is a dictionary before accessing keys
+            if not isinstance(item, dict):
+                logging.warning("Skipping non-dict item in matches: %s", item)
+                continue
+                
+            if "path" in item:
+                path = item["path"]
+                relevance = item.get("relevance", "Relevant to query")
+
+                # Try exact match first
+                if path in global_index:
+                    # Create 2-tuple (path, relevance)
+                    file_matches.append((path, relevance))
+                else:
+                    # Try to match by basename if exact match fails
+                    # This helps with relative vs absolute path differences
+                    path_basename = os.path.basename(path)
+                    matched = False
+
+                    for index_path in global_index.keys():
+                        if os.path.basename(index_path) == path_basename:
+                            # Create 2-tuple (path, relevance)
+                            file_matches.append((index_path, relevance))
+                            matched = True
+                            break
+                    if not matched:
+                        logging.warning("Path not found in index: %s", path)
+        return file_matches
+
+    def _build_context_generation_inputs(self, context_input, global_index) -> Dict[str, Any]:
+        """Build associative matching template inputs for a context request.
         
         Args:
             context_input: Context generation input
             global_index: Global file metadata index
-            handler: The handler instance to use for LLM calls
             
         Returns:
-            Task result with relevant file information
+            Inputs for the associative_matching template
         """
         # Format metadata as a string
         metadata_items = []
@@ -813,6 +865,25 @@ class TaskSystem(TemplateLookupInterface):
         if context_input.previous_outputs:
             inputs["previous_outputs"] = context_input.previous_outputs
         
+        return inputs
+
+    def _execute_context_generation_task(self, context_input, global_index, handler):
+        import os  # Add import for os.path functions
+        """Execute specialized context generation task using LLM.
+        
+        This creates a specialized task for context generation and executes it
+        using the appropriate Handler.
+        
+        Args:
+            context_input: Context generation input
+            global_index: Global file metadata index
+            handler: The handler instance to use for LLM calls
+            
+        Returns:
+            Task result with relevant file information
+        """
+        inputs = self._build_context_generation_inputs(context_input, global_index)
+        
         # Use the passed handler instance
         if not handler:
             logging.error("No handler provided to _execute_context_generation_task.")
@@ -922,6 +993,7 @@ class TaskSystem(TemplateLookupInterface):
         
         return file_paths, error_message
         
+    @traced("task_system.execute_task")
     def execute_task(self, task_type: str, task_subtype: str, inputs: Dict[str, Any], 
                     memory_system=None, available_models: Optional[List[str]] = None,
                     call_depth: int = 0, handler=None, **kwargs) -> Dict[str, Any]:
@@ -942,6 +1014,7 @@ class TaskSystem(TemplateLookupInterface):
             Task result
         """
         logging.info("Executing task: %s:%s", task_type, task_subtype)
+        current_span().set_attribute("task", f"{task_type}:{task_subtype}")
         
         # Check if task type and subtype are registered
         task_key = f"{task_type}:{task_subtype}"
@@ -974,6 +1047,28 @@ class TaskSystem(TemplateLookupInterface):
                 }
             }
             
+        # Sequential tasks run their steps as separate tasks
+        if task_type == "sequential":
+            return execute_sequential(
+                self, template, resolved_inputs,
+                memory_system=memory_system,
+                handler=handler,
+                call_depth=call_depth,
+                max_workers=template.get("max_parallel_steps", self.max_parallel_steps),
+                **kwargs
+            )
+            
+        # Reduce tasks map inputs through an inner task, then combine the results
+        if task_type == "reduce":
+            return execute_reduce(
+                self, template, resolved_inputs,
+                memory_system=memory_system,
+                handler=handler,
+                call_depth=call_depth,
+                max_workers=template.get("max_parallel_steps", self.max_parallel_steps),
+                **kwargs
+            )
+            
         # Select model if available_models provided
         selected_model = None
         if available_models:
@@ -1115,6 +1210,7 @@ class TaskSystem(TemplateLookupInterface):
     
         # Resolve file paths using the coordinator
         file_paths = []
+        file_matches = []
         file_context = None
         error_message = None
     
@@ -1123,6 +1219,7 @@ class TaskSystem(TemplateLookupInterface):
         
             # Create file context if paths are available
             if file_paths:
+                file_matches = file_paths
                 file_context = f"Files: {', '.join(file_paths)}"
             
                 # Store file paths in result metadata for testing
@@ -1153,6 +1250,7 @@ class TaskSystem(TemplateLookupInterface):
                 
                     # Create file context if paths are available
                     if file_paths:
+                        file_matches = context_result.matches
                         file_context = f"Files: {', '.join(file_paths)}"
                     
                         # Store file paths in result metadata for testing
@@ -1166,6 +1264,14 @@ class TaskSystem(TemplateLookupInterface):
         if file_context is None and "file_paths" in resolved_inputs and resolved_inputs["file_paths"]:
             file_context = f"Files: {', '.join(resolved_inputs['file_paths'])}"
         
+        # Pack file contents into the context budget when one is configured
+        packed_context = None
+        context_token_budget = get_context_token_budget(
+            template.get("model"), get_context_token_budget(kwargs.get("handler_config")))
+        if context_token_budget and file_matches:
+            packed_context = self._pack_file_context(file_matches, context_token_budget, memory_system, handler)
+            file_context = packed_context.text
+        
         # Initialize result dictionary to store error message
         result = {
             "status": "PENDING",
@@ -1218,9 +1324,43 @@ class TaskSystem(TemplateLookupInterface):
             "accumulate_data": accumulate_data,
             "fresh_context": fresh_context
         }
+        if packed_context:
+            result["notes"]["context_packing"] = packed_context.to_notes()
             
         return result
     
+    def _pack_file_context(self, matches: List[Any], token_budget: int, memory_system=None, handler=None):
+        """Pack matched files into a token budget for task execution.
+        
+        Args:
+            matches: Match tuples or file paths, most relevant first
+            token_budget: Maximum estimated tokens for the file context
+            memory_system: Optional Memory System providing index summaries
+            handler: Optional handler whose file reader should be used
+            
+        Returns:
+            PackedContext with the context text and packing decisions
+        """
+        # Prefer the handler's (concurrent) reader, fall back to direct reads
+        from handler.base_handler import BaseHandler
+        if isinstance(handler, BaseHandler):
+            read_files = handler._read_files
+        else:
+            from handler.file_access import FileAccessManager
+            file_manager = FileAccessManager()
+            read_files = lambda paths: [file_manager.read_file(path) for path in paths]
+        
+        global_index = {}
+        if memory_system:
+            try:
+                global_index = memory_system.get_global_index()
+            except Exception as e:
+                logging.warning("Error getting global index for context packing: %s", str(e))
+        
+        packed = pack_context(matches, token_budget, read_files, global_index)
+        logging.debug("Packed task file context: %s", packed)
+        return packed
+    
     def _execute_atomic_task(self, template: Dict[str, Any], inputs: Dict[str, Any], memory_system=None, **kwargs) -> Dict[str, Any]:
         """
         Execute an atomic task.
@@ -0,0 +1,178 @@
+"""Inverted index for matching input text to atomic templates."""
+import threading
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Punctuation treated as word separators when matching
+_PUNCTUATION_TABLE = str.maketrans({char: " " for char in ".,;:!?()[]{}\"'"})
+
+
+def tokenize_for_matching(text: str) -> FrozenSet[str]:
+    """Normalize text into its set of lowercase words.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Set of words with punctuation removed
+    """
+    return frozenset(text.lower().translate(_PUNCTUATION_TABLE).split())
+
+
+def jaccard_similarity(input_words: FrozenSet[str], template_words: FrozenSet[str]) -> float:
+    """Calculate the Jaccard similarity of two word sets (0-1)."""
+    if not template_words:
+        return 0.0
+    intersection = len(input_words & template_words)
+    union = len(input_words) + len(template_words) - intersection
+    return intersection / union if union else 0.0
+
+
+class TemplateMatchIndex:
+    """Word sets of atomic template descriptions with a word -> template index.
+
+    Descriptions are tokenized once when a template is added, so matching
+    an input only touches templates sharing at least one word with it.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._words: Dict[str, FrozenSet[str]] = {}     # Atomic template name -> description words
+        self._postings: Dict[str, Set[str]] = defaultdict(set)  # Word -> atomic template names
+        self._order: Dict[str, int] = {}                # Template name -> registration order
+        self._templates: Dict[str, Any] = {}            # Template name -> indexed definition
+        # Matching may run on pool threads while templates are registered
+        self._lock = threading.RLock()
+
+    def add(self, name: str, template: Dict[str, Any]) -> None:
+        """Add or replace a template.
+
+        Args:
+            name: Template name
+            template: Template definition
+        """
+        with self._lock:
+            self.remove(name)
+            self._order.setdefault(name, len(self._order))
+            self._templates[name] = template
+            if template.get("type") != "atomic":
+                return
+            words = tokenize_for_matching(template.get("description", ""))
+            self._words[name] = words
+            for word in words:
+                self._postings[word].add(name)
+
+    def remove(self, name: str) -> None:
+        """Remove a template's words from the index, keeping its registration order."""
+        with self._lock:
+            self._templates.pop(name, None)
+            for word in self._words.pop(name, ()):
+                names = self._postings[word]
+                names.discard(name)
+                if not names:
+                    del self._postings[word]
+
+    def clear(self) -> None:
+        """Remove every template."""
+        with self._lock:
+            self._words.clear()
+            self._postings.clear()
+            self._order.clear()
+            self._templates.clear()
+
+    def score(self, input_text: str) -> List[Tuple[str, float]]:
+        """Score the templates sharing words with an input.
+
+        Args:
+            input_text: Natural language task description
+
+        Returns:
+            (template name, Jaccard similarity) pairs, best first; ties keep
+            registration order
+        """
+        input_words = tokenize_for_matching(input_text)
+        with self._lock:
+            overlap: Dict[str, int] = defaultdict(int)
+            for word in input_words:
+                for name in self._postings.get(word, ()):
+                    overlap[name] += 1
+
+            scores = []
+            for name, intersection in overlap.items():
+                union = len(input_words) + len(self._words[name]) - intersection
+                scores.append((name, intersection / union))
+            scores.sort(key=lambda item: (-item[1], self._order[item[0]]))
+        return scores
+
+
+class IndexedTemplates(dict):
+    """Templates by name that keep a TemplateMatchIndex current.
+
+    Every mutation updates the dict and the index together under the index
+    lock, so matching never scans the templates and never sees a template
+    the dict does not hold. Definitions edited in place are not detected;
+    assign the edited definition again to reindex it.
+    """
+
+    def __init__(self, index: TemplateMatchIndex, templates: Optional[Dict[str, Any]] = None):
+        """Initialize the templates and reindex them.
+
+        Args:
+            index: Index to keep current
+            templates: Optional initial templates by name
+        """
+        super().__init__()
+        self.index = index
+        with index._lock:
+            index.clear()
+            self.update(templates or {})
+
+    def __setitem__(self, name: str, template: Dict[str, Any]) -> None:
+        with self.index._lock:
+            super().__setitem__(name, template)
+            self.index.add(name, template)
+
+    def __delitem__(self, name: str) -> None:
+        with self.index._lock:
+            super().__delitem__(name)
+            self.index.remove(name)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __reduce__(self):
+        # Copies are plain dicts, detached from the index
+        return dict, (dict(self),)
+
+    def update(self, *args, **kwargs) -> None:
+        with self.index._lock:
+            for name, template in dict(*args, **kwargs).items():
+                self[name] = template
+
+    def setdefault(self, name: str, default: Any = None) -> Any:
+        with self.index._lock:
+            if name not in self:
+                self[name] = default
+            return self[name]
+
+    def pop(self, name: str, *default: Any) -> Any:
+        with self.index._lock:
+            if name not in self:
+                if default:
+                    return default[0]
+                raise KeyError(name)
+            template = self[name]
+            del self[name]
+            return template
+
+    def popitem(self) -> Tuple[str, Any]:
+        with self.index._lock:
+            name, template = super().popitem()
+            self.index.remove(name)
+            return name, template
+
+    def clear(self) -> None:
+        with self.index._lock:
+            super().clear()
+            self.index.clear()
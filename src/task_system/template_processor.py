@@ -3,9 +3,139 @@
 This module provides utilities for processing templates, including
 variable substitution and function call resolution.
 """
-from typing import Dict, Any, List, Optional, Union, Set
+import re
+from typing import Dict, Any, List, Optional, Union, Set, Tuple
+
+from task_system.template_utils import (
+    Environment, substitute_variables, resolve_function_calls, render_variable, execute_calls_for_text,
+    parse_function_call, create_compatible_argument_node, create_compatible_function_call_node,
+    VARIABLE_PATTERN, FUNCTION_CALL_PATTERN
+)
+
+# Scope chain depth from which field rendering looks variables up in a flattened snapshot
+FLATTEN_MIN_DEPTH = 4
+
+# Argument text that evaluate_arguments would resolve against the environment
+_EMBEDDED_VARIABLE = re.compile(r'\{\{[^}]+\}\}')
+
+
+def _is_static_argument(value: Any) -> bool:
+    """Check whether an argument evaluates to itself in every environment."""
+    if not isinstance(value, str):
+        return True
+    return not (value.isidentifier() or _EMBEDDED_VARIABLE.search(value))
+
+
+class CompiledField:
+    """A template field pre-split into literals, variables and function calls.
+
+    Segments are ("text", str), ("var", name) or ("call", FunctionCallNode,
+    raw call text, positional args, named args, static). Fields whose calls
+    only form after variable substitution (e.g. {{f({{x}})}}) are marked
+    dynamic and processed the uncompiled way.
+    """
+
+    def __init__(self, text: str):
+        """Compile a field.
+
+        Args:
+            text: Field text
+        """
+        self.source = text
+        self.segments: List[Tuple] = []
+        self.call_count = 0
+
+        position = 0
+        for match in VARIABLE_PATTERN.finditer(text):
+            self._add_literal(text[position:match.start()])
+            self.segments.append(("var", match.group(1).strip()))
+            position = match.end()
+        self._add_literal(text[position:])
+
+        self.variable_count = sum(1 for segment in self.segments if segment[0] == "var")
+        # Leftover braces in literals mean calls built from substituted text
+        self.dynamic = any(segment[0] == "text" and "{{" in segment[1] for segment in self.segments)
+
+    def _add_literal(self, literal: str) -> None:
+        position = 0
+        for match in FUNCTION_CALL_PATTERN.finditer(literal):
+            if match.start() > position:
+                self.segments.append(("text", literal[position:match.start()]))
+            func_name, pos_args, named_args = parse_function_call(match.group(1), match.group(2))
+            static = all(_is_static_argument(arg) for arg in [*pos_args, *named_args.values()])
+            node = create_compatible_function_call_node(
+                func_name,
+                [create_compatible_argument_node(arg) for arg in pos_args] +
+                [create_compatible_argument_node(value, name=name) for name, value in named_args.items()])
+            self.segments.append(("call", node, match.group(0), pos_args, named_args, static))
+            self.call_count += 1
+            position = match.end()
+        if position < len(literal):
+            self.segments.append(("text", literal[position:]))
+
+    def render(self, task_system, env: Environment) -> str:
+        """Render the field in an environment.
+
+        Produces the same text as substitute_variables followed by
+        resolve_function_calls, without rescanning the field.
+
+        Args:
+            task_system: TaskSystem for function call execution
+            env: Environment for variable resolution
+
+        Returns:
+            Field text with variables and function calls resolved
+        """
+        # Deep scope chains are flattened once for all of the field's lookups
+        lookup_env = env
+        if self.variable_count > 1 and env.depth >= FLATTEN_MIN_DEPTH:
+            lookup_env = env.flatten()
+        parts = [segment[1] if segment[0] == "text" else
+                 render_variable(segment[1], lookup_env) if segment[0] == "var" else
+                 segment[2]
+                 for segment in self.segments]
+        substituted = "".join(parts)
+        if self.dynamic or substituted.count("{{") != self.call_count:
+            # Substituted values introduced braces that may form more calls
+            return resolve_function_calls(substituted, task_system, env)
+        if not self.call_count:
+            return substituted
+
+        # Calls are staged like resolve_function_calls: independent calls run concurrently
+        positions = [i for i, segment in enumerate(self.segments) if segment[0] == "call"]
+        calls = []
+        for i in positions:
+            _, node, _, pos_args, named_args, static = self.segments[i]
+            calls.append((node.template_name, pos_args, named_args, node if static else None))
+        for i, replacement in zip(positions, execute_calls_for_text(task_system, env, calls)):
+            parts[i] = replacement
+        return "".join(parts)
+
+
+class TemplatePlan:
+    """Execution plan for a registered template: its compiled fields."""
+
+    def __init__(self, template: Dict[str, Any], fields: List[str]):
+        """Compile a template.
+
+        Args:
+            template: Template definition
+            fields: Fields to process (see TemplateProcessor.get_fields_to_process)
+        """
+        self.template = template
+        self.size = len(template)
+        # Only fields with references need work; others are copied unchanged
+        self.fields = {
+            field: CompiledField(template[field]) for field in fields
+            if isinstance(template.get(field), str) and "{{" in template[field]
+        }
+        self.sources = {field: compiled.source for field, compiled in self.fields.items()}
+
+    def is_current(self, template: Dict[str, Any]) -> bool:
+        """Check that the plan was compiled from this template as it is now."""
+        return (template is self.template and len(template) == self.size and
+                all(template.get(field) is source for field, source in self.sources.items()))
 
-from task_system.template_utils import Environment, substitute_variables, resolve_function_calls
 
 class TemplateProcessor:
     """
@@ -23,6 +153,24 @@ class TemplateProcessor:
             task_system: TaskSystem instance for function call execution
         """
         self.task_system = task_system
+        self.plans: Dict[str, TemplatePlan] = {}  # Compiled plans by template name
+    
+    def compile_template(self, template: Dict[str, Any]) -> TemplatePlan:
+        """
+        Compile a template into a reusable execution plan.
+        
+        Called when a template is registered, so executions only look up
+        variables, run calls and join the pre-split text.
+        
+        Args:
+            template: Template definition
+            
+        Returns:
+            The compiled plan
+        """
+        plan = TemplatePlan(template, self.get_fields_to_process(template))
+        self.plans[template.get("name")] = plan
+        return plan
     
     def process_template(self, template: Dict[str, Any], env: Environment) -> Dict[str, Any]:
         """
@@ -38,6 +186,13 @@ class TemplateProcessor:
         # Create a copy to avoid modifying the original
         processed = template.copy()
         
+        # Registered templates use their compiled plan, unless changed since
+        plan = self.plans.get(template.get("name"))
+        if plan is not None and plan.is_current(template):
+            for field, compiled in plan.fields.items():
+                processed[field] = compiled.render(self.task_system, env)
+            return processed
+        
         # Fields that should be processed (in order)
         # First resolve variables, then function calls
         fields_to_process = self.get_fields_to_process(template)
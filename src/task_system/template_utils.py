@@ -1,5 +1,7 @@
 """Utility functions for template management."""
 from typing import Dict, List, Any, Optional, Union, Type, Tuple, TypeVar, Callable
+from functools import lru_cache
+import concurrent.futures
 import re
 
 # Try different import paths to handle various environments
@@ -19,6 +21,13 @@ except ImportError:
             from ast_nodes import FunctionCallNode, ArgumentNode
 
 from system.errors import create_input_validation_error, create_unexpected_error
+from system.tracing import bind_context
+
+# Variable references: {{name}}, {{obj.prop}}, {{items[0]}}
+VARIABLE_PATTERN = re.compile(r'\{\{([^}(\|]+)\}\}')
+
+# Function calls: {{function_name(arg1, arg2, name=value)}}
+FUNCTION_CALL_PATTERN = re.compile(r'\{\{([a-zA-Z_][a-zA-Z0-9_]*)\s*\(([^}]*?)\)\}\}')
 
 # Type compatibility helpers for testing
 # This helps tests recognize our nodes even if import paths differ
@@ -98,6 +107,80 @@ def create_compatible_function_call_node(template_name: str, arguments: List[Any
     return node
 
 
+# Steps of a compiled variable path
+_ATTR_STEP = 0   # (kind, property name, path before the dot)
+_INDEX_STEP = 1  # (kind, index, path up to the closing bracket)
+_FAIL_STEP = 2   # (kind, error message, None): the path is malformed here
+
+VARIABLE_PATH_CACHE_SIZE = 4096
+
+# Default limit on function calls of one template field running at once
+MAX_PARALLEL_CALLS = 8
+
+
+@lru_cache(maxsize=VARIABLE_PATH_CACHE_SIZE)
+def compile_variable_path(name: str) -> Tuple[str, Tuple[Tuple[int, Any, Optional[str]], ...]]:
+    """Compile a variable path into its base name and access steps.
+    
+    Paths are parsed once and cached, so repeated lookups of paths like
+    "results[1].name" only apply the steps. Malformed parts compile to a
+    step raising the error Environment.find reports on reaching them.
+    
+    Args:
+        name: Variable name or path
+        
+    Returns:
+        Tuple of (base variable name, access steps)
+    """
+    # Handle simple variable case (no dots or brackets)
+    if "." not in name and "[" not in name:
+        return name, ()
+    
+    # The base variable name is everything before the first . or [
+    base_end = min(
+        name.find(".") if "." in name else len(name), 
+        name.find("[") if "[" in name else len(name)
+    )
+    steps = []
+    i = base_end
+    while i < len(name):
+        if name[i] == ".":
+            # Property access
+            i += 1  # Skip the dot
+            prop_end = min(
+                name.find(".", i) if "." in name[i:] else len(name),
+                name.find("[", i) if "[" in name[i:] else len(name)
+            )
+            steps.append((_ATTR_STEP, name[i:prop_end], name[:i-1]))
+            i = prop_end
+        
+        elif name[i] == "[":
+            # Array indexing
+            i += 1  # Skip the opening bracket
+            idx_end = name.find("]", i)
+            if idx_end == -1:
+                steps.append((_FAIL_STEP, f"Unmatched opening bracket in path: {name}", None))
+                break
+            
+            idx_str = name[i:idx_end]
+            try:
+                steps.append((_INDEX_STEP, int(idx_str), name[:idx_end+1]))
+            except ValueError as e:
+                message = str(e)
+                if not ("Cannot use array" in message or "Index" in message):
+                    message = f"Invalid array index '{idx_str}' in path: {name[:idx_end+1]}"
+                steps.append((_FAIL_STEP, message, None))
+                break
+            i = idx_end + 1  # Skip the closing bracket
+        
+        else:
+            # This shouldn't happen if the path is well-formed
+            steps.append((_FAIL_STEP, f"Unexpected character in path: {name[i]}", None))
+            break
+    
+    return name[:base_end], tuple(steps)
+
+
 class Environment:
     """Environment for variable resolution with lexical scoping.
     
@@ -132,83 +215,75 @@ class Environment:
         Raises:
             ValueError: If variable is not found or path cannot be resolved
         """
-        # Handle simple variable case (no dots or brackets)
-        if "." not in name and "[" not in name:
-            if name in self.bindings:
-                return self.bindings[name]
-            if self.parent:
-                return self.parent.find(name)
-            raise ValueError(f"Variable '{name}' not found")
-        
-        # For complex paths, we'll use a parser to handle dot notation and array indexing
-        # First, get the base variable name (everything before first . or [)
-        base_end = min(
-            name.find(".") if "." in name else len(name), 
-            name.find("[") if "[" in name else len(name)
-        )
-        base_name = name[:base_end]
+        base_name, steps = compile_variable_path(name)
         
-        # Get the base object
-        if base_name in self.bindings:
-            current = self.bindings[base_name]
-        elif self.parent:
-            current = self.parent.find(base_name)
+        # Get the base object, walking up the scope chain
+        env = self
+        while base_name not in env.bindings:
+            parent = env.parent
+            if not parent:
+                raise ValueError(f"Variable '{base_name}' not found")
+            if not isinstance(parent, Environment):
+                current = parent.find(base_name)
+                break
+            env = parent
         else:
-            raise ValueError(f"Variable '{base_name}' not found")
-        
-        # Parse the rest of the path
-        i = base_end
-        while i < len(name):
-            if name[i] == ".":
-                # Handle property access
-                i += 1  # Skip the dot
-                prop_end = min(
-                    name.find(".", i) if "." in name[i:] else len(name),
-                    name.find("[", i) if "[" in name[i:] else len(name)
-                )
-                prop_name = name[i:prop_end]
-                
-                # Access the property
-                if isinstance(current, dict) and prop_name in current:
-                    current = current[prop_name]
-                elif hasattr(current, prop_name):
-                    current = getattr(current, prop_name)
+            current = env.bindings[base_name]
+        
+        # Apply the compiled access steps
+        for kind, key, path in steps:
+            if kind == _ATTR_STEP:
+                if isinstance(current, dict) and key in current:
+                    current = current[key]
+                elif hasattr(current, key):
+                    current = getattr(current, key)
                 else:
-                    raise ValueError(f"Cannot access property '{prop_name}' of variable '{name[:i-1]}'")
-                
-                i = prop_end
-            
-            elif name[i] == "[":
-                # Handle array indexing
-                i += 1  # Skip the opening bracket
-                idx_end = name.find("]", i)
-                if idx_end == -1:
-                    raise ValueError(f"Unmatched opening bracket in path: {name}")
-                
-                idx_str = name[i:idx_end]
-                
-                try:
-                    idx = int(idx_str)
-                    if isinstance(current, (list, tuple)) and 0 <= idx < len(current):
-                        current = current[idx]
-                    else:
-                        if not isinstance(current, (list, tuple)):
-                            raise ValueError(f"Cannot use array indexing on non-array value in path: {name[:idx_end+1]}")
-                        else:
-                            raise ValueError(f"Index {idx} out of bounds for array in path: {name[:idx_end+1]}")
-                except ValueError as e:
-                    if "Cannot use array" in str(e) or "Index" in str(e):
-                        raise  # Re-raise our custom error
-                    raise ValueError(f"Invalid array index '{idx_str}' in path: {name[:idx_end+1]}")
-                
-                i = idx_end + 1  # Skip the closing bracket
-            
+                    raise ValueError(f"Cannot access property '{key}' of variable '{path}'")
+            elif kind == _INDEX_STEP:
+                if isinstance(current, (list, tuple)) and 0 <= key < len(current):
+                    current = current[key]
+                elif not isinstance(current, (list, tuple)):
+                    raise ValueError(f"Cannot use array indexing on non-array value in path: {path}")
+                else:
+                    raise ValueError(f"Index {key} out of bounds for array in path: {path}")
             else:
-                # This shouldn't happen if the path is well-formed
-                raise ValueError(f"Unexpected character in path: {name[i]}")
+                raise ValueError(key)
         
         return current
     
+    @property
+    def depth(self) -> int:
+        """Number of environments in the scope chain, including this one."""
+        depth = 1
+        env = self.parent
+        while isinstance(env, Environment):
+            depth += 1
+            env = env.parent
+        return depth
+    
+    def flatten(self) -> 'Environment':
+        """Create a single-level snapshot of every binding visible here.
+        
+        Lookups in the snapshot cost one dict access regardless of how deep
+        the scope chain is. It does not see later changes to the chain, so
+        use it for bursts of lookups (e.g. rendering a template field).
+        
+        Returns:
+            Environment without a parent, holding the merged bindings
+        """
+        chain = []
+        env = self
+        while isinstance(env, Environment):
+            chain.append(env.bindings)
+            env = env.parent
+        if env:
+            # Non-Environment parents cannot be merged
+            return self
+        merged = {}
+        for bindings in reversed(chain):
+            merged.update(bindings)
+        return Environment(merged)
+    
     def extend(self, bindings):
         """Create a new environment with additional bindings.
         
@@ -234,23 +309,31 @@ def substitute_variables(text: str, env: Environment) -> str:
     Returns:
         Text with variables substituted
     """
-    import re
-    
     # If input is not a string, return as is
     if not isinstance(text, str):
         return text
     
-    pattern = r'\{\{([^}(\|]+)\}\}'
-    
     def replace_var(match):
-        var_name = match.group(1).strip()
-        try:
-            value = env.find(var_name)
-            return str(value)
-        except ValueError:
-            return f"{{{{undefined:{var_name}}}}}"
+        return render_variable(match.group(1).strip(), env)
     
-    return re.sub(pattern, replace_var, text)
+    return VARIABLE_PATTERN.sub(replace_var, text)
+
+
+def render_variable(var_name: str, env: Environment) -> str:
+    """Render a variable reference as text.
+    
+    Args:
+        var_name: Variable name or path
+        env: Environment for variable lookups
+        
+    Returns:
+        The variable's value as a string, or an {{undefined:name}} marker
+    """
+    try:
+        value = env.find(var_name)
+        return str(value)
+    except ValueError:
+        return f"{{{{undefined:{var_name}}}}}"
 
 
 def resolve_template_variables(template: Dict[str, Any], env: Environment) -> Dict[str, Any]:
@@ -292,8 +375,7 @@ def detect_function_calls(text: str) -> List[Dict[str, Any]]:
         return []
     
     # Find all potential function calls - capture function name and arguments
-    pattern = r'\{\{([a-zA-Z_][a-zA-Z0-9_]*)\s*\(([^}]*?)\)\}\}'
-    matches = re.finditer(pattern, text)
+    matches = FUNCTION_CALL_PATTERN.finditer(text)
     
     calls = []
     for match in matches:
@@ -691,19 +773,132 @@ def resolve_function_calls(text: str, task_system, env: Environment, max_depth:
     if not calls:
         return text
     
-    # Process in reverse order to avoid position shifts when replacing
-    calls.sort(key=lambda c: c["start"], reverse=True)
-    
-    result = text
+    # Parse the function call arguments (variable references are
+    # evaluated when each call runs)
+    parsed_calls = []
     for call in calls:
-        func_name = call["name"]
-        args_text = call["args_text"]
+        _, pos_args, named_args = parse_function_call(call["name"], call["args_text"])
+        parsed_calls.append((call["name"], pos_args, named_args, None))
+    replacements = execute_calls_for_text(task_system, env, parsed_calls)
+    
+    # Splice results back in position order
+    parts = []
+    position = 0
+    for call, replacement in zip(calls, replacements):
+        parts.append(text[position:call["start"]])
+        parts.append(replacement)
+        position = call["end"]
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def _runs_concurrently(task_system, func_name: str) -> bool:
+    """Check whether a call may run concurrently with its neighbours.
+    
+    Only calls to registered templates declaring "parallel_safe": True run
+    concurrently. Templates may have side effects whose order matters
+    (e.g. aider edits or shell commands), so the rest run one at a time.
+    Calls that are not registered templates are cheap built-ins or errors,
+    which are not worth a worker thread.
+    """
+    templates = getattr(task_system, "templates", None)
+    if not isinstance(templates, dict):
+        return False
+    template = templates.get(func_name)
+    if template is None:
+        template_index = getattr(task_system, "template_index", None)
+        if isinstance(template_index, dict) and func_name in template_index:
+            template = templates.get(template_index[func_name])
+    return isinstance(template, dict) and template.get("parallel_safe") is True
+
+
+def plan_call_stages(task_system, calls: List[Tuple]) -> List[List[int]]:
+    """Group a field's function calls into stages that can run concurrently.
+    
+    Template-level calls cannot consume each other's results (arguments
+    are literals or variables of the caller's environment), so the only
+    ordering constraints come from calls that must not run concurrently.
+    Stages keep the original execution order (last call first): each run
+    of concurrent calls forms one stage and every other call its own.
+    
+    Args:
+        task_system: TaskSystem for template lookup
+        calls: (func_name, pos_args, named_args, call_node) tuples in position order
         
-        try:
-            # First, evaluate any variable references in the arguments
-            # Parse the function call arguments
-            _, pos_args, named_args = parse_function_call(func_name, args_text)
-            
+    Returns:
+        Stages of call indexes, in execution order
+    """
+    stages: List[List[int]] = []
+    concurrent_stage: List[int] = []
+    for i in range(len(calls) - 1, -1, -1):
+        if _runs_concurrently(task_system, calls[i][0]):
+            concurrent_stage.append(i)
+            continue
+        if concurrent_stage:
+            stages.append(concurrent_stage)
+            concurrent_stage = []
+        stages.append([i])
+    if concurrent_stage:
+        stages.append(concurrent_stage)
+    return stages
+
+
+def execute_calls_for_text(task_system, env: Environment, calls: List[Tuple],
+                           max_workers: Optional[int] = None) -> List[str]:
+    """Execute a field's function calls, running independent calls concurrently.
+    
+    A field fanning out to several templates then takes about as long as
+    its slowest call instead of the sum of all calls.
+    
+    Args:
+        task_system: TaskSystem for template lookup and execution
+        env: Current environment for variable resolution
+        calls: (func_name, pos_args, named_args, call_node) tuples in position order
+        max_workers: Optional limit on concurrent calls (defaults to the
+            task system's max_parallel_calls, or MAX_PARALLEL_CALLS)
+        
+    Returns:
+        Text replacing each call, in position order
+    """
+    replacements: List[Optional[str]] = [None] * len(calls)
+    if max_workers is None:
+        max_workers = getattr(task_system, "max_parallel_calls", MAX_PARALLEL_CALLS)
+        if not isinstance(max_workers, int):
+            max_workers = MAX_PARALLEL_CALLS
+    
+    for stage in plan_call_stages(task_system, calls):
+        if len(stage) == 1 or max_workers <= 1:
+            for i in stage:
+                replacements[i] = execute_call_for_text(task_system, env, *calls[i])
+            continue
+        # A pool per stage: nested templates resolving their own calls
+        # cannot starve waiting on a shared, bounded pool
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(stage))) as executor:
+            run = bind_context(execute_call_for_text)
+            futures = {i: executor.submit(run, task_system, env, *calls[i]) for i in stage}
+            for i, future in futures.items():
+                replacements[i] = future.result()
+    return replacements
+
+
+def execute_call_for_text(task_system, env: Environment, func_name: str, pos_args: List[Any],
+                          named_args: Dict[str, Any], call_node: Optional['FunctionCallNode'] = None) -> str:
+    """Execute a template-level function call and render its result as text.
+    
+    Args:
+        task_system: TaskSystem for template lookup and execution
+        env: Current environment for variable resolution
+        func_name: Name of the function/template to call
+        pos_args: Parsed positional arguments (may contain variable references)
+        named_args: Parsed named arguments (may contain variable references)
+        call_node: Optional prebuilt node, used as is when no argument
+            needs evaluating in the environment
+        
+    Returns:
+        Text replacing the call: the result content, or an error marker
+    """
+    try:
+        if call_node is None:
             # Evaluate arguments in the current environment
             evaluated_pos_args, evaluated_named_args = evaluate_arguments(pos_args, named_args, env)
             
@@ -715,33 +910,29 @@ def resolve_function_calls(text: str, task_system, env: Environment, max_depth:
                 arg_nodes.append(create_compatible_argument_node(value, name=name))
             
             # Create a compatible function call node
-            func_call_node = create_compatible_function_call_node(func_name, arg_nodes)
-            
-            # Ensure TaskSystem has an Evaluator
-            if hasattr(task_system, '_ensure_evaluator'):
-                task_system._ensure_evaluator()
-            
-            # Execute the function call using the Evaluator
-            # This is the key part where we unify the execution path
-            execution_result = task_system.executeCall(func_call_node, env)
-            
-            # Extract content from result
-            replacement = str(execution_result.get("content", ""))
-            
-            # If content is empty or just "[]", try to get something from notes
-            if replacement == "[]" or not replacement.strip():
-                if "notes" in execution_result and "system_prompt" in execution_result["notes"]:
-                    replacement = f"[Function result: {func_name}]"
-            
-        except Exception as e:
-            # Format error message to include detailed information
-            error_msg = str(e)
-            replacement = f"{{{{error in {func_name}(): {error_msg}}}}}"
+            call_node = create_compatible_function_call_node(func_name, arg_nodes)
         
-        # Replace the function call with the result
-        result = result[:call["start"]] + replacement + result[call["end"]:]
+        # Ensure TaskSystem has an Evaluator
+        if hasattr(task_system, '_ensure_evaluator'):
+            task_system._ensure_evaluator()
+        
+        # Execute the function call using the Evaluator
+        # This is the key part where we unify the execution path
+        execution_result = task_system.executeCall(call_node, env)
+        
+        # Extract content from result
+        replacement = str(execution_result.get("content", ""))
+        
+        # If content is empty or just "[]", try to get something from notes
+        if replacement == "[]" or not replacement.strip():
+            if "notes" in execution_result and "system_prompt" in execution_result["notes"]:
+                replacement = f"[Function result: {func_name}]"
+        return replacement
     
-    return result
+    except Exception as e:
+        # Format error message to include detailed information
+        error_msg = str(e)
+        return f"{{{{error in {func_name}(): {error_msg}}}}}"
 
 
 def resolve_parameters(template: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, Any]:
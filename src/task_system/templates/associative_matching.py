@@ -1,5 +1,5 @@
 """Associative matching template for finding relevant files."""
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import re
 import os
 import math
@@ -12,6 +12,7 @@ ASSOCIATIVE_MATCHING_TEMPLATE = {
     "type": "atomic",
     "subtype": "associative_matching",
     "name": "find_relevant_files",  # Unique template name
+    "parallel_safe": True,  # Read-only: may run alongside other calls
     "description": "Find relevant files for '{{query}}' (max: {{max_results}})",  # Now using variables
     "parameters": {  # Structured parameters
         "query": {
@@ -140,20 +141,17 @@ def create_xml_template() -> str:
     """
     return xml
 
-def execute_template(inputs: Dict[str, Any], memory_system, handler) -> List[Dict[str, Any]]:
+def build_matching_request(inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Execute the associative matching template logic using the LLM via the handler's provider.
+    Build the model request for associative matching from resolved inputs.
 
     Args:
         inputs: Dictionary of resolved input parameters for the template.
-        memory_system: The Memory System instance (unused in this version).
-        handler: The Handler instance (expected to have model_provider and _build_system_prompt).
 
     Returns:
-        List of relevant file objects [{'path': str, 'relevance': str}]
+        Dict with 'messages' and 'system_prompt', or None if the inputs
+        lack a query or file metadata
     """
-    logging.debug("Executing associative matching template via handler.model_provider (Handler type: %s)", type(handler).__name__)
-
     # --- 1. Extract resolved inputs ---
     query = inputs.get("query", "")
     metadata_str = inputs.get("metadata", "")
@@ -163,38 +161,26 @@ def execute_template(inputs: Dict[str, Any], memory_system, handler) -> List[Dic
 
     if not query:
         logging.warning("No query provided for associative matching.")
-        return []
+        return None
     if not metadata_str:
         logging.warning("No file metadata provided for associative matching.")
-        return []
+        return None
 
-    # --- 2. Prepare System Prompt using BaseHandler's method ---
-    # Need the template definition itself to get the system_prompt template string
-    template_definition = ASSOCIATIVE_MATCHING_TEMPLATE
-
-    # Create environment for prompt processing
-    prompt_env = Environment(inputs)
+    # --- 2. Prepare System Prompt ---
     try:
-        system_prompt_template = template_definition.get("system_prompt", "")
         import jinja2
         jinja_env = jinja2.Environment()
-        template = jinja_env.from_string(system_prompt_template)
-        # Render the system prompt using the inputs
-        processed_system_prompt = template.render(
+        template = jinja_env.from_string(ASSOCIATIVE_MATCHING_TEMPLATE.get("system_prompt", ""))
+        # Render the system prompt using the inputs. For this task the
+        # template prompt *is* the full instruction, so it is passed to the
+        # provider directly rather than combined with the handler's base prompt.
+        final_system_prompt = template.render(
             query=query,
             additional_context=additional_context,
             inherited_context=inherited_context,
             max_results=max_results,
             metadata=metadata_str
         )
-        # Use BaseHandler's _build_system_prompt to combine with base prompt if desired,
-        # although for this specific task, the template prompt *is* the full instruction.
-        # We'll pass the processed prompt directly to the provider.
-        # If hierarchical prompts were desired here, you'd call:
-        # final_system_prompt = handler._build_system_prompt(template={"system_prompt": processed_system_prompt})
-        # But for clarity, let's use the processed prompt directly:
-        final_system_prompt = processed_system_prompt
-
     except Exception as e:
         logging.error("Error processing system prompt template: %s", e)
         final_system_prompt = f"Error processing prompt template: {e}" # Fallback
@@ -204,49 +190,36 @@ def execute_template(inputs: Dict[str, Any], memory_system, handler) -> List[Dic
     messages_for_api = [
         {"role": "user", "content": "Based on the system prompt, provide the JSON list of relevant files."}
     ]
+    return {"messages": messages_for_api, "system_prompt": final_system_prompt}
 
-    # --- 4. Execute using the handler's model_provider ---
-    response_content = "[]" # Default empty JSON array string
-    try:
-        # Check for handler and model_provider
-        if not handler:
-            logging.error("Associative matching failed: No handler provided.")
-            return []
-        if not hasattr(handler, 'model_provider') or not handler.model_provider:
-            logging.error("Associative matching failed: Handler (%s) has no model_provider.", type(handler).__name__)
-            return []
 
-        # Access the provider from the handler
-        provider = handler.model_provider
-        if not provider:
-            logging.error("Handler %s does not have a model_provider.", type(handler).__name__)
-            return []
+def parse_matching_response(raw_response: Any, provider) -> List[Dict[str, Any]]:
+    """
+    Parse a model response to an associative matching request.
 
-        logging.debug("Calling provider.send_message() directly.")
-        # Call the provider's send_message directly
-        raw_response = provider.send_message(
-            messages=messages_for_api,
-            system_prompt=final_system_prompt,
-            tools=None # No tools needed for this specific task
-        )
+    Args:
+        raw_response: Response returned by the provider
+        provider: The provider that produced the response (used to extract content)
 
-        # Check for API error strings returned by send_message
-        if isinstance(raw_response, str) and raw_response.startswith("Error"):
-             logging.error("API Error received from provider: %s", raw_response)
-             return [] # Return empty list on error
+    Returns:
+        List of relevant file objects sorted by score, or an empty list on errors
+    """
+    # Check for API error strings returned by send_message
+    if isinstance(raw_response, str) and raw_response.startswith("Error"):
+        logging.error("API Error received from provider: %s", raw_response)
+        return [] # Return empty list on error
 
+    try:
         # Extract the content from the response using the provider's own method
         # This standardizes handling across different provider response structures
         extracted_data = provider.extract_tool_calls(raw_response) # Also extracts content
         response_content = extracted_data.get("content", "[]")
         logging.debug("Raw LLM Response Content: %s", response_content)
-
     except Exception as e:
-        logging.exception("Error during direct provider call:")
+        logging.exception("Error extracting provider response content:")
         return []
 
-
-    # --- 5. Parse the LLM response ---
+    # --- Parse the LLM response ---
     try:
         # Clean the response
         cleaned_response = response_content.strip()
@@ -319,6 +292,57 @@ def execute_template(inputs: Dict[str, Any], memory_system, handler) -> List[Dic
         return []
 
 
+def execute_template(inputs: Dict[str, Any], memory_system, handler) -> List[Dict[str, Any]]:
+    """
+    Execute the associative matching template logic using the LLM via the handler's provider.
+
+    Args:
+        inputs: Dictionary of resolved input parameters for the template.
+        memory_system: The Memory System instance (unused in this version).
+        handler: The Handler instance (expected to have model_provider and _build_system_prompt).
+
+    Returns:
+        List of relevant file objects [{'path': str, 'relevance': str}]
+    """
+    logging.debug("Executing associative matching template via handler.model_provider (Handler type: %s)", type(handler).__name__)
+
+    request = build_matching_request(inputs)
+    if request is None:
+        return []
+
+    # --- Execute using the handler's model_provider ---
+    try:
+        # Check for handler and model_provider
+        if not handler:
+            logging.error("Associative matching failed: No handler provided.")
+            return []
+        if not hasattr(handler, 'model_provider') or not handler.model_provider:
+            logging.error("Associative matching failed: Handler (%s) has no model_provider.", type(handler).__name__)
+            return []
+
+        # Access the provider from the handler
+        provider = handler.model_provider
+
+        # Imported here: the router loads the provider SDK, which importing templates should not
+        from handler.model_router import RETRIEVAL, get_model_router
+
+        logging.debug("Calling provider.send_message() via the model router.")
+        # Matching is a retrieval task: routed to a small, fast model with fallback
+        raw_response = get_model_router(handler).send_message(
+            provider,
+            messages=request["messages"],
+            system_prompt=request["system_prompt"],
+            tools=None, # No tools needed for this specific task
+            task_class=RETRIEVAL,
+            template=ASSOCIATIVE_MATCHING_TEMPLATE
+        )
+    except Exception as e:
+        logging.exception("Error during direct provider call:")
+        return []
+
+    return parse_matching_response(raw_response, provider)
+
+
 def get_global_index(memory_system) -> Dict[str, str]:
     """Get the global index from the memory system.
     
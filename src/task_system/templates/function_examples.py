@@ -7,6 +7,8 @@ FORMAT_JSON_TEMPLATE = {
     "type": "atomic",
     "subtype": "format_json",
     "name": "format_json",
+    "parallel_safe": True,
+    "cacheable": True,  # Pure: same arguments, same result
     "description": "Format a value as pretty-printed JSON",
     "parameters": {
         "value": {
@@ -32,6 +34,7 @@ GET_DATE_TEMPLATE = {
     "type": "atomic",
     "subtype": "get_date",
     "name": "get_date",
+    "parallel_safe": True,
     "description": "Get the current date in the specified format",
     "parameters": {
         "format": {
@@ -52,6 +55,7 @@ GREETING_TEMPLATE = {
     "type": "atomic",
     "subtype": "greeting",
     "name": "greeting",
+    "parallel_safe": True,
     "description": "Generate a personalized greeting",
     "parameters": {
         "name": {
@@ -77,6 +81,7 @@ NESTED_TEMPLATE = {
     "type": "atomic",
     "subtype": "nested_example",
     "name": "nested_example",
+    "parallel_safe": True,
     "description": "Demonstrate nested function calls",
     "parameters": {
         "user_info": {
@@ -97,6 +102,8 @@ ADD_TEMPLATE = {
     "type": "atomic",
     "subtype": "math_add",
     "name": "add",
+    "parallel_safe": True,
+    "cacheable": True,  # Pure: same arguments, same result
     "description": "Add two numbers",
     "parameters": {
         "x": {"type": "integer", "description": "First number", "required": True},
@@ -113,6 +120,8 @@ SUBTRACT_TEMPLATE = {
     "type": "atomic",
     "subtype": "math_subtract",
     "name": "subtract",
+    "parallel_safe": True,
+    "cacheable": True,  # Pure: same arguments, same result
     "description": "Subtract second number from first",
     "parameters": {
         "x": {"type": "integer", "description": "First number", "required": True},
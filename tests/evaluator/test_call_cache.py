@@ -0,0 +1,167 @@
+"""Tests for memoization of cacheable template calls."""
+import pytest
+from unittest.mock import patch
+
+from evaluator.call_cache import CallMemoTable, canonicalize_arguments, file_context_digest
+from evaluator.evaluator import Evaluator
+from task_system.ast_nodes import ArgumentNode, FunctionCallNode
+from task_system.template_utils import Environment
+
+
+class CountingTemplateLookup:
+    """Template provider counting task executions."""
+
+    def __init__(self, cacheable=True, cache_ttl=None, status="COMPLETE"):
+        self.templates = {
+            "add": {
+                "name": "add", "type": "atomic", "subtype": "math_add", "cacheable": cacheable,
+                "cache_ttl": cache_ttl,
+                "parameters": {"x": {"type": "integer", "required": True},
+                               "y": {"type": "integer", "required": True}}
+            }
+        }
+        self.status = status
+        self.executions = 0
+        self.inputs = None
+
+    def find_template(self, identifier):
+        return self.templates.get(identifier)
+
+    def execute_task(self, task_type, task_subtype, inputs):
+        self.executions += 1
+        self.inputs = inputs
+        return {"status": self.status, "content": str(inputs["x"] + inputs["y"]), "notes": {}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def add_call(x, y):
+    return FunctionCallNode("add", [ArgumentNode(x), ArgumentNode(y, name="y")])
+
+
+class TestCallMemoTable:
+    """Tests for the CallMemoTable class."""
+
+    def test_lru_eviction_and_copies(self):
+        """Test that least recently used results are evicted and hits are copies."""
+        table = CallMemoTable(max_entries=2)
+        table.put("a", {"content": "A"})
+        table.put("b", {"content": "B"})
+        assert table.get("a") == (True, {"content": "A"})
+        table.put("c", {"content": "C"})
+
+        assert table.get("b") == (False, None)
+        found, value = table.get("a")
+        value["content"] = "changed"
+        assert table.get("a") == (True, {"content": "A"})
+        assert table.stats["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """Test that results expire after their TTL."""
+        clock = FakeClock()
+        table = CallMemoTable(clock=clock)
+        table.put("short", 1, ttl=10)
+        table.put("forever", 2)
+
+        clock.now = 10
+        assert table.get("short") == (False, None)
+        assert table.get("forever") == (True, 2)
+
+    def test_keys(self, tmp_path):
+        """Test canonical arguments and file context digests."""
+        assert canonicalize_arguments({"b": 1, "a": [1, 2]}) == canonicalize_arguments({"a": [1, 2], "b": 1})
+        assert canonicalize_arguments({"value": object()}) is None
+
+        path = tmp_path / "data.txt"
+        path.write_text("one")
+        before = file_context_digest([str(path)])
+        assert file_context_digest([str(path)]) == before
+        path.write_text("three")
+        assert file_context_digest([str(path)]) != before
+
+
+class TestEvaluatorMemoization:
+    """Tests for memoization in Evaluator.evaluateFunctionCall."""
+
+    def test_identical_calls_execute_once(self):
+        """Test that cacheable templates run once per distinct arguments."""
+        provider = CountingTemplateLookup()
+        evaluator = Evaluator(provider)
+        env = Environment({"a": 2})
+
+        first = evaluator.evaluateFunctionCall(add_call("a", 3), env)
+        second = evaluator.evaluateFunctionCall(add_call(2, 3), env)  # Same bound arguments
+        evaluator.evaluateFunctionCall(add_call(2, 4), env)
+
+        assert first == second == {"status": "COMPLETE", "content": "5", "notes": {}}
+        assert provider.executions == 2
+        assert evaluator.memo.stats["hits"] == 1
+
+    def test_uncacheable_and_failed_calls_are_not_memoized(self):
+        """Test that only cacheable, successful calls are reused."""
+        for provider in (CountingTemplateLookup(cacheable=False), CountingTemplateLookup(status="FAILED")):
+            evaluator = Evaluator(provider)
+            evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+            evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+            assert provider.executions == 2
+
+    def test_template_ttl(self):
+        """Test that the template's cache_ttl bounds reuse."""
+        provider = CountingTemplateLookup(cache_ttl=60)
+        evaluator = Evaluator(provider)
+        evaluator.memo.clock = clock = FakeClock()
+
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        clock.now = 30
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        clock.now = 90
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+
+        assert provider.executions == 2
+
+    def test_reregistered_template_is_not_served_from_memo(self):
+        """Test that results of a replaced template definition are not reused."""
+        provider = CountingTemplateLookup()
+        evaluator = Evaluator(provider)
+
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        provider.templates["add"] = dict(provider.templates["add"], description="Add two numbers, v2")
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+
+        assert provider.executions == 2
+
+    def test_fingerprint_computed_once_per_definition(self):
+        """Test that a template is serialized once, and again only when replaced."""
+        provider = CountingTemplateLookup()
+        evaluator = Evaluator(provider)
+
+        with patch("evaluator.call_cache.template_fingerprint", return_value="digest") as fingerprint:
+            for y in range(3):
+                evaluator.evaluateFunctionCall(add_call(1, y), Environment({}))
+            provider.templates["add"] = dict(provider.templates["add"], description="v2")
+            evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+
+        assert fingerprint.call_count == 2
+
+    def test_file_paths_are_resolved_per_call(self, tmp_path):
+        """Test that the file context digest covers the files a call actually reads."""
+        provider = CountingTemplateLookup()
+        provider.templates["add"] = dict(provider.templates["add"], file_paths=[str(tmp_path / "{{x}}.txt")])
+        evaluator = Evaluator(provider)
+        (tmp_path / "1.txt").write_text("one")
+
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        assert provider.executions == 1
+        assert provider.inputs["file_paths"] == [str(tmp_path / "1.txt")]
+
+        (tmp_path / "1.txt").write_text("changed")
+        evaluator.evaluateFunctionCall(add_call(1, 1), Environment({}))
+        assert provider.executions == 2
@@ -100,7 +100,41 @@ class TestBaseHandler:
             assert "Content of file1.py" in file_context
             assert "file2.py" in file_context
             assert "could not be read" in file_context
-            
+
+    def test_create_file_context_reads_concurrently(self, mock_task_system, mock_memory_system):
+        """Test that files are read in parallel while preserving input order."""
+        import threading
+        import time
+
+        # Track how many reads are in flight at once
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def slow_read(path):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+            return f"Content of {path}"
+
+        handler = BaseHandler(mock_task_system, mock_memory_system, config={"max_parallel_file_reads": 8})
+        handler.file_manager = MagicMock()
+        handler.file_manager.read_file.side_effect = slow_read
+
+        paths = [f"file{i}.py" for i in range(8)]
+        file_context = handler._create_file_context(paths)
+
+        # All files were read, at least some of them concurrently
+        assert handler.file_manager.read_file.call_count == 8
+        assert state["peak"] > 1
+
+        # Output order matches input order
+        positions = [file_context.index(f"File: {path}\n") for path in paths]
+        assert positions == sorted(positions)
+        assert "Content of file7.py" in file_context
+
     def test_get_relevant_files(self, mock_task_system, mock_memory_system):
         """Test getting relevant files from memory system."""
         # Setup memory system mock
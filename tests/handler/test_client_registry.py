@@ -0,0 +1,104 @@
+"""Tests for the shared client registry and async provider path."""
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from handler import client_registry
+from handler.model_provider import ProviderAdapter, ClaudeProvider
+from handler.rate_limiting import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    """Start and finish every test with an empty registry."""
+    client_registry.clear_clients()
+    yield
+    client_registry.clear_clients()
+
+
+class TestClientRegistry:
+    """Tests for the client registry functions."""
+
+    def test_clients_are_shared_per_key(self):
+        """Test that providers with the same key share one client."""
+        first = ClaudeProvider(api_key="test_key")
+        second = ClaudeProvider(api_key="test_key")
+        other = ClaudeProvider(api_key="other_key")
+
+        assert first.client is second.client
+        assert first.client is not other.client
+        assert client_registry.get_registry_stats()["sync_clients"] == 2
+
+    def test_connection_limits_are_configurable(self):
+        """Test that the pool size is part of the client identity."""
+        default = client_registry.get_client("test_key")
+        small = client_registry.get_client("test_key", max_connections=2)
+
+        assert default is not small
+        assert client_registry.get_client("test_key", max_connections=2) is small
+
+    def test_async_clients_are_per_event_loop(self):
+        """Test that async clients are shared within, not across, event loops."""
+        async def get_twice():
+            return client_registry.get_async_client("test_key"), client_registry.get_async_client("test_key")
+
+        first_a, first_b = asyncio.run(get_twice())
+        second_a, _ = asyncio.run(get_twice())
+
+        assert first_a is first_b
+        assert first_a is not second_a
+
+
+class TestAsyncSendMessage:
+    """Tests for async_send_message."""
+
+    def test_default_runs_send_message_in_thread(self):
+        """Test the fallback for providers without an async client."""
+        provider = MagicMock(spec=ProviderAdapter)
+        provider.send_message.return_value = "Buffered response"
+
+        result = asyncio.run(ProviderAdapter.async_send_message(provider, [{"role": "user", "content": "hi"}]))
+
+        assert result == "Buffered response"
+        provider.send_message.assert_called_once()
+
+    def test_claude_provider_uses_shared_async_client(self):
+        """Test that ClaudeProvider awaits the shared async client."""
+        provider = ClaudeProvider(api_key="test_key")
+        async_client = MagicMock()
+        text_block = MagicMock(text="Async response")
+        async_client.messages.create = AsyncMock(return_value=MagicMock(content=[text_block], tool_calls=None))
+
+        with patch('handler.model_provider.get_async_client', return_value=async_client) as mock_get:
+            result = asyncio.run(provider.async_send_message([{"role": "user", "content": "hi"}], "system"))
+
+        assert result == "Async response"
+        mock_get.assert_called_once_with("test_key", None)
+        assert async_client.messages.create.call_args[1]["system"] == "system"
+
+    def test_concurrent_async_calls(self):
+        """Test that many requests can be in flight on one event loop."""
+        # Without an in-flight limit, so all requests are in flight at once
+        provider = ClaudeProvider(api_key="test_key", rate_limiter=RateLimiter())
+        state = {"active": 0, "peak": 0}
+
+        async def create(**params):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return MagicMock(content=[MagicMock(text=params["messages"][0]["content"])], tool_calls=None)
+
+        async_client = MagicMock()
+        async_client.messages.create = create
+
+        async def run_all():
+            return await asyncio.gather(*[
+                provider.async_send_message([{"role": "user", "content": f"q{i}"}]) for i in range(10)
+            ])
+
+        with patch('handler.model_provider.get_async_client', return_value=async_client):
+            results = asyncio.run(run_all())
+
+        assert results == [f"q{i}" for i in range(10)]
+        assert state["peak"] == 10
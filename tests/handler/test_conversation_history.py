@@ -0,0 +1,112 @@
+"""Tests for the ConversationHistoryManager."""
+import pytest
+from unittest.mock import MagicMock
+
+from handler.conversation_history import ConversationHistoryManager, extractive_summary
+
+
+def make_history(turns, size=100):
+    """Create a history of user/assistant turns ending with a user query."""
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"question {i} " + "q" * size})
+        history.append({"role": "assistant", "content": f"answer {i} " + "a" * size})
+    history.append({"role": "user", "content": "latest question"})
+    return history
+
+
+class TestConversationHistoryManager:
+    """Tests for the ConversationHistoryManager class."""
+
+    def test_under_ceiling_returns_full_history(self):
+        """Test that short histories are sent unchanged."""
+        manager = ConversationHistoryManager(token_ceiling=10000, token_ratio=0.25)
+        history = make_history(3)
+
+        messages = manager.get_messages(history)
+
+        assert messages == [{"role": m["role"], "content": m["content"]} for m in history]
+
+    def test_compacts_older_turns(self):
+        """Test that older turns are summarized and recent turns kept verbatim."""
+        manager = ConversationHistoryManager(token_ceiling=1500, token_ratio=0.25, keep_turns=2, max_summary_tokens=1000)
+        history = make_history(10, size=300)
+
+        messages = manager.get_messages(history)
+
+        # Last 2 turns plus the pending query, opening with a user message
+        assert len(messages) == 5
+        assert messages[0]["role"] == "user"
+        assert messages[0]["content"].startswith("Summary of the earlier conversation:")
+        assert "question 0" in messages[0]["content"]
+        assert "question 7" in messages[0]["content"]
+        assert "question 8" in messages[0]["content"].split("\n\n")[-1]
+        assert messages[-1]["content"] == "latest question"
+        assert messages[-2]["content"].startswith("answer 9")
+
+    def test_flat_cost_per_turn(self):
+        """Test that the tokens sent stay bounded as the session grows."""
+        manager = ConversationHistoryManager(token_ceiling=300, token_ratio=0.25, keep_turns=2)
+        history = make_history(1)
+        sizes = []
+        for i in range(50):
+            messages = manager.get_messages(history)
+            sizes.append(sum(len(m["content"]) for m in messages))
+            history.append({"role": "assistant", "content": f"answer {i} " + "a" * 100})
+            history.append({"role": "user", "content": f"question {i} " + "q" * 100})
+
+        # Bounded by the ceiling (in characters at the default ratio)
+        assert max(sizes) <= 300 / 0.25
+
+    def test_summary_is_lazy_and_incremental(self):
+        """Test that the summarizer only sees messages leaving the window."""
+        summarizer = MagicMock(side_effect=extractive_summary)
+        manager = ConversationHistoryManager(token_ceiling=200, token_ratio=0.25, keep_turns=1, summarizer=summarizer)
+        history = make_history(1, size=10)
+
+        manager.get_messages(history)
+        assert summarizer.call_count == 0
+
+        history.extend(make_history(6)[:-1])
+        history.append({"role": "user", "content": "next"})
+        manager.get_messages(history)
+        first_folded = len(summarizer.call_args[0][1])
+
+        # Repeated call with no new messages reuses the cached summary
+        manager.get_messages(history)
+        assert summarizer.call_count == 1
+
+        history.append({"role": "assistant", "content": "a" * 100})
+        history.append({"role": "user", "content": "again"})
+        manager.get_messages(history)
+        assert summarizer.call_count == 2
+        # Only the newly collapsed messages are passed in
+        assert len(summarizer.call_args[0][1]) == 2
+        assert first_folded > 2
+
+    def test_reset_on_new_history(self):
+        """Test that token accounting restarts for a new history list."""
+        manager = ConversationHistoryManager(token_ceiling=10000, token_ratio=0.25)
+        manager.get_messages(make_history(5))
+
+        new_history = [{"role": "user", "content": "hello"}]
+
+        assert manager.total_tokens(new_history) == int(len("hello") * 0.25)
+        assert manager.get_messages(new_history) == new_history
+
+    def test_handler_uses_history_manager(self, mock_task_system, mock_memory_system):
+        """Test that PassthroughHandler sends the compacted history."""
+        from handler.passthrough_handler import PassthroughHandler
+
+        provider = MagicMock()
+        provider.send_message.return_value = "response"
+        provider.extract_tool_calls.return_value = {"content": "response", "tool_calls": []}
+        handler = PassthroughHandler(mock_task_system, mock_memory_system, provider,
+                                     config={"history_token_ceiling": 200, "history_keep_turns": 1})
+        handler.conversation_history = make_history(10)
+
+        handler._send_to_model("latest question", "")
+
+        sent = provider.send_message.call_args[1]["messages"]
+        assert len(sent) == 3
+        assert sent[0]["content"].startswith("Summary of the earlier conversation:")
@@ -0,0 +1,110 @@
+"""Tests for relevance-driven file excerpting."""
+import pytest
+
+from handler.file_excerpts import create_file_excerpt, extract_query_terms
+from memory.indexers.text_extraction import extract_definitions
+from memory.token_counting import RatioTokenCounter
+
+SAMPLE_MODULE = '''"""Sample module."""
+import os
+from typing import List
+
+
+class TokenCache:
+    """Caches tokens."""
+
+    def lookup(self, key):
+        value = self._store.get(key)
+        return value
+
+    def evict(self, key):
+        self._store.pop(key, None)
+        return True
+
+
+def parse_config(path):
+    with open(path) as f:
+        data = f.read()
+    return data.split("\\n")
+
+
+def unrelated_helper(values):
+''' + "\n".join(f"    total_{i} = sum(values) * {i}" for i in range(200)) + "\n    return values\n"
+
+
+class TestExtractDefinitions:
+    """Tests for extract_definitions."""
+
+    def test_python_definitions(self):
+        """Definitions carry names and line spans."""
+        definitions = extract_definitions(SAMPLE_MODULE, ".py")
+        names = [d["name"] for d in definitions]
+
+        assert names == ["TokenCache", "lookup", "evict", "parse_config", "unrelated_helper"]
+        lookup = definitions[1]
+        lines = SAMPLE_MODULE.split("\n")
+        assert lines[lookup["start"]].strip().startswith("def lookup")
+        assert lines[lookup["end"] - 1].strip() == "return value"
+
+    def test_unsupported_language(self):
+        """Unsupported languages yield no definitions."""
+        assert extract_definitions("function foo() {}", "js") == []
+
+
+class TestCreateFileExcerpt:
+    """Tests for create_file_excerpt."""
+
+    def test_small_file_unchanged(self):
+        """Content within budget is returned as is."""
+        content = "def foo():\n    return 1\n"
+        assert create_file_excerpt(content, "small.py", "foo", max_tokens=1000) == content
+
+    def test_relevant_definitions_kept(self):
+        """Definitions matching the query keep their bodies, others collapse."""
+        excerpt = create_file_excerpt(SAMPLE_MODULE, "module.py", "How does parse_config read the file?", max_tokens=300)
+
+        # Imports and signatures are always present
+        assert "import os" in excerpt
+        assert "class TokenCache:" in excerpt
+        assert "def unrelated_helper(values):" in excerpt
+        # The matching definition is kept in full
+        assert 'return data.split("\\n")' in excerpt
+        # The large unrelated body is collapsed
+        assert "total_150" not in excerpt
+        assert "    ..." in excerpt
+        assert len(excerpt) < len(SAMPLE_MODULE)
+
+    def test_budget_is_respected(self):
+        """The excerpt never exceeds the character budget by more than the marker."""
+        excerpt = create_file_excerpt(SAMPLE_MODULE, "module.py", "unrelated_helper total", max_tokens=50,
+                                      token_ratio=0.25)
+        body = excerpt.split("\n", 1)[1]
+        assert len(body) <= 50 / 0.25 + len("\n...")
+
+    def test_uses_given_token_counter(self):
+        """The budget is measured with the caller's token counter."""
+        counter = RatioTokenCounter(1.0)  # Four times the default estimate
+        content = "def foo():\n    return 1\n" * 20
+
+        assert create_file_excerpt(content, "small.py", "foo", max_tokens=200, token_ratio=0.25) == content
+        excerpt = create_file_excerpt(content, "small.py", "foo", max_tokens=200, token_counter=counter)
+        assert excerpt != content
+        assert counter.count(excerpt.split("\n", 1)[1]) <= 200 + len("\n...")
+
+    def test_plain_text_keeps_matching_lines(self):
+        """Files without definitions keep matching lines with surroundings."""
+        lines = [f"line {i} filler text" for i in range(500)]
+        lines[250] = "the special keyword appears here"
+        excerpt = create_file_excerpt("\n".join(lines), "notes.txt", "special keyword", max_tokens=100)
+
+        assert "the special keyword appears here" in excerpt
+        assert "line 249 filler text" in excerpt
+        assert "line 10 filler text" not in excerpt
+
+    def test_query_terms(self):
+        """Stopwords are dropped and snake_case parts are added."""
+        terms = extract_query_terms("How does parse_config work?")
+        assert "parse_config" in terms
+        assert "parse" in terms
+        assert "config" in terms
+        assert "how" not in terms
@@ -2,7 +2,28 @@
 import pytest
 from unittest.mock import patch, MagicMock
 
-from handler.model_provider import ProviderAdapter, ClaudeProvider
+from handler.model_provider import ProviderAdapter, ClaudeProvider, collect_stream
+
+
+class FakeStreamingProvider(ProviderAdapter):
+    """Local provider that streams a canned response in chunks."""
+
+    def __init__(self, chunks, tool_calls=None):
+        self.chunks = chunks
+        self.tool_calls = tool_calls or []
+
+    def stream_message(self, messages, system_prompt="", tools=None):
+        for chunk in self.chunks:
+            yield {"type": "text", "text": chunk}
+        for tool_call in self.tool_calls:
+            yield {"type": "tool_call", **tool_call}
+
+    def send_message(self, messages, system_prompt="", tools=None):
+        # Buffered callers go through the stream
+        return collect_stream(self.stream_message(messages, system_prompt, tools))
+
+    def extract_tool_calls(self, response):
+        return ClaudeProvider.extract_tool_calls(self, response)
 
 class TestProviderAdapter:
     """Tests for the ProviderAdapter."""
@@ -11,6 +32,49 @@ class TestProviderAdapter:
         """Test that ProviderAdapter defines the expected interface."""
         assert hasattr(ProviderAdapter, 'send_message')
         assert hasattr(ProviderAdapter, 'extract_tool_calls')
+        assert hasattr(ProviderAdapter, 'stream_message')
+
+    def test_default_stream_message_replays_buffered_response(self):
+        """Test that providers without native streaming still stream."""
+        provider = MagicMock(spec=ProviderAdapter)
+        provider.send_message.return_value = "Full response"
+        provider.extract_tool_calls.return_value = {
+            "content": "Full response",
+            "tool_calls": [{"name": "tool", "parameters": {"a": 1}}],
+            "awaiting_tool_response": False
+        }
+
+        events = list(ProviderAdapter.stream_message(provider, [{"role": "user", "content": "hi"}]))
+
+        assert events == [
+            {"type": "text", "text": "Full response"},
+            {"type": "tool_call", "name": "tool", "parameters": {"a": 1}}
+        ]
+
+    def test_collect_stream_for_buffered_callers(self):
+        """Test that a streaming provider serves buffered callers."""
+        provider = FakeStreamingProvider(["Hel", "lo"], [{"name": "tool", "parameters": {"a": 1}}])
+
+        response = provider.send_message([{"role": "user", "content": "hi"}])
+        extracted = provider.extract_tool_calls(response)
+
+        assert extracted["content"] == "Hello"
+        assert extracted["tool_calls"] == [{"name": "tool", "parameters": {"a": 1}}]
+        assert collect_stream(iter([{"type": "text", "text": "plain"}])) == "plain"
+
+    def test_default_send_batch_keeps_request_order(self):
+        """Test the local batch stand-in maps responses back in order."""
+        provider = FakeStreamingProvider([])
+        provider.send_message = lambda messages, system_prompt="", tools=None: (
+            f"{system_prompt}:{messages[-1]['content']}" if messages[-1]["content"] != "fail"
+            else 1 / 0)
+
+        responses = provider.send_batch([
+            {"messages": [{"role": "user", "content": str(i)}], "system_prompt": "s"} for i in range(10)
+        ] + [{"messages": [{"role": "user", "content": "fail"}]}])
+
+        assert responses[:10] == [f"s:{i}" for i in range(10)]
+        assert responses[10].startswith("Error in batch request:")
 
 class TestClaudeProvider:
     """Tests for the ClaudeProvider class."""
@@ -141,3 +205,80 @@ class TestClaudeProvider:
             assert call_args["messages"] == messages
             assert "tools" in call_args
             assert call_args["tools"] == tools
+
+    def test_stream_message_with_client(self):
+        """Test streaming text deltas and tool calls from the Messages API."""
+        provider = ClaudeProvider(api_key="test_key")
+        provider.client = MagicMock()
+
+        tool_block = MagicMock(type="tool_use", input={"command": "ls"}, id="toolu_1")
+        tool_block.name = "executeFilePathCommand"
+        stream = MagicMock()
+        stream.text_stream = iter(["Let me ", "look"])
+        stream.get_final_message.return_value = MagicMock(content=[MagicMock(type="text"), tool_block],
+                                                          stop_reason="tool_use")
+        provider.client.messages.stream.return_value.__enter__.return_value = stream
+
+        events = list(provider.stream_message([{"role": "user", "content": "hi"}], "system"))
+
+        assert events == [
+            {"type": "text", "text": "Let me "},
+            {"type": "text", "text": "look"},
+            {"type": "tool_call", "name": "executeFilePathCommand", "parameters": {"command": "ls"}, "id": "toolu_1"},
+            {"type": "stop", "stop_reason": "tool_use"}
+        ]
+        assert provider.client.messages.stream.call_args[1]["system"] == "system"
+
+    def test_send_message_parses_tool_use_blocks(self):
+        """Test that tool_use content blocks become tool calls with ids."""
+        provider = ClaudeProvider(api_key="test_key")
+        provider.client = MagicMock()
+        tool_block = MagicMock(type="tool_use", id="toolu_1", input={"command": "ls"})
+        tool_block.name = "executeFilePathCommand"
+        provider.client.messages.create.return_value = MagicMock(
+            content=[MagicMock(type="text", text="Let me look"), tool_block],
+            stop_reason="tool_use", tool_calls=None)
+
+        response = provider.send_message([{"role": "user", "content": "hi"}])
+        extracted = provider.extract_tool_calls(response)
+
+        assert extracted["content"] == "Let me look"
+        assert extracted["tool_calls"] == [
+            {"name": "executeFilePathCommand", "parameters": {"command": "ls"}, "id": "toolu_1"}
+        ]
+        assert extracted["awaiting_tool_response"] is True
+
+    def test_send_batch_submits_message_batch(self):
+        """Test that batches are submitted, polled and mapped back by custom_id."""
+        sleeps = []
+        provider = ClaudeProvider(api_key="test_key")
+        provider.retry_policy.sleep = sleeps.append
+        provider.client = MagicMock()
+        batches = provider.client.messages.batches
+        batches.create.return_value = MagicMock(id="batch_1", processing_status="in_progress")
+        batches.retrieve.side_effect = [
+            MagicMock(id="batch_1", processing_status="in_progress"),
+            MagicMock(id="batch_1", processing_status="ended")
+        ]
+        succeeded = MagicMock(custom_id="request-1")
+        succeeded.result.type = "succeeded"
+        succeeded.result.message = MagicMock(content=[MagicMock(text="Second")], tool_calls=None)
+        expired = MagicMock(custom_id="request-0")
+        expired.result.type = "expired"
+        expired.result.error = None
+        # Results may arrive in any order
+        batches.results.return_value = iter([succeeded, expired])
+
+        responses = provider.send_batch([
+            {"messages": [{"role": "user", "content": "first"}], "system_prompt": "sys"},
+            {"messages": [{"role": "user", "content": "second"}], "max_tokens": 10}
+        ], poll_interval=5)
+
+        submitted = batches.create.call_args.kwargs["requests"]
+        assert [r["custom_id"] for r in submitted] == ["request-0", "request-1"]
+        assert submitted[0]["params"]["system"] == "sys"
+        assert submitted[1]["params"]["max_tokens"] == 10
+        assert sleeps == [5, 5]
+        assert responses[0].startswith("Error calling Claude API: batch request expired")
+        assert responses[1] == "Second"
+        provider.client.messages.create.assert_not_called()
@@ -0,0 +1,124 @@
+"""Tests for routing model requests by task class."""
+import pytest
+from unittest.mock import MagicMock
+
+from handler.model_provider import ClaudeProvider, ProviderAdapter
+from handler.model_router import ANSWER, RETRIEVAL, ModelRouter, get_model_router
+from task_system.templates.associative_matching import ASSOCIATIVE_MATCHING_TEMPLATE, execute_template
+
+
+class RecordingProvider(ProviderAdapter):
+    """Provider recording the model of each request, failing for some models."""
+
+    def __init__(self, failing_models=()):
+        self.failing_models = set(failing_models)
+        self.models = []
+
+    def send_message(self, messages, system_prompt="", tools=None, model=None):
+        self.models.append(model)
+        if model in self.failing_models:
+            return f"Error calling Claude API: overloaded ({model})"
+        return f"Response from {model or 'default'}"
+
+    def extract_tool_calls(self, response):
+        return {"content": response, "tool_calls": [], "awaiting_tool_response": False}
+
+
+MESSAGES = [{"role": "user", "content": "Find relevant files"}]
+
+
+class TestModelRouter:
+    """Tests for the ModelRouter class."""
+
+    def test_default_candidates(self):
+        """Test that retrieval prefers a small model and answers the provider default."""
+        router = ModelRouter()
+
+        assert router.candidates(ANSWER) == [None]
+        retrieval = router.candidates(RETRIEVAL, ASSOCIATIVE_MATCHING_TEMPLATE)
+        assert retrieval[0] == "claude-3-5-haiku-latest"
+        assert retrieval[-1] is None
+        # Template preferences are mapped to API ids; unknown names are skipped
+        assert "claude-3-haiku-20240307" in retrieval
+        assert "gpt-4" not in retrieval
+
+    def test_configured_routes_take_precedence(self):
+        """Test routes by template name, then task type, then task class."""
+        router = ModelRouter.from_config({"model_routes": {
+            "find_relevant_files": "model-for-template",
+            "atomic:associative_matching": ["model-for-type"],
+            ANSWER: "large-model"
+        }})
+
+        assert router.candidates(RETRIEVAL, ASSOCIATIVE_MATCHING_TEMPLATE)[0] == "model-for-template"
+        other = {**ASSOCIATIVE_MATCHING_TEMPLATE, "name": "other"}
+        assert router.candidates(RETRIEVAL, other)[0] == "model-for-type"
+        assert router.candidates(ANSWER) == ["large-model", None]
+
+    def test_falls_back_on_error_responses(self):
+        """Test that an overloaded model falls back to the next candidate."""
+        provider = RecordingProvider(failing_models={"claude-3-5-haiku-latest"})
+        router = ModelRouter()
+
+        response = router.send_message(provider, MESSAGES, task_class=RETRIEVAL)
+
+        assert response == "Response from default"
+        assert provider.models == ["claude-3-5-haiku-latest", None]
+        assert router.stats == {"requests": 1, "fallbacks": 1}
+
+    def test_falls_back_on_exceptions_and_reraises_last(self):
+        """Test that exceptions trigger fallback and the last one propagates."""
+        provider = MagicMock()
+        provider.send_message.side_effect = [RuntimeError("overloaded"), "Recovered"]
+        assert ModelRouter().send_message(provider, MESSAGES, task_class=RETRIEVAL) == "Recovered"
+
+        provider.send_message.side_effect = RuntimeError("down")
+        with pytest.raises(RuntimeError):
+            ModelRouter().send_message(provider, MESSAGES, task_class=RETRIEVAL)
+
+    def test_provider_without_model_override(self):
+        """Test that providers without a model parameter are called unchanged."""
+        provider = MagicMock(spec=["send_message"])
+        provider.send_message = lambda messages, system_prompt="", tools=None: "Plain"
+
+        assert ModelRouter().send_message(provider, MESSAGES, task_class=RETRIEVAL) == "Plain"
+        assert ModelRouter().select(provider, RETRIEVAL) == {}
+
+    def test_batch_retries_failures_with_fallback(self):
+        """Test that failed batch entries are retried with the next model."""
+        provider = RecordingProvider()
+        provider.send_batch = MagicMock(return_value=["Matches", "Error calling Claude API: overloaded"])
+        router = ModelRouter()
+
+        responses = router.send_batch(provider, [{"messages": MESSAGES}, {"messages": MESSAGES}], RETRIEVAL)
+
+        sent = provider.send_batch.call_args[0][0]
+        assert [request["model"] for request in sent] == ["claude-3-5-haiku-latest"] * 2
+        assert responses == ["Matches", "Response from default"]
+        assert provider.models == [None]
+
+    def test_claude_provider_model_override(self):
+        """Test that ClaudeProvider sends the requested model."""
+        provider = ClaudeProvider(api_key="test_key", coalesce_requests=False)
+        assert provider._build_params(MESSAGES, model="claude-3-5-haiku-latest")["model"] == "claude-3-5-haiku-latest"
+        assert provider._build_params(MESSAGES)["model"] == provider.model
+
+
+class TestRoutingIntegration:
+    """Tests for routing in associative matching."""
+
+    def test_associative_matching_uses_retrieval_route(self):
+        """Test that file matching is sent to the small model."""
+        provider = RecordingProvider()
+        handler = MagicMock(model_provider=provider, model_router=ModelRouter())
+        inputs = {"query": "model routing", "metadata": "File: /repo/router.py\nmodel routing", "max_results": 5}
+
+        execute_template(inputs, MagicMock(), handler)
+
+        assert provider.models == ["claude-3-5-haiku-latest"]
+
+    def test_get_model_router_defaults(self):
+        """Test that handlers without a router get the default routes."""
+        assert isinstance(get_model_router(MagicMock()), ModelRouter)
+        router = ModelRouter()
+        assert get_model_router(MagicMock(model_router=router)) is router
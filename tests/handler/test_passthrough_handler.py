@@ -365,6 +365,29 @@ class TestPassthroughHandler:
                 mock_provider.extract_tool_calls.assert_called_once_with("Response with tool call")
                 
     # Test handling of awaiting_tool_response
+    def test_send_to_model_runs_only_first_unawaited_tool(self, mock_task_system, mock_memory_system):
+        """Test that tool calls the model does not wait on stop at the first result."""
+        with patch('handler.file_access.FileAccessManager'):
+            mock_provider = MagicMock()
+            mock_provider.send_message.return_value = "Response with tools"
+            mock_provider.extract_tool_calls.return_value = {
+                "content": "",
+                "tool_calls": [{"name": "first", "parameters": {}}, {"name": "second", "parameters": {}}],
+                "awaiting_tool_response": False
+            }
+            
+            handler = PassthroughHandler(mock_task_system, mock_memory_system)
+            handler.model_provider = mock_provider
+            first = MagicMock(return_value={"status": "success", "content": "first result"})
+            second = MagicMock(return_value={"status": "success", "content": "second result"})
+            handler.tool_executors = {"first": first, "second": second}
+            
+            result = handler._send_to_model("test query", "file context")
+            
+            assert result == "first result"
+            first.assert_called_once()
+            second.assert_not_called()
+    
     def test_send_to_model_awaiting_tool_response(self, mock_task_system, mock_memory_system):
         """Test handling of awaiting_tool_response flag."""
         # Mock the provider
@@ -390,10 +413,177 @@ class TestPassthroughHandler:
             # Send to model
             result = handler._send_to_model("test query", "file context")
             
-            # Check that the response indicates waiting for tool response
-            assert "The model is requesting to use a tool" in result
-            assert "multi-step tool interactions" in result
+            # With no tool named there is nothing to run; the model's text is returned
+            assert result == "I need to use a tool"
             
             # Verify provider methods were called
             mock_provider.send_message.assert_called_once()
             mock_provider.extract_tool_calls.assert_called_once()
+
+    def test_send_to_model_tool_use_loop(self, mock_task_system, mock_memory_system):
+        """Test that tool results are fed back until the model answers."""
+        import threading
+        mock_provider = MagicMock()
+        mock_provider.send_message.side_effect = ["round 1", "final"]
+        mock_provider.extract_tool_calls.side_effect = [
+            {
+                "content": "Checking both",
+                "tool_calls": [
+                    {"name": "tool_a", "parameters": {"x": 1}, "id": "toolu_a"},
+                    {"name": "tool_b", "parameters": {"x": 2}, "id": "toolu_b"}
+                ],
+                "awaiting_tool_response": True
+            },
+            {"content": "Both done", "tool_calls": [], "awaiting_tool_response": False}
+        ]
+        handler = PassthroughHandler(mock_task_system, mock_memory_system, mock_provider)
+        # Each tool waits for the other, so they only finish if run concurrently
+        barrier = threading.Barrier(2, timeout=5)
+
+        def make_tool(name):
+            def tool(params):
+                barrier.wait()
+                return {"status": "success", "content": f"{name} saw {params['x']}"}
+            return tool
+
+        handler.tool_executors["tool_a"] = make_tool("tool_a")
+        handler.tool_executors["tool_b"] = make_tool("tool_b")
+        handler.conversation_history.append({"role": "user", "content": "use both tools"})
+
+        result = handler._send_to_model("use both tools", "")
+
+        assert result == "Both done"
+        followup = mock_provider.send_message.call_args_list[1][1]["messages"]
+        assert [block["id"] for block in followup[-2]["content"][1:]] == ["toolu_a", "toolu_b"]
+        assert followup[-1]["content"] == [
+            {"type": "tool_result", "tool_use_id": "toolu_a", "content": "tool_a saw 1", "is_error": False},
+            {"type": "tool_result", "tool_use_id": "toolu_b", "content": "tool_b saw 2", "is_error": False}
+        ]
+        # The loop's intermediate messages are not kept in the conversation
+        assert len(handler.conversation_history) == 1
+
+    def test_send_to_model_tool_loop_is_bounded(self, mock_task_system, mock_memory_system):
+        """Test that tool rounds stop at max_tool_rounds and slow tools time out."""
+        import threading
+        release = threading.Event()
+        mock_provider = MagicMock()
+        mock_provider.send_message.return_value = "more tools"
+        mock_provider.extract_tool_calls.return_value = {
+            "content": "",
+            "tool_calls": [{"name": "slow_tool", "parameters": {}, "id": "toolu_1"}],
+            "awaiting_tool_response": True
+        }
+        handler = PassthroughHandler(mock_task_system, mock_memory_system, mock_provider,
+                                     config={"max_tool_rounds": 2, "tool_timeout": 0.05})
+        handler.tool_executors["slow_tool"] = lambda params: release.wait(5) and {"status": "success"}
+
+        try:
+            result = handler._send_to_model("loop forever", "")
+        finally:
+            release.set()
+
+        assert "Stopped after 2 rounds" in result
+        assert mock_provider.send_message.call_count == 3
+        last_results = mock_provider.send_message.call_args[1]["messages"][-1]["content"]
+        assert last_results[0]["is_error"] is True
+        assert "timed out" in last_results[0]["content"]
+
+    def test_continue_subtask_sends_only_changed_files(self, mock_task_system, mock_memory_system):
+        """Test that follow-up turns only resend new or changed files."""
+        mock_provider = MagicMock()
+        mock_provider.send_message.return_value = "Response"
+        mock_provider.extract_tool_calls.return_value = {
+            "content": "Response",
+            "tool_calls": [],
+            "awaiting_tool_response": False
+        }
+        mock_memory_system.get_relevant_context_for.return_value = MagicMock(
+            matches=[("file1.py", "metadata1"), ("file2.py", "metadata2")]
+        )
+        contents = {"file1.py": "one = 1", "file2.py": "two = 2"}
+
+        handler = PassthroughHandler(mock_task_system, mock_memory_system, mock_provider)
+        handler.file_manager = MagicMock()
+        handler.file_manager.read_file.side_effect = lambda path: contents[path]
+
+        handler.handle_query("first query")
+        first_messages = mock_provider.send_message.call_args[1]["messages"]
+        assert "one = 1" in first_messages[-1]["content"]
+        assert "two = 2" in first_messages[-1]["content"]
+
+        # Second turn: file2.py changed, file1.py did not
+        contents["file2.py"] = "two = 22"
+        result = handler.handle_query("second query")
+
+        messages = mock_provider.send_message.call_args[1]["messages"]
+        # Earlier file contents stay in the history sent to the model
+        assert "one = 1" in messages[0]["content"]
+        latest = messages[-1]["content"]
+        assert "one = 1" not in latest
+        assert "two = 22" in latest
+        assert "unchanged): file1.py" in latest
+        assert result["metadata"]["context_packing"]["unchanged"] == ["file1.py"]
+
+        # A reset starts over with full context
+        handler.reset_conversation()
+        assert handler.sent_files == {}
+
+    def test_handle_query_runs_stages_concurrently(self, mock_task_system, mock_memory_system):
+        """Test that retrieval, template matching and speculative reads overlap."""
+        import threading
+        mock_provider = MagicMock()
+        mock_provider.send_message.return_value = "Response"
+        mock_provider.extract_tool_calls.return_value = {
+            "content": "Response",
+            "tool_calls": [],
+            "awaiting_tool_response": False
+        }
+        # Each stage waits for the others; run one after another they would time out
+        barrier = threading.Barrier(2, timeout=5)
+        reached = []
+
+        def retrieve(context_input):
+            barrier.wait()
+            reached.append("retrieval")
+            return MagicMock(matches=[("file1.py", "metadata1")])
+
+        def match_templates(query, memory_system):
+            barrier.wait()
+            reached.append("template_match")
+            return []
+
+        mock_memory_system.get_relevant_context_for.side_effect = retrieve
+        mock_task_system.find_matching_tasks.side_effect = match_templates
+
+        handler = PassthroughHandler(mock_task_system, mock_memory_system, mock_provider)
+        handler.file_manager = MagicMock()
+        handler.file_manager.read_file.return_value = "one = 1"
+
+        result = handler.handle_query("first query")
+
+        assert sorted(reached) == ["retrieval", "template_match"]
+        timings = result["metadata"]["stage_timings"]
+        assert {"retrieval", "template_match", "respond"} <= set(timings)
+        assert timings["critical_path"][-1] == "respond"
+
+        # The follow-up reads the previous files alongside retrieval and reuses them
+        barrier = threading.Barrier(1)
+        handler.file_manager.read_file.reset_mock()
+        result = handler.handle_query("second query")
+
+        assert "speculative_read" in result["metadata"]["stage_timings"]
+        handler.file_manager.read_file.assert_called_once_with("file1.py")
+
+    def test_handle_query_streams_to_callback(self, mock_task_system, mock_memory_system):
+        """Test that response text is forwarded incrementally when streaming."""
+        from tests.handler.test_model_provider import FakeStreamingProvider
+
+        handler = PassthroughHandler(mock_task_system, mock_memory_system,
+                                     FakeStreamingProvider(["The answer ", "is 42"]))
+        deltas = []
+
+        result = handler.handle_query("question", stream_callback=deltas.append)
+
+        assert deltas == ["The answer ", "is 42"]
+        assert result["content"] == "The answer is 42"
+        assert handler.conversation_history[-1]["content"] == "The answer is 42"
@@ -0,0 +1,262 @@
+"""Tests for rate limiting and retry with backoff."""
+import asyncio
+import random
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from handler.rate_limiting import (
+    TokenBucket, RateLimiter, RetryPolicy, get_retry_after, is_retryable_error, get_rate_limiter,
+    DEFAULT_MAX_CONCURRENT_REQUESTS
+)
+from handler.model_provider import ClaudeProvider
+
+
+class FakeAPIError(Exception):
+    """API error carrying a status code and response headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = MagicMock(headers=headers or {})
+
+
+class FakeClock:
+    """Manually advanced clock whose sleep advances time."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket and RateLimiter."""
+
+    def test_bucket_allows_burst_then_waits(self):
+        """Test that the bucket admits its capacity, then paces requests."""
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock)
+
+        waits = [bucket.reserve(1) for _ in range(61)]
+
+        assert waits[:60] == [0.0] * 60
+        assert waits[60] == pytest.approx(1.0)
+
+    def test_rate_limiter_enforces_tokens_per_minute(self):
+        """Test that the token limit throttles large requests."""
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+
+        assert limiter.acquire(800) == 0.0
+        # 600 more tokens need 400 tokens of refill (24s at 1000/min)
+        assert limiter.acquire(600) == pytest.approx(24.0)
+        assert clock.sleeps == [pytest.approx(24.0)]
+
+    def test_unlimited_by_default(self):
+        """Test that a limiter without limits never waits."""
+        limiter = RateLimiter(sleep=MagicMock())
+        assert limiter.acquire(10**6) == 0.0
+        limiter.sleep.assert_not_called()
+
+    def test_in_flight_slots(self):
+        """Test that max_concurrent bounds requests holding a slot at once."""
+        limiter = RateLimiter(max_concurrent=2)
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+        release = threading.Event()
+
+        def request():
+            with limiter.slot():
+                with lock:
+                    in_flight.append(1)
+                    peak.append(len(in_flight))
+                release.wait(timeout=5)
+                with lock:
+                    in_flight.pop()
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # Let the requests pile up on the slots before releasing them
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert max(peak) <= 2
+        assert len(peak) == 5
+
+    def test_cancelled_async_slot_wait_releases_slot(self):
+        """Test that cancelling a task waiting for a slot does not leak the slot."""
+        limiter = RateLimiter(max_concurrent=1)
+
+        async def scenario():
+            async def waiter():
+                async with limiter.async_slot():
+                    pass
+
+            with limiter.slot():
+                task = asyncio.create_task(waiter())
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            # The abandoned wait acquires the freed slot and hands it back
+            await asyncio.sleep(0.2)
+            return await asyncio.to_thread(limiter._slots.acquire, timeout=2)
+
+        assert asyncio.run(scenario())
+
+    def test_shared_per_key(self):
+        """Test that providers sharing an API key share one limiter."""
+        assert get_rate_limiter("shared-key") is get_rate_limiter("shared-key")
+        assert ClaudeProvider(api_key="shared-key").rate_limiter is ClaudeProvider(api_key="shared-key").rate_limiter
+
+    def test_default_in_flight_limit(self, monkeypatch):
+        """Test that requests in flight are bounded per key unless disabled."""
+        monkeypatch.delenv("ANTHROPIC_MAX_CONCURRENT_REQUESTS", raising=False)
+        assert get_rate_limiter("default-limit-key").max_concurrent == DEFAULT_MAX_CONCURRENT_REQUESTS
+
+        monkeypatch.setenv("ANTHROPIC_MAX_CONCURRENT_REQUESTS", "0")
+        assert get_rate_limiter("unlimited-key").max_concurrent is None
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy."""
+
+    def test_retries_transient_errors_with_backoff(self):
+        """Test exponential backoff with jitter for retryable errors."""
+        sleeps = []
+        policy = RetryPolicy(max_retries=3, base_delay=1.0, sleep=sleeps.append, rng=random.Random(0))
+        func = MagicMock(side_effect=[FakeAPIError(529), FakeAPIError(500), "ok"])
+
+        assert policy.call(func) == "ok"
+        assert func.call_count == 3
+        assert len(sleeps) == 2
+        assert 0 <= sleeps[0] <= 1.0
+        assert 0 <= sleeps[1] <= 2.0
+
+    def test_honors_retry_after(self):
+        """Test that the server-requested delay is used."""
+        sleeps = []
+        policy = RetryPolicy(sleep=sleeps.append)
+        func = MagicMock(side_effect=[FakeAPIError(429, {"retry-after": "7"}), "ok"])
+
+        assert policy.call(func) == "ok"
+        assert sleeps == [7.0]
+
+    def test_gives_up_after_max_retries(self):
+        """Test that the last error is raised once retries are exhausted."""
+        policy = RetryPolicy(max_retries=2, sleep=lambda s: None)
+        func = MagicMock(side_effect=FakeAPIError(429))
+
+        with pytest.raises(FakeAPIError):
+            policy.call(func)
+        assert func.call_count == 3
+
+    def test_does_not_retry_client_errors(self):
+        """Test that non-transient errors fail immediately."""
+        policy = RetryPolicy(sleep=lambda s: None)
+        func = MagicMock(side_effect=FakeAPIError(400))
+
+        with pytest.raises(FakeAPIError):
+            policy.call(func)
+        assert func.call_count == 1
+
+    def test_malformed_retry_after_still_retries(self):
+        """Test that a garbage retry-after header falls back to backoff."""
+        sleeps = []
+        policy = RetryPolicy(max_retries=2, sleep=sleeps.append)
+        func = MagicMock(side_effect=[FakeAPIError(529, {"retry-after": "Wed, 99 Foo"}), "ok"])
+
+        assert policy.call(func) == "ok"
+        assert func.call_count == 2
+        assert len(sleeps) == 1
+
+    def test_retry_after_parsing(self):
+        """Test parsing retry-after headers."""
+        assert get_retry_after(FakeAPIError(429, {"retry-after-ms": "1500"})) == 1.5
+        assert get_retry_after(FakeAPIError(429, {"retry-after": "3"})) == 3.0
+        assert get_retry_after(FakeAPIError(429)) is None
+        assert get_retry_after(ValueError("no response")) is None
+        assert get_retry_after(FakeAPIError(429, {"retry-after": "soon-ish"})) is None
+        assert is_retryable_error(FakeAPIError(529))
+        assert not is_retryable_error(ValueError("bug"))
+
+
+class TestClaudeProviderRetry:
+    """Tests for retry and rate limiting in ClaudeProvider."""
+
+    def test_send_message_retries_then_succeeds(self):
+        """Test that a transient 429 no longer becomes an error string."""
+        limiter = RateLimiter(sleep=lambda s: None)
+        limiter.acquire = MagicMock(wraps=limiter.acquire)
+        provider = ClaudeProvider(api_key="test_key", retry_policy=RetryPolicy(sleep=lambda s: None),
+                                  rate_limiter=limiter)
+        provider.client = MagicMock()
+        provider.client.messages.create.side_effect = [
+            FakeAPIError(429, {"retry-after": "0"}),
+            MagicMock(content=[MagicMock(text="Recovered")], tool_calls=None)
+        ]
+
+        result = provider.send_message([{"role": "user", "content": "hi"}])
+
+        assert result == "Recovered"
+        # Each attempt is counted against the shared limits
+        assert limiter.acquire.call_count == 2
+
+    def test_send_message_reports_error_after_final_failure(self):
+        """Test that exhausted retries keep the existing error reporting."""
+        provider = ClaudeProvider(api_key="test_key", retry_policy=RetryPolicy(max_retries=1, sleep=lambda s: None))
+        provider.client = MagicMock()
+        provider.client.messages.create.side_effect = FakeAPIError(529)
+
+        result = provider.send_message([{"role": "user", "content": "hi"}])
+
+        assert result.startswith("Error calling Claude API:")
+        assert provider.client.messages.create.call_count == 2
+
+    def test_stream_retries_only_before_first_event(self):
+        """Test that a stream is reopened on a transient error until it has yielded text."""
+        provider = ClaudeProvider(api_key="test_key", retry_policy=RetryPolicy(sleep=lambda s: None),
+                                  rate_limiter=RateLimiter(sleep=lambda s: None))
+        provider.client = MagicMock()
+
+        def failing_text(fail_after):
+            yield from fail_after
+            raise FakeAPIError(529)
+
+        def stream(text_stream):
+            opened = MagicMock(text_stream=text_stream)
+            opened.get_final_message.return_value = MagicMock(
+                content=[], stop_reason="end_turn", usage=MagicMock(input_tokens=12, output_tokens=3))
+            context = MagicMock()
+            context.__enter__.return_value = opened
+            return context
+
+        provider.client.messages.stream.side_effect = [
+            FakeAPIError(429), stream(failing_text([])), stream(iter(["Recovered"]))]
+        with patch.object(ClaudeProvider, "_record_usage") as record_usage:
+            events = list(provider.stream_message([{"role": "user", "content": "hi"}]))
+
+        assert events == [{"type": "text", "text": "Recovered"}, {"type": "stop", "stop_reason": "end_turn"}]
+        assert provider.client.messages.stream.call_count == 3
+        assert record_usage.call_count == 1
+        assert record_usage.call_args[0][1].usage.input_tokens == 12
+
+        # Once text has been yielded, a failure is reported instead of retried
+        provider.client.messages.stream.side_effect = [stream(failing_text(["Partial"])), stream(iter(["Again"]))]
+        events = list(provider.stream_message([{"role": "user", "content": "hi"}]))
+
+        assert events[0] == {"type": "text", "text": "Partial"}
+        assert events[1]["text"].startswith("Error calling Claude API:")
+        assert len(events) == 2
@@ -0,0 +1,173 @@
+"""Tests for singleflight coalescing of model requests."""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from handler.request_coalescing import SingleFlight, request_fingerprint
+from handler.model_provider import ClaudeProvider
+
+
+def run_concurrently(func, count):
+    """Run func in count threads started together, returning their results."""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """Tests for the SingleFlight class."""
+
+    def test_identical_calls_share_one_execution(self):
+        """Test that concurrent duplicates run the function once."""
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+
+        results = run_concurrently(lambda: flight.do("key", slow), 5)
+
+        assert len(calls) == 1
+        assert [r[0] for r in results] == ["result"] * 5
+        assert sorted(r[1] for r in results) == [False, True, True, True, True]
+        assert flight.in_flight() == 0
+
+    def test_errors_propagate_to_all_callers(self):
+        """Test that every waiter receives the upstream exception."""
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("upstream failed")
+
+        results = run_concurrently(lambda: flight.do("key", failing), 3)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # The failure is not cached: the next call runs again
+        assert flight.do("key", lambda: "fresh") == ("fresh", False)
+
+    def test_async_calls_coalesce(self):
+        """Test coalescing on an event loop."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run_all():
+            return await asyncio.gather(*[flight.async_do("key", slow) for _ in range(4)])
+
+        results = asyncio.run(run_all())
+
+        assert len(calls) == 1
+        assert [r[0] for r in results] == ["result"] * 4
+
+    def test_cancelled_async_leader_promotes_a_waiter(self):
+        """Test that cancelling the caller running a call does not cancel its waiters."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            leader = asyncio.ensure_future(flight.async_do("key", slow))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(flight.async_do("key", slow)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*waiters)
+
+        results = asyncio.run(scenario())
+
+        # One waiter re-ran the call and the others shared its result
+        assert len(calls) == 2
+        assert [r[0] for r in results] == ["result"] * 3
+        assert sorted(r[1] for r in results) == [False, True, True]
+        assert flight.in_flight() == 0
+
+    def test_fingerprint_is_canonical(self):
+        """Test that fingerprints ignore key order but not content."""
+        a = request_fingerprint({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0})
+        b = request_fingerprint({"temperature": 0, "messages": [{"content": "hi", "role": "user"}], "model": "m"})
+        c = request_fingerprint({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 1})
+
+        assert a == b
+        assert a != c
+
+
+class TestClaudeProviderCoalescing:
+    """Tests for coalescing in ClaudeProvider.send_message."""
+
+    def test_duplicate_requests_share_upstream_call(self):
+        """Test that handlers sending the same prompt concurrently pay once."""
+        client = MagicMock()
+
+        def create(**params):
+            time.sleep(0.1)
+            return MagicMock(content=[MagicMock(text="shared answer")], tool_calls=None)
+
+        client.messages.create.side_effect = create
+        providers = [ClaudeProvider(api_key="test_key") for _ in range(4)]
+        for provider in providers:
+            provider.client = client
+
+        messages = [{"role": "user", "content": "match files"}]
+        results = run_concurrently(lambda: providers[threading.get_ident() % 4].send_message(messages, "system"), 4)
+
+        assert results == ["shared answer"] * 4
+        assert client.messages.create.call_count == 1
+
+    def test_usage_recorded_once_per_upstream_call(self):
+        """Test that coalesced waiters do not record the leader's usage again."""
+        client = MagicMock()
+
+        def create(**params):
+            time.sleep(0.1)
+            return MagicMock(content=[MagicMock(text="shared answer")], tool_calls=None,
+                             usage=MagicMock(input_tokens=100, output_tokens=10))
+
+        client.messages.create.side_effect = create
+        provider = ClaudeProvider(api_key="test_key")
+        provider.client = client
+
+        with patch.object(ClaudeProvider, "_record_usage") as record_usage:
+            run_concurrently(lambda: provider.send_message([{"role": "user", "content": "count once"}]), 4)
+
+        assert client.messages.create.call_count == 1
+        assert record_usage.call_count == 1
+
+    def test_coalescing_can_be_disabled(self):
+        """Test that coalesce_requests=False sends every request."""
+        client = MagicMock()
+        client.messages.create.side_effect = lambda **params: (
+            time.sleep(0.05) or MagicMock(content=[MagicMock(text="answer")], tool_calls=None))
+        provider = ClaudeProvider(api_key="test_key", coalesce_requests=False)
+        provider.client = client
+
+        run_concurrently(lambda: provider.send_message([{"role": "user", "content": "q"}]), 3)
+
+        assert client.messages.create.call_count == 3
@@ -0,0 +1,178 @@
+"""Tests for the persistent response cache."""
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from handler.model_provider import ProviderAdapter
+from handler.response_cache import CachingProvider, ResponseCacheMiss, wrap_with_response_cache
+
+
+def make_provider(response="Response"):
+    """Create a mock provider returning a fixed response."""
+    provider = MagicMock(spec=ProviderAdapter)
+    provider.model = "test-model"
+    provider.send_message.return_value = response
+    return provider
+
+
+MESSAGES = [{"role": "user", "content": "Find relevant files"}]
+
+
+class TestCachingProvider:
+    """Tests for the CachingProvider class."""
+
+    def test_read_write_serves_repeated_requests(self, tmp_path):
+        """Test that an identical request is served from the cache."""
+        provider = make_provider()
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+
+        assert cache.send_message(MESSAGES, "system") == "Response"
+        assert cache.send_message(MESSAGES, "system") == "Response"
+        cache.send_message(MESSAGES, "other system")
+
+        assert provider.send_message.call_count == 2
+        assert cache.stats["hits"] == 1
+
+    def test_cache_persists_across_instances(self, tmp_path):
+        """Test that a new process (instance) reuses recorded responses."""
+        CachingProvider(make_provider({"text": "t", "tool_calls": []}), cache_dir=str(tmp_path)).send_message(MESSAGES)
+
+        provider = make_provider()
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+
+        assert cache.send_message(MESSAGES) == {"text": "t", "tool_calls": []}
+        provider.send_message.assert_not_called()
+
+    def test_record_and_replay(self, tmp_path):
+        """Test recording responses and replaying them offline."""
+        recorder = CachingProvider(make_provider("Recorded"), cache_dir=str(tmp_path), mode="record")
+        recorder.send_message(MESSAGES)
+
+        offline = make_provider()
+        replay = CachingProvider(offline, cache_dir=str(tmp_path), mode="replay")
+
+        assert replay.send_message(MESSAGES) == "Recorded"
+        with pytest.raises(ResponseCacheMiss):
+            replay.send_message([{"role": "user", "content": "never recorded"}])
+        offline.send_message.assert_not_called()
+
+    def test_errors_are_not_cached(self, tmp_path):
+        """Test that provider error strings are not stored."""
+        provider = make_provider("Error calling Claude API: overloaded")
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+
+        cache.send_message(MESSAGES)
+        cache.send_message(MESSAGES)
+
+        assert provider.send_message.call_count == 2
+        assert os.listdir(tmp_path) == []
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used entries are evicted past the size cap."""
+        cache = CachingProvider(make_provider("x" * 100), cache_dir=str(tmp_path), max_bytes=300)
+        queries = [[{"role": "user", "content": f"query {i}"}] for i in range(3)]
+
+        cache.send_message(queries[0])
+        cache.send_message(queries[1])
+        # Touch query 0 so query 1 becomes least recently used
+        past = time.time() - 10
+        os.utime(os.path.join(tmp_path, f"{cache.cache_key(queries[1])}.json"), (past, past))
+        cache.send_message(queries[0])
+        cache.send_message(queries[2])
+
+        cached = set(name[:-5] for name in os.listdir(tmp_path))
+        assert cache.cache_key(queries[0]) in cached
+        assert cache.cache_key(queries[1]) not in cached
+        assert cache.cache_key(queries[2]) in cached
+        assert cache.stats["evictions"] == 1
+
+    def test_wrap_with_response_cache(self, tmp_path, monkeypatch):
+        """Test enabling the cache from config or the environment."""
+        provider = make_provider()
+        monkeypatch.delenv("LLM_RESPONSE_CACHE_MODE", raising=False)
+
+        assert wrap_with_response_cache(provider) is provider
+        wrapped = wrap_with_response_cache(provider, {"mode": "replay", "cache_dir": str(tmp_path)})
+        assert isinstance(wrapped, CachingProvider)
+        assert wrapped.model == "test-model"
+
+        monkeypatch.setenv("LLM_RESPONSE_CACHE_MODE", "read_write")
+        monkeypatch.setenv("LLM_RESPONSE_CACHE_DIR", str(tmp_path))
+        assert wrap_with_response_cache(provider).mode == "read_write"
+
+    def test_send_batch_forwards_only_misses(self, tmp_path):
+        """Test that batches are served from the cache where possible."""
+        provider = make_provider("single")
+        provider.send_batch.side_effect = lambda requests, max_workers=None: [
+            f"batch:{r['messages'][0]['content']}" for r in requests
+        ]
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+        cache.send_message([{"role": "user", "content": "a"}])
+
+        responses = cache.send_batch([
+            {"messages": [{"role": "user", "content": "a"}]},
+            {"messages": [{"role": "user", "content": "b"}]}
+        ])
+
+        assert responses == ["single", "batch:b"]
+        assert len(provider.send_batch.call_args.args[0]) == 1
+        assert cache.send_message([{"role": "user", "content": "b"}]) == "batch:b"
+
+        # Sampling parameters are part of the key, as they are for send_message
+        cache.send_message([{"role": "user", "content": "c"}], temperature=0.9, max_tokens=100)
+        responses = cache.send_batch([
+            {"messages": [{"role": "user", "content": "c"}]},
+            {"messages": [{"role": "user", "content": "c"}], "temperature": 0.9, "max_tokens": 100}
+        ])
+        assert responses == ["batch:c", "single"]
+
+    def test_async_send_message_uses_the_cache(self, tmp_path):
+        """Test that async requests are served from the cache and misses go to the async path."""
+        provider = make_provider()
+        provider.async_send_message = AsyncMock(return_value="Async response")
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+
+        async def send_twice():
+            return [await cache.async_send_message(MESSAGES, "system", temperature=0.5) for _ in range(2)]
+
+        assert asyncio.run(send_twice()) == ["Async response"] * 2
+        assert provider.async_send_message.await_count == 1
+        provider.send_message.assert_not_called()
+        assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+        # Shared with the sync path
+        assert cache.send_message(MESSAGES, "system", temperature=0.5) == "Async response"
+
+        replay = CachingProvider(provider, cache_dir=str(tmp_path), mode="replay")
+        with pytest.raises(ResponseCacheMiss):
+            asyncio.run(replay.async_send_message(MESSAGES, "unrecorded"))
+
+    def test_write_errors_do_not_lose_the_response(self, tmp_path, monkeypatch):
+        """Test that a failing cache write still returns the provider's response."""
+        provider = make_provider()
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+
+        def failing_open(*args, **kwargs):
+            raise OSError(28, "No space left on device")
+
+        monkeypatch.setattr("builtins.open", failing_open)
+        assert cache.send_message(MESSAGES, "system") == "Response"
+        assert os.listdir(tmp_path) == []
+
+    def test_stream_forwards_misses_and_replays_hits(self, tmp_path):
+        """Test that streaming stays incremental on misses and is cached as text."""
+        provider = make_provider()
+        provider.stream_message.return_value = iter([{"type": "text", "text": "Hel"},
+                                                     {"type": "text", "text": "lo"}])
+        provider.extract_tool_calls.side_effect = lambda response: {"content": response, "tool_calls": []}
+        cache = CachingProvider(provider, cache_dir=str(tmp_path))
+
+        first = list(cache.stream_message(MESSAGES, "system", model="m"))
+        second = list(cache.stream_message(MESSAGES, "system", model="m"))
+
+        assert first == [{"type": "text", "text": "Hel"}, {"type": "text", "text": "lo"}]
+        assert second == [{"type": "text", "text": "Hello"}]
+        provider.stream_message.assert_called_once_with(MESSAGES, "system", None, model="m")
+        assert cache.send_message(MESSAGES, "system", model="m") == "Hello"
+        provider.send_message.assert_not_called()
@@ -0,0 +1,147 @@
+"""Tests for token-budgeted context packing."""
+import pytest
+from unittest.mock import MagicMock
+
+from handler.base_handler import BaseHandler
+from handler.model_provider import ProviderAdapter
+from memory.context_packing import PackedContext, get_context_token_budget, pack_context
+
+
+def make_reader(contents):
+    """Create a read_files callable backed by a dictionary."""
+    def read_files(paths):
+        return [contents.get(path) for path in paths]
+    return read_files
+
+
+class StubHandler(BaseHandler):
+    """Handler reading files from a dictionary and recording the file context it is given."""
+
+    def __init__(self, contents):
+        super().__init__(MagicMock(), MagicMock(), model_provider=MagicMock(spec=ProviderAdapter))
+        self.read_files = make_reader(contents)
+        self.file_contexts = []
+
+    def _read_files(self, file_paths, prefetched=None):
+        return self.read_files(file_paths)
+
+    def execute_prompt(self, prompt, system_prompt=None, file_context=None):
+        self.file_contexts.append(file_context)
+        return {"status": "COMPLETE", "content": "done", "notes": {}}
+
+
+class TestPackContext:
+    """Tests for the pack_context function."""
+
+    def test_everything_fits(self):
+        """Test that all files are included when the budget allows it."""
+        contents = {"a.py": "print('a')", "b.py": "print('b')"}
+
+        packed = pack_context([("a.py", "meta a"), ("b.py", "meta b")], 1000, make_reader(contents), token_ratio=0.25)
+
+        assert isinstance(packed, PackedContext)
+        assert packed.included == ["a.py", "b.py"]
+        assert packed.summarized == []
+        assert packed.dropped == []
+        assert "print('a')" in packed.text
+        assert packed.text.index("File: a.py") < packed.text.index("File: b.py")
+        assert 0 < packed.tokens_used <= 1000
+
+    def test_degrades_to_summary_and_drops(self):
+        """Test that files over budget become summaries or are dropped."""
+        contents = {
+            "small.py": "x = 1",
+            "big.py": "y = 2\n" * 400,
+            "huge.py": "z = 3\n" * 400
+        }
+        global_index = {"big.py": "Python file defining y"}
+
+        packed = pack_context(["small.py", "big.py", "huge.py"], 100, make_reader(contents), global_index, token_ratio=0.25)
+
+        assert packed.included == ["small.py"]
+        assert packed.summarized == ["big.py"]
+        assert packed.dropped == ["huge.py"]
+        assert "Python file defining y" in packed.text
+        assert "y = 2" not in packed.text
+        assert "Files omitted to fit the context budget: huge.py" in packed.text
+        assert packed.tokens_used <= 100
+
+    def test_prefers_score_per_token(self):
+        """Test that a small relevant file beats a large one of similar score."""
+        contents = {"large.py": "a" * 360, "small.py": "b" * 40}
+
+        packed = pack_context([("large.py", "m", 1.0), ("small.py", "m", 0.9)], 100, make_reader(contents), token_ratio=0.25)
+
+        assert packed.included == ["small.py"]
+        assert packed.dropped == ["large.py"]
+
+    def test_unreadable_and_oversized_files_use_summary(self):
+        """Test that unreadable files fall back to their index metadata."""
+        contents = {"gone.py": None, "large.bin": "File too large: large.bin (200000 bytes)"}
+        global_index = {"gone.py": "Summary of gone", "large.bin": "Summary of large"}
+
+        packed = pack_context(["gone.py", "large.bin"], 1000, make_reader(contents), global_index, token_ratio=0.25)
+
+        assert packed.summarized == ["gone.py", "large.bin"]
+        assert "File too large" not in packed.text
+
+    def test_to_notes(self):
+        """Test the notes reported for a packed context."""
+        packed = pack_context(["a.py"], 0, make_reader({"a.py": "content"}), token_ratio=0.25)
+
+        notes = packed.to_notes()
+        assert notes["dropped"] == ["a.py"]
+        assert notes["token_budget"] == 0
+        assert notes["tokens_used"] == 0
+
+    def test_versions_hash_raw_content_before_excerpting(self):
+        """Test that query-specific excerpts do not change a file's version."""
+        contents = {"big.py": "def a():\n    pass\n" * 50}
+        first = pack_context(["big.py"], 1000, make_reader(contents), token_ratio=0.25,
+                             excerpt=lambda path, content: "excerpt for query one")
+        second = pack_context(["big.py"], 1000, make_reader(contents), token_ratio=0.25,
+                              sent_versions=first.versions,
+                              excerpt=lambda path, content: "excerpt for query two")
+
+        assert "excerpt for query one" in first.text
+        assert contents["big.py"] not in first.text
+        assert second.unchanged == ["big.py"]
+
+    def test_get_context_token_budget(self):
+        """Test reading the budget from model configuration."""
+        assert get_context_token_budget({"preferred": "claude", "context_token_budget": 2000}) == 2000
+        assert get_context_token_budget("claude-3") is None
+        assert get_context_token_budget({}, 500) == 500
+
+
+class TestTaskSystemContextPacking:
+    """Tests for context packing in TaskSystem.execute_task."""
+
+    def test_execute_task_reports_packing(self):
+        """Test that execute_task packs file contents and reports the decisions."""
+        from task_system.task_system import TaskSystem
+
+        task_system = TaskSystem()
+        task_system.register_template({
+            "name": "packed_task",
+            "type": "atomic",
+            "subtype": "packed",
+            "description": "Summarize the code",
+            "model": {"preferred": "claude-3-5-sonnet", "context_token_budget": 50},
+            "parameters": {}
+        })
+
+        memory_system = MagicMock()
+        memory_system.get_relevant_context_for.return_value = MagicMock(
+            matches=[("keep.py", "relevant"), ("drop.py", "less relevant")]
+        )
+        memory_system.get_global_index.return_value = {}
+
+        handler = StubHandler({"keep.py": "x = 1", "drop.py": "y = 2\n" * 200})
+
+        result = task_system.execute_task("atomic", "packed", {}, memory_system=memory_system, handler=handler)
+
+        file_context = handler.file_contexts[-1]
+        assert "x = 1" in file_context
+        assert result["notes"]["context_packing"]["included"] == ["keep.py"]
+        assert result["notes"]["context_packing"]["dropped"] == ["drop.py"]
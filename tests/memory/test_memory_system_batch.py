@@ -0,0 +1,97 @@
+"""Tests for batch context generation through the Memory System."""
+import json
+import pytest
+from unittest.mock import MagicMock
+
+from handler.model_provider import ProviderAdapter
+from memory.context_generation import ContextGenerationInput
+from memory.memory_system import MemorySystem
+from task_system.task_system import TaskSystem
+
+
+class ScriptedBatchProvider(ProviderAdapter):
+    """Provider answering batch requests, by position, with scripted file paths."""
+
+    def __init__(self):
+        self.responses = []
+        self.batches = []
+
+    def send_message(self, messages, system_prompt="", tools=None):
+        raise AssertionError("bulk context generation should use send_batch")
+
+    def send_batch(self, requests, max_workers=None):
+        self.batches.append(len(requests))
+        return [json.dumps([{"path": path, "relevance": "match", "score": 0.9} for path in paths])
+                for paths in self.responses[:len(requests)]]
+
+    def extract_tool_calls(self, response):
+        return {"content": response, "tool_calls": [], "awaiting_tool_response": False}
+
+
+@pytest.fixture
+def memory_system():
+    """Create a MemorySystem wired to a TaskSystem and a batch-capable provider."""
+    handler = MagicMock()
+    handler.model_provider = ScriptedBatchProvider()
+    task_system = TaskSystem()
+    memory_system = MemorySystem(handler=handler, task_system=task_system)
+    task_system.memory_system = memory_system
+    memory_system.update_global_index({
+        "/repo/auth.py": "authentication login",
+        "/repo/db.py": "database models",
+        "/repo/api.py": "http routes for login"
+    })
+    return memory_system
+
+
+class TestBatchContextGeneration:
+    """Tests for MemorySystem.get_relevant_context_batch."""
+
+    def test_results_map_back_to_inputs(self, memory_system):
+        """Test that one batch serves every input, in input order."""
+        provider = memory_system.handler.model_provider
+        provider.responses = [["/repo/auth.py", "api.py"], ["/repo/db.py"], []]
+
+        results = memory_system.get_relevant_context_batch([
+            {"taskText": "login"},
+            ContextGenerationInput(template_description="database"),
+            {"taskText": "unrelated"}
+        ])
+
+        assert provider.batches == [3]
+        assert [m[0] for m in results[0].matches] == ["/repo/auth.py", "/repo/api.py"]
+        assert [m[0] for m in results[1].matches] == ["/repo/db.py"]
+        assert results[2].matches == []
+
+    def test_fresh_context_disabled_skips_the_batch(self, memory_system):
+        """Test that inputs not needing fresh context are not submitted."""
+        results = memory_system.get_relevant_context_batch([
+            ContextGenerationInput(template_description="login", fresh_context="disabled",
+                                   inherited_context="inherited")
+        ])
+
+        assert results[0].context == "inherited"
+        assert memory_system.handler.model_provider.batches == []
+
+    def test_sharded_results_are_merged(self, memory_system):
+        """Test that per-shard requests are merged per input."""
+        memory_system.configure_sharding(token_size_per_shard=3, max_shards=4)
+        memory_system.enable_sharding(True)
+        shard_count = len([s for s in memory_system._sharded_index if s])
+        assert shard_count > 1
+
+        provider = memory_system.handler.model_provider
+        # Both inputs match in every shard; duplicates across shards collapse
+        provider.responses = [["/repo/auth.py", "/repo/api.py"]] * shard_count + [["/repo/db.py"]] * shard_count
+
+        results = memory_system.get_relevant_context_batch([{"taskText": "login"}, {"taskText": "database"}])
+
+        assert provider.batches == [2 * shard_count]
+        assert [m[0] for m in results[0].matches] == ["/repo/auth.py", "/repo/api.py"]
+        assert [m[0] for m in results[1].matches] == ["/repo/db.py"]
+
+    def test_without_task_system(self):
+        """Test the error result when no TaskSystem is available."""
+        results = MemorySystem().get_relevant_context_batch([{"taskText": "login"}])
+        assert results[0].matches == []
+        assert "TaskSystem not available" in results[0].context
@@ -0,0 +1,101 @@
+"""Tests for local token counting."""
+import pytest
+from unittest.mock import MagicMock
+
+from memory.token_counting import (
+    ApproximateTokenCounter, RatioTokenCounter, UsageCalibration, get_token_counter, default_token_counter
+)
+from handler.model_provider import ClaudeProvider
+
+# Synthetic usage: request texts paired with made-up input token counts, in
+# the shape ClaudeProvider records them. They were not captured from the API,
+# so tests using them check how UsageCalibration scales estimates, not how
+# accurate the counter is against real tokenization.
+SYNTHETIC_USAGE = [
+    ("You are a helpful assistant.\nWhat does the memory system do?", 21),
+    ("def get_relevant_files(self, query):\n    return self.memory_system.get_relevant_context_for(query)\n", 27),
+    ("Summarize the following change:\n" + "Refactor the parser for better error messages. " * 20, 179),
+    ("class TaskSystem:\n    def execute_task(self, task_type, task_subtype, inputs):\n        pass\n" * 10, 270),
+    ("Find relevant files for 'context packing' (max: 20)\n--- File: /repo/memory.py ---\nmemory system\n", 36),
+]
+
+
+class TestApproximateTokenCounter:
+    """Tests for the ApproximateTokenCounter class."""
+
+    def test_counts_words_punctuation_and_scripts(self):
+        """Test the piece-based approximation on simple inputs."""
+        counter = ApproximateTokenCounter()
+
+        assert counter.count("") == 0
+        assert counter.count("hello world") == 2
+        assert counter.count("Hello, world!") == 4
+        # Non-Latin text takes far more tokens than a character ratio suggests
+        assert counter.count("你好世界") == 4
+        assert RatioTokenCounter(0.25).count("你好世界") == 1
+
+    def test_memoizes_long_texts_by_content(self):
+        """Test that repeated long texts are counted once."""
+        counter = ApproximateTokenCounter()
+        text = "def handler(query):\n    return query\n" * 50
+
+        first = counter.count(text)
+        second = counter.count("".join(list(text)))  # Equal content, different object
+
+        assert first == second
+        assert counter.stats == {"hits": 1, "misses": 1}
+
+    def test_calibration_scales_toward_reported_counts(self):
+        """Test that reported counts rescale the local estimate (synthetic data, not a calibration check)."""
+        calibration = UsageCalibration()
+        counter = ApproximateTokenCounter(calibration)
+
+        def mean_error():
+            return sum(abs(counter.count(text) - reported) / reported
+                       for text, reported in SYNTHETIC_USAGE) / len(SYNTHETIC_USAGE)
+
+        uncalibrated_error = mean_error()
+        for text, reported in SYNTHETIC_USAGE:
+            calibration.record(counter.count_raw(text), reported)
+
+        assert calibration.sample_count == len(SYNTHETIC_USAGE)
+        assert mean_error() < uncalibrated_error
+        # Totals match once calibrated
+        total = sum(counter.count(text) for text, _ in SYNTHETIC_USAGE)
+        assert total == pytest.approx(sum(reported for _, reported in SYNTHETIC_USAGE), rel=0.02)
+
+    def test_get_token_counter(self):
+        """Test choosing the counter from configuration."""
+        assert get_token_counter() is default_token_counter
+        assert get_token_counter({}) is default_token_counter
+        ratio_counter = get_token_counter({"token_estimation_ratio": 0.5})
+        assert isinstance(ratio_counter, RatioTokenCounter)
+        assert ratio_counter.count("abcd") == 2
+
+    def test_provider_records_reported_usage(self, monkeypatch):
+        """Test that ClaudeProvider feeds reported input tokens to the calibration."""
+        calibration = UsageCalibration()
+        monkeypatch.setattr("handler.model_provider.default_calibration", calibration)
+        provider = ClaudeProvider(api_key="test_key", coalesce_requests=False)
+        provider.client = MagicMock()
+        provider.client.messages.create.return_value = MagicMock(
+            content=[MagicMock(text="Answer")], tool_calls=None, usage=MagicMock(input_tokens=42))
+
+        provider.send_message([{"role": "user", "content": "What does the memory system do?"}], "system")
+
+        assert calibration.sample_count == 1
+        assert calibration.scale > 1
+
+    def test_calibration_samples_count_blocks_and_skip_tools(self):
+        """Test which requests are used as calibration samples and the text counted for them."""
+        blocks = [{"role": "user", "content": [{"type": "text", "text": "Run it"}]},
+                  {"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "run",
+                                                     "input": {"cmd": "ls"}}]},
+                  {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "a.py"}]}]
+
+        assert ClaudeProvider._calibration_text({"system": "sys", "messages": blocks}) == (
+            'sysRun itrun{"cmd": "ls"}a.py')
+        assert ClaudeProvider._calibration_text(
+            {"system": "sys", "messages": blocks, "tools": [{"name": "run"}]}) is None
+        image = {"role": "user", "content": [{"type": "image", "source": {}}]}
+        assert ClaudeProvider._calibration_text({"system": "", "messages": [image]}) is None
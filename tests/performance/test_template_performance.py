@@ -0,0 +1,54 @@
+"""Micro-benchmark for compiled template processing."""
+import time
+
+from task_system.template_processor import TemplateProcessor
+from task_system.template_utils import Environment
+
+
+class StaticTaskSystem:
+    """Task system stand-in with a constant-time function call."""
+
+    def executeCall(self, call, env):
+        return {"status": "COMPLETE", "content": "result"}
+
+
+TEMPLATE = {
+    "name": "benchmark",
+    "type": "atomic",
+    "subtype": "benchmark",
+    "description": "Review {{file.path}} for {{user.name}} ({{user.role}})",
+    "system_prompt": "You are reviewing {{file.path}}.\n" + "Follow the project guidelines. " * 40 +
+                     "Summary: {{summarize(file.path, style='short')}}\nDepth: {{depth}}",
+    "taskPrompt": "Check {{file.path}} at depth {{depth}} and report {{format_report('markdown')}}",
+    "parameters": {"file": {"type": "object"}, "user": {"type": "object"}, "depth": {"type": "integer"}},
+}
+
+ENV = Environment({
+    "file": {"path": "src/task_system/template_processor.py"},
+    "user": {"name": "reviewer", "role": "maintainer"},
+    "depth": 2,
+})
+
+
+def _time(processor, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        processor.process_template(TEMPLATE, ENV)
+    return time.perf_counter() - start
+
+
+def test_compiled_template_processing_overhead():
+    """Compare per-execution overhead of compiled and uncompiled templates."""
+    iterations = 2000
+    uncompiled = TemplateProcessor(StaticTaskSystem())
+    compiled = TemplateProcessor(StaticTaskSystem())
+    compiled.compile_template(TEMPLATE)
+    assert compiled.process_template(TEMPLATE, ENV) == uncompiled.process_template(TEMPLATE, ENV)
+
+    # Best of several rounds to reduce scheduling noise
+    uncompiled_time = min(_time(uncompiled, iterations) for _ in range(3))
+    compiled_time = min(_time(compiled, iterations) for _ in range(3))
+
+    print(f"\nTemplate processing per execution: uncompiled {uncompiled_time / iterations * 1e6:.1f}us, "
+          f"compiled {compiled_time / iterations * 1e6:.1f}us ({uncompiled_time / compiled_time:.1f}x)")
+    assert compiled_time < uncompiled_time
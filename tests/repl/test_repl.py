@@ -255,3 +255,32 @@ class TestRepl:
         with patch('sys.exit') as mock_exit:
             repl_instance._cmd_exit("")
             mock_exit.assert_called_once_with(0)
+
+    def test_handle_query_streaming(self, repl_instance, capture_stdout):
+        """Test that streamed deltas are printed as they arrive."""
+        def handle_query(query, stream_callback=None):
+            for delta in ["Streamed ", "answer"]:
+                stream_callback(delta)
+            return {"content": "Streamed answer", "metadata": {"relevant_files": ["file1.py"]}}
+
+        repl_instance.application.supports_streaming = True
+        repl_instance.application.handle_query.side_effect = handle_query
+
+        repl_instance._handle_query("test query")
+
+        output = capture_stdout.getvalue()
+        assert "Response:" in output
+        assert output.count("Streamed answer") == 1
+        assert "1. file1.py" in output
+
+    def test_cmd_stats(self, repl_instance, capture_stdout, tmp_path):
+        """Test showing and saving metrics."""
+        from system.metrics import get_registry
+        get_registry().counter("repl_test_total", "REPL test counter").inc()
+
+        repl_instance._cmd_stats("")
+        assert "repl_test_total: 1" in capture_stdout.getvalue()
+
+        path = tmp_path / "metrics.prom"
+        repl_instance._cmd_stats(f"save {path}")
+        assert "# TYPE repl_test_total counter" in path.read_text()
@@ -0,0 +1,98 @@
+"""Tests for the metrics registry."""
+import time
+import urllib.request
+
+import pytest
+
+from system.metrics import MetricsRegistry, get_registry, timed
+from handler.model_router import ModelRouter
+
+
+class TestMetricsRegistry:
+    """Tests for metrics and their export."""
+
+    def test_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests", ["status"]).labels("COMPLETE").inc(3)
+        registry.gauge("index_files", "Files").set(42)
+        latency = registry.histogram("latency_seconds", "Latency", ["template"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.labels("summarize").observe(value)
+
+        text = registry.to_prometheus()
+
+        assert '# TYPE requests_total counter\nrequests_total{status="COMPLETE"} 3\n' in text
+        assert "index_files 42\n" in text
+        assert 'latency_seconds_bucket{template="summarize",le="0.1"} 2\n' in text
+        assert 'latency_seconds_bucket{template="summarize",le="1"} 3\n' in text
+        assert 'latency_seconds_bucket{template="summarize",le="+Inf"} 4\n' in text
+        assert 'latency_seconds_sum{template="summarize"} 2.65\n' in text
+        assert 'latency_seconds_count{template="summarize"} 4\n' in text
+
+    def test_get_or_create(self):
+        registry = MetricsRegistry()
+        assert registry.counter("hits_total", "Hits") is registry.counter("hits_total", "Hits")
+        with pytest.raises(ValueError):
+            registry.gauge("hits_total", "Hits")
+        with pytest.raises(ValueError):
+            registry.counter("hits_total", "Hits").labels("unexpected")
+
+    def test_summary(self):
+        registry = MetricsRegistry()
+        cache = registry.counter("cache_requests_total", "Lookups", ["result"])
+        cache.labels("hit").inc(3)
+        cache.labels("miss").inc()
+        registry.histogram("latency_seconds", "Latency").observe(0.5)
+
+        assert registry.summary() == [
+            "cache_requests_total: hit rate 75.0% (3/4)",
+            "latency_seconds: count=1 mean=0.5",
+        ]
+
+    def test_file_and_socket_export(self, tmp_path):
+        registry = MetricsRegistry()
+        registry.counter("exported_total", "Exported").inc()
+        path = tmp_path / "metrics.prom"
+
+        registry.write_prometheus(str(path))
+        assert "exported_total 1" in path.read_text()
+
+        server = registry.serve()
+        try:
+            host, port = server.server_address[:2]
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+                assert "exported_total 1" in response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_timed(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("call_seconds", "Calls")
+
+        @timed(histogram)
+        def call():
+            return "done"
+
+        assert call() == "done"
+        assert histogram.labels().count == 1
+
+    def test_router_records_latency_per_template(self):
+        provider = type("Provider", (), {"send_message": lambda self, **kwargs: "ok"})()
+        latency = get_registry().get("llm_request_seconds").labels("metrics_test_template")
+        before = latency.count
+
+        ModelRouter().send_message(provider, [{"role": "user", "content": "hi"}],
+                                   template={"name": "metrics_test_template"})
+
+        assert latency.count == before + 1
+
+    def test_recording_overhead(self):
+        counter = MetricsRegistry().counter("hot_total", "Hot path").labels()
+        iterations = 100000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            counter.inc()
+        per_call = (time.perf_counter() - start) / iterations
+        assert counter.value == iterations
+        assert per_call < 20e-6
@@ -0,0 +1,97 @@
+"""Tests for tracing spans."""
+import concurrent.futures
+import json
+
+import pytest
+
+from system.tracing import NOOP_SPAN, Tracer, bind_context, current_span, get_tracer, span, traced
+from task_system.task_system import TaskSystem
+
+
+@pytest.fixture
+def tracer():
+    """Enable the process-wide tracer for one test."""
+    tracer = get_tracer()
+    was_enabled = tracer.enabled
+    tracer.clear()
+    tracer.enable()
+    yield tracer
+    tracer.enable(was_enabled)
+    tracer.clear()
+
+
+class TestTracing:
+    """Tests for spans and their export."""
+
+    def test_disabled_spans_are_not_recorded(self):
+        tracer = Tracer()
+        with tracer.span("work") as current:
+            current.set_attribute("ignored", True)
+        assert current is NOOP_SPAN
+        assert tracer.finished_spans() == []
+
+    def test_nesting_and_attributes(self, tracer):
+        @traced("inner")
+        def inner():
+            current_span().set_attribute("cache_hit", True)
+
+        with span("outer", shard_index=2) as outer:
+            inner()
+
+        spans = {recorded.name: recorded for recorded in tracer.finished_spans()}
+        assert spans["inner"].parent_id == outer.span_id
+        assert spans["inner"].attributes == {"cache_hit": True}
+        assert spans["outer"].parent_id is None
+        assert spans["outer"].attributes == {"shard_index": 2}
+        assert spans["outer"].duration >= spans["inner"].duration
+
+    def test_errors_are_recorded(self, tracer):
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+        assert tracer.finished_spans()[0].attributes["error"] == "ValueError: boom"
+
+    def test_bound_callables_nest_across_threads(self, tracer):
+        @traced("worker")
+        def work(item):
+            return item
+
+        with span("parent") as parent:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+                assert list(executor.map(bind_context(work), range(6))) == list(range(6))
+
+        workers = [recorded for recorded in tracer.finished_spans() if recorded.name == "worker"]
+        assert len(workers) == 6
+        assert all(recorded.parent_id == parent.span_id for recorded in workers)
+
+    def test_chrome_trace_export(self, tracer, tmp_path):
+        with span("task_system.execute_task", task="atomic:test", files=["a.py"]):
+            pass
+        path = tmp_path / "trace.json"
+
+        assert tracer.export_chrome_trace(str(path)) == 1
+        event = json.loads(path.read_text())["traceEvents"][0]
+        assert event["name"] == "task_system.execute_task"
+        assert event["cat"] == "task_system"
+        assert event["ph"] == "X"
+        assert event["dur"] >= 0
+        assert event["args"]["task"] == "atomic:test"
+        assert event["args"]["files"] == "['a.py']"
+
+    def test_sequential_steps_nest_under_task(self, tracer):
+        ts = TaskSystem()
+        ts.register_template({"name": "add_step", "type": "atomic", "subtype": "math_add",
+                              "parameters": {"x": {"type": "integer"}, "y": {"type": "integer"}}})
+        ts.register_template({"name": "pair", "type": "sequential", "subtype": "pair", "steps": [
+            {"name": "a", "template": "add_step", "inputs": {"x": 1, "y": 2}},
+            {"name": "b", "template": "add_step", "inputs": {"x": 3, "y": 4}},
+        ]})
+
+        result = ts.execute_task("sequential", "pair", {})
+
+        assert result["status"] == "COMPLETE"
+        tasks = [recorded for recorded in tracer.finished_spans() if recorded.name == "task_system.execute_task"]
+        root = next(recorded for recorded in tasks if recorded.attributes["task"] == "sequential:pair")
+        steps = [recorded for recorded in tasks if recorded.attributes["task"] == "atomic:math_add"]
+        assert len(steps) == 2
+        assert all(recorded.parent_id == root.span_id for recorded in steps)
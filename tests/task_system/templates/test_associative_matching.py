@@ -1,4 +1,8 @@
 """Tests for the AssociativeMatchingTemplate."""
+import os
+import subprocess
+import sys
+
 import pytest
 from unittest.mock import patch, MagicMock, PropertyMock
 import task_system.templates.associative_matching as associative_matching
@@ -63,3 +67,13 @@ class TestAssociativeMatchingTemplate:
                   side_effect=lambda x: x.global_index if hasattr(x, 'global_index') and x.global_index else {}):
             result3 = associative_matching.get_global_index(memory3)
             assert result3 == {"file3": "metadata3"}
+
+    def test_import_does_not_load_provider_sdk(self):
+        """Test that importing the template leaves the provider SDK unloaded."""
+        src_dir = os.path.dirname(os.path.dirname(os.path.dirname(associative_matching.__file__)))
+        script = "import sys, task_system.templates.associative_matching; print('anthropic' in sys.modules)"
+
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                   env=dict(os.environ, PYTHONPATH=src_dir), timeout=60)
+
+        assert completed.stdout.strip() == "False"
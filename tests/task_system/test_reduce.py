@@ -0,0 +1,136 @@
+"""Tests for the reduce operator."""
+import json
+import threading
+
+import pytest
+
+from task_system.task_system import TaskSystem
+from task_system.reduce import ReduceCheckpoint
+
+
+class ScriptedHandler:
+    """Handler returning the resolved description, failing prompts listed in fail."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def execute_prompt(self, prompt, system_prompt=None, file_context=None):
+        with self.lock:
+            self.prompts.append(prompt)
+        if prompt in self.fail:
+            return {"status": "FAILED", "content": f"could not {prompt}", "notes": {}}
+        return {"status": "COMPLETE", "content": prompt, "notes": {}}
+
+
+@pytest.fixture
+def task_system():
+    ts = TaskSystem()
+    ts.register_template({
+        "name": "summarize", "type": "atomic", "subtype": "summarize",
+        "description": "s({{text}})",
+        "parameters": {"text": {"type": "string", "required": True}},
+    })
+    ts.register_template({
+        "name": "combine", "type": "atomic", "subtype": "combine",
+        "description": "{{left}}+{{right}}",
+        "parameters": {"left": {"type": "string"}, "right": {"type": "string"}},
+    })
+    return ts
+
+
+def register_reduce(ts, **extra):
+    ts.register_template({
+        "name": "digest", "type": "reduce", "subtype": "digest",
+        "description": "Digest the inputs",
+        "inner_task": {"template": "summarize", "inputs": {"text": {"from": "current_data"}}},
+        "reduction_task": {"template": "combine", "inputs": {"left": {"from": "accumulator"},
+                                                             "right": {"from": "current_result"}}},
+        **extra,
+    })
+
+
+class TestReduceOperator:
+    """Tests for reduce task execution."""
+
+    def test_tree_reduction_takes_log_rounds(self, task_system):
+        register_reduce(task_system, associative=True)
+        handler = ScriptedHandler()
+
+        result = task_system.execute_task("reduce", "digest", {"items": ["a", "b", "c", "d", "e"]},
+                                          handler=handler)
+
+        assert result["status"] == "COMPLETE"
+        # Input order is kept, so the reduction need not be commutative
+        assert result["content"] == "s(a)+s(b)+s(c)+s(d)+s(e)"
+        assert result["notes"]["rounds"] == 3
+        # 5 map calls and 4 combines
+        assert len(handler.prompts) == 9
+
+    def test_fold_without_associativity(self, task_system):
+        register_reduce(task_system, initial_value="start")
+        handler = ScriptedHandler()
+
+        result = task_system.execute_task("reduce", "digest", {"items": {"x": "1", "y": "2"}}, handler=handler)
+
+        assert result["content"] == "start+s(1)+s(2)"
+        assert result["notes"]["rounds"] == 2
+
+    def test_failed_leaf_is_retried(self, task_system):
+        register_reduce(task_system, associative=True)
+
+        class FlakyHandler(ScriptedHandler):
+            def execute_prompt(self, prompt, system_prompt=None, file_context=None):
+                result = super().execute_prompt(prompt, system_prompt, file_context)
+                self.fail.discard(prompt)  # Fails once only
+                return result
+
+        result = task_system.execute_task("reduce", "digest", {"items": ["a", "b"]},
+                                          handler=FlakyHandler(fail={"s(b)"}))
+
+        assert result["status"] == "COMPLETE"
+        assert result["notes"]["retries"] == 1
+
+    def test_resume_from_checkpoint(self, task_system, tmp_path):
+        register_reduce(task_system, associative=True, leaf_retries=0)
+        items = {"items": ["a", "b", "c", "d"]}
+        checkpoint_path = str(tmp_path / "digest.json")
+
+        failed = task_system.execute_task("reduce", "digest", items, handler=ScriptedHandler(fail={"s(c)"}),
+                                          checkpoint_path=checkpoint_path)
+        assert failed["status"] == "FAILED"
+        assert failed["notes"]["error"]["details"] == {"phase": "map", "input": "item_3"}
+        assert set(failed["notes"]["checkpoint"]["entries"]) == {"map:0", "map:1", "map:3"}
+        with open(checkpoint_path) as f:
+            assert json.load(f) == failed["notes"]["checkpoint"]
+
+        # Only the failed leaf and the reductions above it run again
+        handler = ScriptedHandler()
+        result = task_system.execute_task("reduce", "digest", items, handler=handler,
+                                          checkpoint=failed["notes"]["checkpoint"])
+        assert result["content"] == "s(a)+s(b)+s(c)+s(d)"
+        assert "s(a)" not in handler.prompts
+        assert handler.prompts.count("s(c)") == 1
+        assert result["notes"]["checkpoint_hits"] == 3
+
+    def test_unwritable_checkpoint_path(self, task_system, tmp_path):
+        register_reduce(task_system, associative=True)
+        checkpoint_path = str(tmp_path / "missing" / "digest.json")
+
+        result = task_system.execute_task("reduce", "digest", {"items": ["a", "b"]}, handler=ScriptedHandler(),
+                                          checkpoint_path=checkpoint_path)
+
+        assert result["status"] == "COMPLETE"
+        assert result["content"] == "s(a)+s(b)"
+        assert list(tmp_path.iterdir()) == []
+
+    def test_checkpoint_for_other_work_is_ignored(self):
+        source = {"fingerprint": "old", "entries": {"map:0": "stale"}}
+        assert ReduceCheckpoint.load("new", source).entries == {}
+        assert ReduceCheckpoint.load("old", source).get("map:0") == (True, "stale")
+
+    def test_missing_structure(self, task_system):
+        task_system.register_template({"name": "bad", "type": "reduce", "subtype": "bad", "description": "x"})
+        result = task_system.execute_task("reduce", "bad", {"items": ["a"]})
+        assert result["status"] == "FAILED"
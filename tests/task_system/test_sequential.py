@@ -0,0 +1,171 @@
+"""Tests for the sequential operator."""
+import threading
+
+import pytest
+
+from task_system.task_system import TaskSystem
+from task_system.sequential import build_step_graph, step_ancestors
+
+
+class EchoHandler:
+    """Handler returning the resolved description, failing on 'fail'."""
+
+    def __init__(self, barrier=None):
+        self.barrier = barrier
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def execute_prompt(self, prompt, system_prompt=None, file_context=None):
+        with self.lock:
+            self.prompts.append(prompt)
+        if self.barrier is not None and prompt.startswith("load"):
+            # Both loads must be running at once to get past the barrier
+            self.barrier.wait(timeout=5)
+        if "fail" in prompt:
+            return {"status": "FAILED", "content": f"could not {prompt}", "notes": {}}
+        return {"status": "COMPLETE", "content": prompt.upper(), "notes": {"summary": prompt}}
+
+
+@pytest.fixture
+def task_system():
+    ts = TaskSystem()
+    ts.register_template({
+        "name": "echo", "type": "atomic", "subtype": "echo",
+        "description": "{{text}}",
+        "parameters": {"text": {"type": "string", "required": True}},
+    })
+    return ts
+
+
+def register_sequential(ts, steps, **extra):
+    ts.register_template({"name": "pipeline", "type": "sequential", "subtype": "pipeline",
+                          "description": "Pipeline", "steps": steps, **extra})
+
+
+def echo(name, text=None, **inputs):
+    step = {"name": name, "template": "echo", "inputs": inputs}
+    if text is not None:
+        step["inputs"]["text"] = text
+    return step
+
+
+class TestSequentialOperator:
+    """Tests for sequential task execution."""
+
+    def test_step_graph(self):
+        steps = [{"name": "a"}, {"name": "b"},
+                 {"name": "c", "inputs": {"x": {"from": "a"}, "y": {"from": "raw"}}},
+                 {"name": "d", "depends_on": "c"}]
+        graph = build_step_graph(steps, run_early={0, 1, 2, 3})
+        assert graph == [set(), set(), {0}, {2}]
+        assert step_ancestors(graph)[3] == {0, 2}
+        assert build_step_graph(steps) == [set(), {0}, {0, 1}, {0, 1, 2}]
+        assert build_step_graph(steps, run_early={2}) == [set(), {0}, {0}, {0, 1, 2}]
+
+        with pytest.raises(ValueError):
+            build_step_graph([{"name": "a", "inputs": {"x": {"from": "b"}}}, {"name": "b"}])
+        with pytest.raises(ValueError):
+            build_step_graph([{"name": "a"}, {"name": "a"}])
+
+    def test_steps_run_in_order_by_default(self, task_system):
+        register_sequential(task_system, [echo("first", "one"), echo("second", "two"), echo("third", "three")])
+        handler = EchoHandler()
+
+        result = task_system.execute_task("sequential", "pipeline", {}, handler=handler)
+
+        assert result["status"] == "COMPLETE"
+        assert handler.prompts == ["one", "two", "three"]
+        timings = result["notes"]["step_timings"]
+        for before, after in [("first", "second"), ("second", "third")]:
+            assert timings[after]["start"] >= timings[before]["start"] + timings[before]["duration"]
+
+    def test_parallel_safe_steps_run_early(self, task_system):
+        task_system.register_template({
+            "name": "safe_echo", "type": "atomic", "subtype": "safe_echo", "parallel_safe": True,
+            "description": "{{text}}",
+            "parameters": {"text": {"type": "string", "required": True}},
+        })
+        register_sequential(task_system, [
+            echo("first", "load first"),
+            {"name": "second", "template": "safe_echo", "inputs": {"text": "load second"}},
+        ])
+
+        result = task_system.execute_task("sequential", "pipeline", {},
+                                          handler=EchoHandler(barrier=threading.Barrier(2)))
+
+        assert [step["status"] for step in result["notes"]["steps"]] == ["COMPLETE"] * 2
+
+    def test_independent_steps_run_concurrently(self, task_system):
+        register_sequential(task_system, [
+            echo("first", "load first"),
+            echo("second", "load second"),
+            echo("combine", text={"from": "second"}, extra={"from": "first"}),
+        ], parallel_steps=True)
+        handler = EchoHandler(barrier=threading.Barrier(2))
+
+        result = task_system.execute_task("sequential", "pipeline", {}, handler=handler)
+
+        assert result["status"] == "COMPLETE"
+        assert result["content"] == "LOAD SECOND"
+        assert [step["status"] for step in result["notes"]["steps"]] == ["COMPLETE"] * 3
+        assert set(result["notes"]["step_timings"]) == {"first", "second", "combine"}
+        timings = result["notes"]["step_timings"]
+        assert timings["combine"]["start"] >= timings["first"]["start"] + timings["first"]["duration"]
+
+    def test_inputs_from_parent_and_accumulation(self, task_system):
+        register_sequential(task_system, [
+            echo("load", text={"from": "dataset"}),
+            echo("analyze", text={"from": "load"}),
+        ], parameters={"dataset": {"type": "string", "required": True}},
+            context_management={"accumulation_format": "full_output"})
+        calls = []
+        original = task_system.execute_task
+
+        def recording_execute_task(task_type, task_subtype, inputs, **kwargs):
+            calls.append((task_type, inputs, kwargs.get("previous_outputs")))
+            return original(task_type, task_subtype, inputs, **kwargs)
+
+        task_system.execute_task = recording_execute_task
+        result = task_system.execute_task("sequential", "pipeline", {"dataset": "sales"}, handler=EchoHandler())
+
+        assert result["content"] == "SALES"
+        assert calls[1:] == [("atomic", {"text": "sales"}, []),
+                             ("atomic", {"text": "SALES"}, ["load: SALES"])]
+        assert result["notes"]["steps"][1]["content"] == "SALES"
+
+    def test_failure_skips_later_steps_by_default(self, task_system):
+        register_sequential(task_system, [echo("ok", "fine"), echo("broken", "fail here"), echo("after", "later")])
+
+        result = task_system.execute_task("sequential", "pipeline", {}, handler=EchoHandler())
+
+        assert result["status"] == "FAILED"
+        assert [step["status"] for step in result["notes"]["steps"]] == ["COMPLETE", "FAILED", "SKIPPED"]
+
+    def test_failure_skips_dependents_only(self, task_system):
+        register_sequential(task_system, [
+            echo("ok", "fine"),
+            echo("broken", "fail here"),
+            echo("after_broken", text={"from": "broken"}),
+            echo("independent", "also fine"),
+            echo("also_broken", "fail later"),
+        ], parallel_steps=True)
+        handler = EchoHandler()
+
+        result = task_system.execute_task("sequential", "pipeline", {}, handler=handler)
+
+        assert result["status"] == "FAILED"
+        assert result["content"] == "Step 'broken' failed: could not fail here"
+        assert result["notes"]["error"]["details"]["step"] == "broken"
+        assert [step["status"] for step in result["notes"]["steps"]] == [
+            "COMPLETE", "FAILED", "SKIPPED", "COMPLETE", "FAILED"]
+        assert "after_broken" not in result["notes"]["step_timings"]
+
+    def test_invalid_structure(self, task_system):
+        register_sequential(task_system, [])
+        result = task_system.execute_task("sequential", "pipeline", {})
+        assert result["status"] == "FAILED"
+
+        register_sequential(task_system, [echo("a", text={"from": "missing"})])
+        result = task_system.execute_task("sequential", "pipeline", {}, handler=EchoHandler())
+        assert result["status"] == "FAILED"
+        assert "unknown source 'missing'" in result["content"]
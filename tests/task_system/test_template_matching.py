@@ -67,3 +67,93 @@ class TestTemplateMatching:
         # Verify all returned matches are atomic tasks
         for match in matches1 + matches2:
             assert match["taskType"] == "atomic"
+    
+    def test_index_matches_linear_scan(self, mock_memory_system):
+        """Test that indexed matching scores like a scan of every template."""
+        task_system = TaskSystem()
+        descriptions = ["Find relevant files for the given query", "Process data and generate report",
+                        "Summarize the report, briefly!", "Refactor code for better error messages"]
+        for i, description in enumerate(descriptions):
+            task_system.register_template({"type": "atomic", "subtype": f"task{i}",
+                                           "name": f"task{i}", "description": description})
+        task_system.register_template({"type": "sequential", "subtype": "steps", "name": "steps",
+                                       "description": "Generate report"})
+        
+        query = "Generate a short report for the query"
+        matches = task_system.find_matching_tasks(query, mock_memory_system)
+        
+        expected = sorted(
+            ((name, task_system._calculate_similarity_score(query, template["description"]))
+             for name, template in task_system.templates.items() if template["type"] == "atomic"),
+            key=lambda item: -item[1])
+        assert [(m["task"]["name"], m["score"]) for m in matches] == [e for e in expected if e[1] > 0.1]
+    
+    def test_index_tracks_reregistration_and_direct_edits(self, mock_memory_system):
+        """Test that replaced and directly assigned templates are matched correctly."""
+        task_system = TaskSystem()
+        task_system.register_template({"type": "atomic", "subtype": "a", "name": "a",
+                                       "description": "Find relevant files"})
+        task_system.register_template({"type": "atomic", "subtype": "a", "name": "a",
+                                       "description": "Generate report"})
+        
+        assert task_system.find_matching_tasks("find relevant files", mock_memory_system) == []
+        assert task_system.find_matching_tasks("generate report", mock_memory_system)[0]["score"] == 1.0
+        
+        task_system.templates["b"] = {"type": "atomic", "subtype": "b", "description": "Find relevant files"}
+        assert task_system.find_matching_tasks("find relevant files", mock_memory_system)[0]["subtype"] == "b"
+        
+        # Replacing an existing entry keeps the dict and its size
+        task_system.templates["b"] = {"type": "atomic", "subtype": "b", "description": "Summarize changes"}
+        assert task_system.find_matching_tasks("find relevant files", mock_memory_system) == []
+        assert task_system.find_matching_tasks("summarize changes", mock_memory_system)[0]["subtype"] == "b"
+        
+        del task_system.templates["b"]
+        assert task_system.find_matching_tasks("summarize changes", mock_memory_system) == []
+        task_system.templates.update(c={"type": "atomic", "subtype": "c", "description": "Summarize changes"})
+        assert task_system.templates.pop("c")["subtype"] == "c"
+        assert task_system.find_matching_tasks("summarize changes", mock_memory_system) == []
+        
+        # Assigning a new dict reindexes it in full
+        task_system.templates = {"d": {"type": "atomic", "subtype": "d", "description": "Summarize changes"}}
+        assert task_system.find_matching_tasks("generate report", mock_memory_system) == []
+        assert task_system.find_matching_tasks("summarize changes", mock_memory_system)[0]["subtype"] == "d"
+    
+    def test_index_is_safe_during_concurrent_registration(self, mock_memory_system):
+        """Test matching on other threads while templates are registered."""
+        import concurrent.futures
+        task_system = TaskSystem()
+        
+        def register(i):
+            task_system.register_template({"type": "atomic", "subtype": f"t{i}", "name": f"t{i}",
+                                           "description": f"Process report number {i}"})
+        
+        def match(_):
+            return task_system.find_matching_tasks("process report", mock_memory_system)
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(register if i % 2 else match, i) for i in range(200)]
+            for future in futures:
+                future.result()
+        
+        assert len(match(None)) == 100
+    
+    def test_index_is_safe_during_concurrent_direct_edits(self, mock_memory_system):
+        """Test matching on other threads while templates are assigned and deleted directly."""
+        import concurrent.futures
+        task_system = TaskSystem()
+        
+        def edit(i):
+            task_system.templates[f"t{i}"] = {"type": "atomic", "subtype": f"t{i}",
+                                              "description": f"Process report number {i}"}
+            if i % 4 == 1:
+                del task_system.templates[f"t{i}"]
+        
+        def match(_):
+            return task_system.find_matching_tasks("process report", mock_memory_system)
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(edit if i % 2 else match, i) for i in range(200)]
+            for future in futures:
+                future.result()
+        
+        assert len(match(None)) == 50
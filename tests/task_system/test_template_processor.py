@@ -170,3 +170,67 @@ class TestTemplateProcessor:
                 assert "test_value" in processed["description"]
                 assert "FUNCTION_RESULT" in processed["description"]
                 assert "SYSTEM_FUNCTION_RESULT" in processed["system_prompt"]
+
+
+class RecordingTaskSystem:
+    """Task system stand-in rendering function calls from their arguments."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def executeCall(self, call, env):
+        args = [f"{arg.name}={arg.value}" if arg.name else str(arg.value) for arg in call.arguments]
+        self.calls.append(call.template_name)
+        if call.template_name == "fail":
+            raise ValueError("failed call")
+        return {"status": "COMPLETE", "content": f"{call.template_name}({', '.join(args)})"}
+
+
+class TestCompiledTemplates:
+    """Tests for templates compiled into execution plans."""
+    
+    FIELDS = [
+        "Plain text without references",
+        "Hello {{name}}, you have {{user.items[1]}} and {{missing}}",
+        "{{greet(name)}} then {{greet('literal', punctuation='!')}} and {{count(3, flag=true)}}",
+        "Nested {{greet({{name}})}} call",
+        "Injected {{payload}} value",
+        "Brace {{brace}}{greet(name)}} boundary",
+        "Error {{fail()}} and {{name}}",
+    ]
+    
+    @pytest.fixture
+    def environment(self):
+        return Environment({
+            "name": "Ada",
+            "user": {"items": ["a", "b"]},
+            "payload": "{{greet(name)}}",
+            "brace": "{",
+        })
+    
+    @pytest.mark.parametrize("text", FIELDS)
+    def test_compiled_matches_uncompiled(self, text, environment):
+        """Test that a compiled field renders exactly like the uncompiled path."""
+        template = {"name": "compiled", "type": "atomic", "subtype": "test",
+                    "description": text, "custom_field": f"Custom {text}"}
+        uncompiled_system, compiled_system = RecordingTaskSystem(), RecordingTaskSystem()
+        expected = TemplateProcessor(uncompiled_system).process_template(template, environment)
+        
+        processor = TemplateProcessor(compiled_system)
+        processor.compile_template(template)
+        assert processor.process_template(template, environment) == expected
+        assert compiled_system.calls == uncompiled_system.calls
+    
+    def test_plan_is_reused_and_invalidated(self, environment):
+        """Test that changed templates fall back to processing from scratch."""
+        template = {"name": "t", "type": "atomic", "description": "Hi {{name}}"}
+        processor = TemplateProcessor(RecordingTaskSystem())
+        plan = processor.compile_template(template)
+        
+        assert plan.is_current(template)
+        assert processor.process_template(template, environment)["description"] == "Hi Ada"
+        
+        template["description"] = "Bye {{name}}"
+        assert not plan.is_current(template)
+        assert processor.process_template(template, environment)["description"] == "Bye Ada"
+        assert not plan.is_current({**template})
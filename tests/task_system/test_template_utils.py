@@ -1,5 +1,6 @@
 """Tests for template utility functions."""
 import pytest
+import threading
 from unittest.mock import MagicMock
 from task_system.template_utils import (
     resolve_parameters,
@@ -13,7 +14,8 @@ from task_system.template_utils import (
     evaluate_arguments,
     bind_arguments_to_parameters,
     resolve_function_calls,
-    translate_function_call_to_ast
+    translate_function_call_to_ast,
+    plan_call_stages
 )
 from task_system.ast_nodes import FunctionCallNode, ArgumentNode
 
@@ -325,6 +327,44 @@ class TestEnvironment:
         with pytest.raises(ValueError, match="Invalid array index"):
             env.find("items[invalid]")  # Invalid index
 
+    
+    def test_compiled_paths_report_original_errors(self):
+        """Test that compiled path lookups keep the original error messages."""
+        env = Environment({"items": [{"name": "first"}], "text": "string", "obj": {"a": 1}})
+        
+        assert env.find("items[0].name") == "first"
+        assert env.find("items[0].name") == "first"  # Served from the compiled path cache
+        cases = {
+            "items[0].missing": "Cannot access property 'missing' of variable 'items[0]'",
+            "obj.a.b": "Cannot access property 'b' of variable 'obj.a'",
+            "items[0": "Unmatched opening bracket in path: items[0",
+            "items[-1]": "Index -1 out of bounds for array in path: items[-1]",
+            "text[0]": "Cannot use array indexing on non-array value in path: text[0]",
+            "items[x].name": "Invalid array index 'x' in path: items[x]",
+            "items[0]x": "Unexpected character in path: x",
+            "missing.name": "Variable 'missing' not found",
+        }
+        for path, message in cases.items():
+            with pytest.raises(ValueError) as excinfo:
+                env.find(path)
+            assert str(excinfo.value) == message
+    
+    def test_deep_scope_chain_and_flatten(self):
+        """Test lookups through deep chains and flattened snapshots."""
+        env = Environment({"root": "r", "shadowed": 0, "data": {"items": [1, 2]}})
+        for level in range(1, 50):
+            env = env.extend({f"level{level}": level, "shadowed": level})
+        
+        assert env.depth == 50
+        assert env.find("root") == "r"
+        assert env.find("data.items[1]") == 2
+        
+        flat = env.flatten()
+        assert flat.parent is None
+        assert flat.find("shadowed") == 49
+        assert flat.find("level1") == 1
+        assert flat.find("data.items[1]") == 2
+
 
 class TestVariableSubstitution:
     """Tests for variable substitution functions."""
@@ -721,3 +761,38 @@ class TestTranslationMechanism:
         # Then resolve function calls
         result = resolve_function_calls(var_substituted, mock_task_system, env)
         assert "test_value is Args received: test_value and 42 and 42" == result
+    
+    def test_independent_calls_run_concurrently(self):
+        """Test that calls to registered templates overlap and splice in position order."""
+        barrier = threading.Barrier(3, timeout=5)
+        task_system = MagicMock()
+        task_system.templates = {name: {"name": name, "type": "atomic", "parallel_safe": True}
+                                 for name in ("a", "b", "c")}
+        
+        def execute_call(call, env):
+            barrier.wait()  # Only passes if all three calls run at once
+            return {"status": "COMPLETE", "content": f"{call.template_name}:{call.arguments[0].value}"}
+        task_system.executeCall.side_effect = execute_call
+        
+        env = Environment({"x": 1})
+        result = resolve_function_calls("{{a(x)}}, {{b('2')}} and {{c(3)}}", task_system, env)
+        
+        assert result == "a:1, b:2 and c:3"
+    
+    def test_call_stages_respect_parallel_safe(self):
+        """Test that only calls declaring parallel_safe True run concurrently."""
+        task_system = MagicMock()
+        task_system.templates = {
+            "read": {"name": "read", "parallel_safe": True},
+            "write": {"name": "write", "parallel_safe": False},
+            "edit": {"name": "edit"},
+        }
+        task_system.template_index = {"atomic:read": "read"}
+        calls = [(name, [], {}, None) for name in ("read", "write", "read", "atomic:read", "unknown")]
+        
+        # Last call first, as in sequential execution
+        assert plan_call_stages(task_system, calls) == [[4], [3, 2], [1], [0]]
+        # Templates that do not declare themselves parallel safe run one at a time
+        edits = [("edit", [], {}, None)] * 2
+        assert plan_call_stages(task_system, edits) == [[1], [0]]
+
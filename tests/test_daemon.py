@@ -0,0 +1,125 @@
+"""Tests for the daemon server and its client."""
+import io
+import os
+import subprocess
+import sys
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+
+from daemon import DaemonClient, DaemonServer, DAEMON_URL_ENV, run_client
+
+MAIN_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "src", "main.py")
+
+
+@pytest.fixture
+def application():
+    """Mock warm Application."""
+    app = MagicMock()
+    app.indexed_repositories = ["/repo"]
+    app.handle_query.return_value = {"content": "answer", "metadata": {"relevant_files": []}}
+    return app
+
+
+@pytest.fixture
+def server(application):
+    """Daemon serving the mock application on a free port."""
+    server = DaemonServer(application, port=0).start()
+    yield server
+    server.shutdown()
+
+
+class TestDaemon:
+    """Tests for daemon requests."""
+
+    def test_task_forwards_to_dispatcher(self, server, application):
+        calls = []
+
+        def dispatch(**kwargs):
+            calls.append(kwargs)
+            return {"status": "COMPLETE", "content": "done", "notes": {}}
+
+        server._dispatcher_func = dispatch
+        result = DaemonClient(server.url).task("atomic:test", {"x": [1, 2]}, {"use-history": True})
+
+        assert result == {"status": "COMPLETE", "content": "done", "notes": {}}
+        assert calls[0]["identifier"] == "atomic:test"
+        assert calls[0]["params"] == {"x": [1, 2]}
+        assert calls[0]["flags"] == {"use-history": True}
+        assert calls[0]["handler_instance"] is application.passthrough_handler
+        assert calls[0]["task_system_instance"] is application.task_system
+
+    def test_tasks_run_concurrently(self, server):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def dispatch(**kwargs):
+            barrier.wait()  # Only passes if all three requests are in flight at once
+            return {"status": "COMPLETE", "content": kwargs["identifier"], "notes": {}}
+
+        server._dispatcher_func = dispatch
+        client = DaemonClient(server.url)
+        results = [None] * 3
+        threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, client.task(f"t:{i}")))
+                   for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [result["content"] for result in results] == ["t:0", "t:1", "t:2"]
+
+    def test_query_and_health(self, server, application):
+        client = DaemonClient(server.url)
+
+        assert client.query("what is this?")["content"] == "answer"
+        application.handle_query.assert_called_once_with("what is this?")
+        assert client.health() == {"status": "ok", "indexed_repositories": ["/repo"]}
+
+    def test_invalid_requests(self, server):
+        client = DaemonClient(server.url)
+        assert client.task("")["status"] == "FAILED"
+        assert client._request("/unknown", {})["status"] == "FAILED"
+
+        request = urllib.request.Request(server.url + "/task", data=b"not json")
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(request, timeout=5)
+        assert excinfo.value.code == 400
+
+    def test_run_client(self, server):
+        server._dispatcher_func = lambda **kwargs: {
+            "status": "COMPLETE", "content": kwargs["params"]["prompt"], "notes": {"n": 1}}
+        output = io.StringIO()
+
+        exit_code = run_client(["/task test:echo prompt='hello there' --verbose"], url=server.url, output=output)
+
+        assert exit_code == 0
+        assert "Status: COMPLETE" in output.getvalue()
+        assert "hello there" in output.getvalue()
+
+    def test_run_client_without_daemon(self):
+        output = io.StringIO()
+        exit_code = run_client(["test:echo"], url="http://127.0.0.1:1", output=output)
+        assert exit_code == 1
+        assert "Daemon not reachable" in output.getvalue()
+
+    def test_task_client_skips_application_imports(self):
+        script = (
+            "import runpy, sys\n"
+            f"sys.argv = [{MAIN_PATH!r}, '--task', 'test:echo']\n"
+            "try:\n"
+            f"    runpy.run_path({MAIN_PATH!r}, run_name='__main__')\n"
+            "except SystemExit as e:\n"
+            "    print('exit', e.code)\n"
+            "print('anthropic' in sys.modules)\n"
+        )
+        env = dict(os.environ, **{DAEMON_URL_ENV: "http://127.0.0.1:1"})
+        env["PYTHONPATH"] = os.path.dirname(MAIN_PATH)
+
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                   env=env, timeout=60)
+
+        assert "Daemon not reachable" in completed.stdout
+        assert completed.stdout.splitlines()[-2:] == ["exit 1", "False"]